@@ -10,3 +10,6 @@ NCC_PRIVATE_KEY_PATH = os.getenv("NCC_PRIVATE_KEY_PATH")
 NCC_REMOTE_JOB_DIR = os.getenv("NCC_REMOTE_JOB_DIR", "/path/to/remote/jobs")
 NCC_REMOTE_INFERENCE_SCRIPT_PATH = os.getenv("NCC_REMOTE_INFERENCE_SCRIPT_PATH", "/path/to/your/inference/script.py")
 NCC_REMOTE_VENV_PATH = os.getenv("NCC_REMOTE_VENV_PATH", "/path/to/your/venv/bin/activate")
+# One batched squeue per tick covers all in-flight jobs; the interval backs off while nothing changes
+NCC_MONITOR_MIN_INTERVAL_SECONDS = float(os.getenv("NCC_MONITOR_MIN_INTERVAL_SECONDS", "1"))
+NCC_MONITOR_MAX_INTERVAL_SECONDS = float(os.getenv("NCC_MONITOR_MAX_INTERVAL_SECONDS", "15"))
@@ -1,8 +1,10 @@
 
 
 import os
-import subprocess
+import sys
 import uuid
+import logging
+import subprocess
 import asyncio
 from typing import Tuple
 from config import (
@@ -17,6 +19,38 @@ from config import (
 from typing import Tuple, List, Optional
 from models import ApplicationContext
 
+# The SLURM job monitor is the gateway's own (PA_Backend/services); the Dockerfile copies it to the same relative path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "PA_Backend", "services"))
+from slurm_job_monitor import SlurmJobMonitor
+
+logger = logging.getLogger(__name__)
+
+SSH_COMMAND = ["ssh", "-i", NCC_PRIVATE_KEY_PATH, f"{NCC_USER}@{NCC_HOST}"]
+SCP_COMMAND = ["scp", "-i", NCC_PRIVATE_KEY_PATH]
+
+async def _exec(*args: str) -> Tuple[int, str, str]:
+    # ssh and scp run as child processes the event loop waits on, never blocking it
+    process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await process.communicate()
+    return process.returncode, stdout.decode().strip(), stderr.decode().strip()
+
+async def _run(*args: str) -> str:
+    """Like subprocess.run(..., check=True): raises CalledProcessError on a non-zero exit."""
+    returncode, stdout, stderr = await _exec(*args)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, list(args), stdout, stderr)
+    return stdout
+
+async def _run_ssh(command: str) -> Tuple[str, str]:
+    _, stdout, stderr = await _exec(*SSH_COMMAND, command)
+    return stdout, stderr
+
+def _log_finished_job(job_kind: str, result: dict):
+    logger.info(f"SLURM {job_kind} job {result['job_id']} {result['state']}: queued {result['queue_seconds']:.1f}s, ran {result['run_seconds']:.1f}s.")
+
+# Shared by every request: one squeue per tick for all in-flight jobs instead of one ssh per job
+job_monitor = SlurmJobMonitor(_run_ssh, on_finished=_log_finished_job)
+
 async def run_inference_on_ncc(prompt: str, chat_history: list, context: Optional[List[ApplicationContext]] = None) -> Tuple[str, str]:
     session_id = str(uuid.uuid4())
     remote_session_dir = f"{NCC_REMOTE_JOB_DIR}/{session_id}"
@@ -51,35 +85,26 @@ python {NCC_REMOTE_INFERENCE_SCRIPT_PATH} {remote_session_dir}/input.txt {remote
     with open(f"{local_session_dir}/run_inference.slurm", "w") as f:
         f.write(slurm_script)
 
-    # SSH commands
-    ssh_command = ["ssh", "-i", NCC_PRIVATE_KEY_PATH, f"{NCC_USER}@{NCC_HOST}"]
-    
     # Create remote directory
-    subprocess.run(ssh_command + [f"mkdir -p {remote_session_dir}"], check=True)
+    await _run(*SSH_COMMAND, f"mkdir -p {remote_session_dir}")
 
     # SCP files to NCC
-    scp_command = ["scp", "-i", NCC_PRIVATE_KEY_PATH]
-    subprocess.run(scp_command + [f"{local_session_dir}/input.txt", f"{local_session_dir}/run_inference.slurm", f"{NCC_USER}@{NCC_HOST}:{remote_session_dir}/"], check=True)
+    await _run(*SCP_COMMAND, f"{local_session_dir}/input.txt", f"{local_session_dir}/run_inference.slurm", f"{NCC_USER}@{NCC_HOST}:{remote_session_dir}/")
 
     # Submit SLURM job
-    submit_process = subprocess.run(ssh_command + [f"sbatch {remote_session_dir}/run_inference.slurm"], capture_output=True, text=True, check=True)
-    job_id = submit_process.stdout.strip().split()[-1]
+    job_id = (await _run(*SSH_COMMAND, f"sbatch {remote_session_dir}/run_inference.slurm")).split()[-1]
 
-    # Monitor job status
-    while True:
-        status_process = subprocess.run(ssh_command + [f"squeue -j {job_id}"], capture_output=True, text=True, check=True)
-        if job_id not in status_process.stdout:
-            break
-        await asyncio.sleep(10)
+    # Wait for the job via the shared monitor
+    await job_monitor.wait(job_id, "inference")
 
     # SCP results back
-    subprocess.run(scp_command + [f"{NCC_USER}@{NCC_HOST}:{remote_session_dir}/output.txt", f"{local_session_dir}/"], check=True)
+    await _run(*SCP_COMMAND, f"{NCC_USER}@{NCC_HOST}:{remote_session_dir}/output.txt", f"{local_session_dir}/")
     
     with open(f"{local_session_dir}/output.txt", "r") as f:
         response = f.read()
 
     # Cleanup
-    subprocess.run(ssh_command + [f"rm -rf {remote_session_dir}"], check=True)
+    await _run(*SSH_COMMAND, f"rm -rf {remote_session_dir}")
     os.remove(f"{local_session_dir}/input.txt")
     os.remove(f"{local_session_dir}/run_inference.slurm")
     os.remove(f"{local_session_dir}/output.txt")
@@ -1,4 +1,5 @@
-from typing import TypedDict, Annotated, List, Union
+from functools import lru_cache
+from typing import TypedDict, Annotated, List, Optional, Union
 import operator
 from langchain_core.agents import AgentAction, AgentFinish
 from langchain_core.messages import BaseMessage, HumanMessage
@@ -7,11 +8,12 @@ from langchain_community.llms import Ollama
 from langchain_core.tools import tool
 from langchain.agents import AgentExecutor, create_react_agent
 from langgraph.graph import StateGraph, END
-from langchain_core.runnables import Runnable
+from langchain_core.runnables import Runnable, ConfigurableField
 from langchain_core.language_models import BaseChatModel
 
-from ncc_service import NCCService
+from ncc_service import get_ncc_service
 from config import AI_MODELS, DEFAULT_AI_MODEL
+from services.generation_profiles import generation_settings, load_settings
 from agent_tools import (
     brave_search_tool,
     create_calendar_event_tool,
@@ -41,9 +43,6 @@ from agent_tools import (
 )
 from database import get_session
 
-# Initialize NCCService
-ncc_service = NCCService()
-
 # Custom LLM for NCC
 class NCCLLM(BaseChatModel):
     model_name: str
@@ -55,7 +54,7 @@ class NCCLLM(BaseChatModel):
         for msg in messages[:-1]:
             chat_history.append({"role": msg.type, "content": msg.content})
 
-        response_text, _ = asyncio.run(ncc_service.run_inference_on_ncc(prompt, chat_history))
+        response_text, _ = asyncio.run(get_ncc_service().run_inference_on_ncc(prompt, chat_history))
         return ChatGeneration(message=AIMessage(content=response_text))
 
     @property
@@ -63,6 +62,8 @@ class NCCLLM(BaseChatModel):
         return "ncc-llm"
 
 # Initialize LLMs
+# One wrapper per model, shared by every Agent node that uses it
+@lru_cache(maxsize=None)
 def _get_llm(model_name: str):
     model_config = AI_MODELS.get(model_name)
     if not model_config:
@@ -71,7 +72,18 @@ def _get_llm(model_name: str):
     if model_config["type"] == "local":
         # Ollama expects the model name, not a path. The path is for downloading/managing.
         # Assuming Ollama has the model pulled based on its 'name'.
-        return Ollama(model=model_config["name"])
+        # Stop sequences are left to the ReAct agent, which binds its own; Ollama rejects both being set
+        settings = generation_settings(model_name, "agent")
+        llama = load_settings(model_name)
+        return Ollama(
+            model=model_config["name"],
+            num_predict=settings["max_tokens"],
+            temperature=settings["temperature"],
+            top_p=settings["top_p"],
+            top_k=settings["top_k"],
+            num_ctx=llama.get("n_ctx"),
+            num_thread=llama.get("n_threads"),
+        ).configurable_fields(num_predict=ConfigurableField(id="num_predict")) # Lowered per call by a request's max_tokens
     elif model_config["type"] == "ncc":
         return NCCLLM(model_name=model_config["name"])
     else:
@@ -170,11 +182,13 @@ class AgentState(TypedDict):
     chat_history: List[BaseMessage]
     agent_outcome: Annotated[Union[AgentAction, AgentFinish, None], operator.attrgetter("agent_outcome")]
     intermediate_steps: Annotated[List[tuple[AgentAction, str]], operator.add]
+    max_tokens: Optional[int] # Per-request generation budget for every local agent call; set it in the graph's input
     # db_session: Session # Removed for now, using get_session() directly in tools
 
 # Agent Node
 class Agent:
     def __init__(self, model_name: str, tools: List[Runnable]):
+        self.model_name = model_name
         self.llm = _get_llm(model_name)
         self.tools = tools
         self.prompt = ChatPromptTemplate.from_messages([
@@ -186,7 +200,12 @@ class Agent:
         self.agent_executor = create_react_agent(self.llm, self.tools, self.prompt)
 
     def __call__(self, state: AgentState):
-        agent_outcome = self.agent_executor.invoke(state)
+        config = None
+        if state.get("max_tokens") and AI_MODELS[self.model_name]["type"] == "local":
+            # The budget can only lower the agent profile's max_tokens
+            budget = generation_settings(self.model_name, "agent", state["max_tokens"])["max_tokens"]
+            config = {"configurable": {"num_predict": budget}}
+        agent_outcome = self.agent_executor.invoke(state, config=config)
         return {"agent_outcome": agent_outcome}
 
 # Tool Node
@@ -227,6 +246,7 @@ def route_agent(state: AgentState):
 
 # Define the graph
 def create_agent_workflow(model_name: str):
+    """Callers may cap local generation per request with e.g. graph.invoke({"input": ..., "max_tokens": 256})."""
     workflow = StateGraph(AgentState)
 
     # Main Agent Node
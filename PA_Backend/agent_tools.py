@@ -4,7 +4,7 @@ from pathlib import Path
 from typing import Optional, List, Dict
 from fastapi import HTTPException
 from sqlmodel import Session
-from ncc_service import NCCService
+from ncc_service import get_ncc_service
 from routers import (
     brave_search,
     calendar_crud,
@@ -22,9 +22,6 @@ from routers.email_schemas import EmailCreate
 from routers.tasks_schemas import TaskCreate
 from routers.finance.schemas import TransactionCreate, AssetCreate, CategoryCreate
 
-# Initialize NCCService
-ncc_service = NCCService()
-
 # --- Project Root Configuration ---
 PROJECT_ROOT = Path(__file__).parent.parent.absolute()
 
@@ -303,7 +300,7 @@ async def run_ncc_compute_tool(python_code: str, input_data: Optional[str] = Non
     to the script via a temporary file (details to be handled by the NCC script).
     """
     try:
-        response = await ncc_service.run_compute_on_ncc(python_code, input_data)
+        response = await get_ncc_service().run_compute_on_ncc(python_code, input_data)
         return response
     except Exception as e:
         return {"error": f"NCC compute failed: {e}"}
@@ -0,0 +1,116 @@
+"""Benchmark: one SLURM job per prompt versus the warm NCC inference worker, without the cluster.
+
+Cold runs start ncc/inference.py once per prompt, paying the model load every time,
+as a per-prompt job does. Warm runs send the same prompts through NCCInferenceWorker
+to a local stand-in of the worker (ncc/inference_worker.py in a subprocess) over a
+temporary queue directory, so only the first prompt pays the load. Queue wait on
+the cluster is not modelled.
+
+Run from PA_Backend: python benchmarks/bench_ncc_worker.py [prompts] [load_seconds] [inference_seconds]
+"""
+import os
+import sys
+import time
+import shutil
+import asyncio
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ncc_worker import NCCInferenceWorker
+
+NCC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ncc")
+
+
+class LocalTransport:
+    """The SSHConnectionPool interface over the local filesystem and shell."""
+
+    async def execute(self, command: str):
+        process = await asyncio.create_subprocess_shell(command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        stdout, stderr = await process.communicate()
+        return stdout.decode().strip(), stderr.decode().strip()
+
+    async def put_bytes(self, data: bytes, path: str):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    async def get_bytes(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def rename(self, path: str, new_path: str):
+        os.rename(path, new_path)
+
+    async def remove(self, path: str):
+        os.remove(path)
+
+
+class LocalWorker(NCCInferenceWorker):
+    """Starts the worker as a local process instead of submitting it with sbatch."""
+
+    def __init__(self, queue_dir: str, env: dict):
+        super().__init__(LocalTransport(), queue_dir)
+        self.env = env
+        self.process = None
+
+    async def _start_or_find_worker(self) -> str:
+        if not self._prepared:
+            await self._prepare()
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(
+                [sys.executable, os.path.join(NCC_DIR, "inference_worker.py"), os.path.join(NCC_DIR, "inference.py"), self.queue_dir, "60"],
+                env=self.env, stdout=subprocess.DEVNULL,
+            )
+        return f"local-{self.process.pid}"
+
+
+def run_cold(prompts, env, work_dir):
+    latencies = []
+    for i, prompt in enumerate(prompts):
+        input_path, output_path = os.path.join(work_dir, f"cold-{i}.in"), os.path.join(work_dir, f"cold-{i}.out")
+        with open(input_path, "w") as f:
+            f.write(f"{prompt}\n")
+        started = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(NCC_DIR, "inference.py"), input_path, output_path], env=env, check=True)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run_warm(prompts, worker):
+    latencies = []
+    for prompt in prompts:
+        started = time.perf_counter()
+        await worker.infer(f"{prompt}\n")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def report(name, latencies):
+    total = sum(latencies)
+    steady = latencies[1:] or latencies
+    print(f"{name:<5}: first {latencies[0]:6.2f}s | later prompts avg {sum(steady) / len(steady):6.2f}s | total {total:6.2f}s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    load_seconds = sys.argv[2] if len(sys.argv) > 2 else "3"
+    inference_seconds = sys.argv[3] if len(sys.argv) > 3 else "0.2"
+    env = dict(os.environ, NCC_DUMMY_LOAD_SECONDS=load_seconds, NCC_DUMMY_INFERENCE_SECONDS=inference_seconds)
+    prompts = [f"Summarise document {i}" for i in range(count)]
+
+    work_dir = tempfile.mkdtemp(prefix="bench_ncc_worker_")
+    worker = LocalWorker(os.path.join(work_dir, "queue"), env)
+    try:
+        print(f"{count} prompts, model load {load_seconds}s, inference {inference_seconds}s")
+        report("cold", run_cold(prompts, env, work_dir))
+        report("warm", asyncio.run(run_warm(prompts, worker)))
+    finally:
+        if worker.process is not None:
+            worker.process.terminate()
+            worker.process.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
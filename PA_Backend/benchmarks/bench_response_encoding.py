@@ -0,0 +1,95 @@
+"""Benchmark: response serialisation CPU and payload bytes on the wire.
+
+Compares the stdlib json encoding used by JSONResponse with orjson (ORJSONResponse),
+and the identity, gzip and brotli sizes that CompressionMiddleware can negotiate,
+on payloads shaped like the gateway's largest responses.
+
+Run from PA_Backend: python benchmarks/bench_response_encoding.py [iterations]
+"""
+import sys
+import gzip
+import json
+import timeit
+
+import orjson
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def drive_listing(n=500):
+    return [{
+        "id": f"01ABCDEF{i:08d}",
+        "name": f"Quarterly report draft {i}.docx",
+        "size": 48213 + i,
+        "createdDateTime": "2025-05-01T10:15:00Z",
+        "lastModifiedDateTime": "2025-05-03T16:42:10Z",
+        "webUrl": f"https://onedrive.live.com/edit.aspx?resid=01ABCDEF{i:08d}",
+        "file": {"mimeType": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"},
+        "parentReference": {"driveId": "b!abc123", "path": "/drive/root:/Documents/Reports"},
+    } for i in range(n)]
+
+
+def jira_search(n=200):
+    return [{
+        "id": str(10000 + i),
+        "key": f"ASTRA-{i}",
+        "fields": {
+            "summary": f"Investigate latency regression in gateway route {i}",
+            "status": {"name": "In Progress", "statusCategory": {"key": "indeterminate"}},
+            "assignee": {"displayName": "Alex Example", "accountId": "5b10a2844c20165700ede21g"},
+            "labels": ["backend", "performance"],
+            "description": {"type": "doc", "version": 1, "content": [{"type": "paragraph", "content": [{"type": "text", "text": "Steps to reproduce " * 10}]}]},
+        },
+    } for i in range(n)]
+
+
+def brave_results(n=20):
+    return {"web": {"results": [{
+        "title": f"Result {i} for query",
+        "url": f"https://example.com/article/{i}",
+        "description": "A representative search snippet with several sentences of text. " * 3,
+        "age": "2 days ago",
+        "meta_url": {"hostname": "example.com", "path": f"/article/{i}"},
+    } for i in range(n)]}}
+
+
+def chat_history(n=100):
+    return [{
+        "message": f"Can you summarise what is on my calendar for day {i}?",
+        "response": "Here is a summary of your day: a stand-up at 9, a design review at 11 and a 1:1 at 3. " * 4,
+    } for i in range(n)]
+
+
+def stdlib_render(content) -> bytes:
+    # Mirrors starlette.responses.JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def orjson_render(content) -> bytes:
+    # Mirrors fastapi.responses.ORJSONResponse.render
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    payloads = {
+        "drive_listing": drive_listing(),
+        "jira_search": jira_search(),
+        "brave_results": brave_results(),
+        "chat_history": chat_history(),
+    }
+    print(f"{'payload':<14} {'json us':>9} {'orjson us':>10} {'speedup':>8} {'identity B':>11} {'gzip B':>8} {'br B':>8}")
+    for name, content in payloads.items():
+        json_us = min(timeit.repeat(lambda: stdlib_render(content), number=iterations, repeat=3)) / iterations * 1e6
+        orjson_us = min(timeit.repeat(lambda: orjson_render(content), number=iterations, repeat=3)) / iterations * 1e6
+        raw = orjson_render(content)
+        gzip_size = len(gzip.compress(raw, compresslevel=6))
+        br_size = len(brotli.compress(raw, quality=4)) if brotli else float("nan")
+        print(f"{name:<14} {json_us:9.1f} {orjson_us:10.1f} {json_us / orjson_us:7.1f}x {len(raw):11d} {gzip_size:8d} {br_size:8}")
+
+
+if __name__ == "__main__":
+    main()
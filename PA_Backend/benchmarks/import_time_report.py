@@ -0,0 +1,54 @@
+"""Import-time breakdown for the gateway.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and prints the
+slowest modules (cumulative time, which includes everything they import) plus a
+per-package total of self time. Compare runs to catch startup regressions.
+
+Run from PA_Backend: python benchmarks/import_time_report.py [top_n] [module]
+"""
+import os
+import sys
+import subprocess
+from collections import defaultdict
+
+
+def collect(module: str):
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    if result.returncode != 0:
+        print(f"warning: 'import {module}' exited with {result.returncode}:\n{result.stderr.splitlines()[-1] if result.stderr else ''}\n")
+    return rows
+
+
+def main():
+    top_n = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    module = sys.argv[2] if len(sys.argv) > 2 else "main"
+    rows = collect(module)
+    if not rows:
+        print("No import timings collected.")
+        return
+
+    print(f"Slowest modules by cumulative import time (import {module}):")
+    for name, _, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:top_n]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+
+    packages = defaultdict(int)
+    for name, self_us, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    print("\nSelf time by top-level package:")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top_n]:
+        print(f"  {self_us / 1000:9.1f} ms  {package}")
+    print(f"\nTotal: {sum(self_us for _, self_us, _ in rows) / 1000:.1f} ms across {len(rows)} modules")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,24 +10,31 @@ AI_MODELS = {
         "type": "local",
         "description": "Microsoft's Phi-3 Mini (3.8B parameters), suitable for general tasks on low-end hardware.",
         "model_path": os.getenv("PHI3_MINI_MODEL_PATH", "./models/phi-3-mini.gguf"),
+        "draft_model": os.getenv("PHI3_MINI_DRAFT_MODEL", "prompt_lookup"),
+        "generation": {"stop": ["User:", "Assistant:", "<|end|>"]},
     },
     "gemma-2b": {
         "name": "gemma-2b",
         "type": "local",
         "description": "Google's Gemma 2B, a lightweight general-purpose model.",
         "model_path": os.getenv("GEMMA_2B_MODEL_PATH", "./models/gemma-2b.gguf"),
+        "generation": {"stop": ["User:", "Assistant:", "<end_of_turn>"]},
     },
     "codegemma-2b": {
         "name": "codegemma-2b",
         "type": "local",
         "description": "Google's CodeGemma 2B, optimized for code generation and understanding.",
         "model_path": os.getenv("CODEGEMMA_2B_MODEL_PATH", "./models/codegemma-2b.gguf"),
+        "draft_model": os.getenv("CODEGEMMA_2B_DRAFT_MODEL", "prompt_lookup"),
+        "generation": {"max_tokens": 512, "temperature": 0.2, "stop": ["User:", "Assistant:", "<end_of_turn>"]},
     },
     "deepseek-coder-1.3b": {
         "name": "deepseek-coder-1.3b",
         "type": "local",
         "description": "DeepSeek Coder 1.3B, a small but capable model for coding tasks.",
         "model_path": os.getenv("DEEPSEEK_CODER_1_3B_MODEL_PATH", "./models/deepseek-coder-1.3b.gguf"),
+        "generation": {"max_tokens": 512, "temperature": 0.2, "stop": ["User:", "Assistant:", "<|EOT|>"]},
+        "llama": {"n_ctx": 4096},
     },
     "deepseek-llm": {
         "name": "deepseek-llm",
@@ -40,6 +47,26 @@ AI_MODELS = {
 
 DEFAULT_AI_MODEL = os.getenv("DEFAULT_AI_MODEL", "lightweight-local")
 
+# Generation Profiles (local models)
+# Settings resolve as defaults < the model's "generation" < the route profile < the request's
+# max_tokens budget, which can only lower max_tokens. "llama" in a model entry overrides load settings.
+LLM_GENERATION_DEFAULTS = {
+    "max_tokens": int(os.getenv("LLM_MAX_TOKENS", "256")),
+    "stop": ["User:", "Assistant:"],
+    "temperature": float(os.getenv("LLM_TEMPERATURE", "0.8")),
+    "top_p": 0.95,
+    "top_k": 40,
+}
+LLM_GENERATION_PROFILES = {
+    "chat": {},
+    "agent": {"max_tokens": 512, "temperature": 0.2}, # Tool calls want short, deterministic output
+}
+LLM_LOAD_DEFAULTS = {
+    "n_ctx": int(os.getenv("LLM_N_CTX", "2048")),
+    "n_batch": int(os.getenv("LLM_N_BATCH", "512")),
+    "n_threads": int(os.getenv("LLM_N_THREADS")) if os.getenv("LLM_N_THREADS") else None, # None: llama.cpp picks
+}
+
 
 
 # Database Config
@@ -52,6 +79,164 @@ NCC_PRIVATE_KEY_PATH = os.getenv("NCC_PRIVATE_KEY_PATH")
 NCC_REMOTE_JOB_DIR = os.getenv("NCC_REMOTE_JOB_DIR", "/path/to/remote/jobs")
 NCC_REMOTE_INFERENCE_SCRIPT_PATH = os.getenv("NCC_REMOTE_INFERENCE_SCRIPT_PATH", "/path/to/your/inference/script.py")
 NCC_REMOTE_VENV_PATH = os.getenv("NCC_REMOTE_VENV_PATH", "/path/to/your/venv/bin/activate")
+NCC_SSH_POOL_SIZE = int(os.getenv("NCC_SSH_POOL_SIZE", "4")) # Persistent SSH connections, opened on first use
+NCC_SSH_KEEPALIVE_SECONDS = int(os.getenv("NCC_SSH_KEEPALIVE_SECONDS", "30"))
+NCC_SSH_CONNECT_TIMEOUT_SECONDS = float(os.getenv("NCC_SSH_CONNECT_TIMEOUT_SECONDS", "15"))
+# One batched squeue per tick covers all in-flight jobs; the interval backs off while nothing changes
+NCC_MONITOR_MIN_INTERVAL_SECONDS = float(os.getenv("NCC_MONITOR_MIN_INTERVAL_SECONDS", "1"))
+NCC_MONITOR_MAX_INTERVAL_SECONDS = float(os.getenv("NCC_MONITOR_MAX_INTERVAL_SECONDS", "15"))
+# Jobs of the same kind submitted within the window go to SLURM as one job array
+NCC_BATCH_WINDOW_SECONDS = float(os.getenv("NCC_BATCH_WINDOW_SECONDS", "2")) # 0 submits every job on its own
+NCC_BATCH_MAX_SIZE = int(os.getenv("NCC_BATCH_MAX_SIZE", "16"))
+# /api/chat/stream sends a "progress" event this often while an NCC job is queued or running, so proxies keep the stream open
+NCC_STREAM_HEARTBEAT_SECONDS = float(os.getenv("NCC_STREAM_HEARTBEAT_SECONDS", "15"))
+# Warm worker: one long-lived allocation keeps the model loaded and answers prompts from a remote queue directory
+NCC_WORKER_ENABLED = os.getenv("NCC_WORKER_ENABLED", "false").lower() == "true"
+NCC_REMOTE_WORKER_SCRIPT_PATH = os.getenv("NCC_REMOTE_WORKER_SCRIPT_PATH", "/path/to/your/inference_worker.py")
+NCC_WORKER_QUEUE_DIR = os.getenv("NCC_WORKER_QUEUE_DIR", f"{NCC_REMOTE_JOB_DIR}/worker")
+NCC_WORKER_IDLE_SECONDS = int(os.getenv("NCC_WORKER_IDLE_SECONDS", "900")) # The worker exits after this long without a prompt
+NCC_WORKER_TIME_LIMIT = os.getenv("NCC_WORKER_TIME_LIMIT", "08:00:00")
+NCC_WORKER_LIVENESS_SECONDS = float(os.getenv("NCC_WORKER_LIVENESS_SECONDS", "30")) # How long a seen-alive worker is trusted before squeue is asked again
+NCC_WORKER_REQUEST_TIMEOUT_SECONDS = float(os.getenv("NCC_WORKER_REQUEST_TIMEOUT_SECONDS", "600"))
 
 # Brave Search API Config
 BRAVE_SEARCH_API_KEY = os.getenv("BRAVE_SEARCH_API_KEY")
+
+# Outbound HTTP Client Pool Config
+# Defaults apply to every upstream; override per upstream with e.g.
+# HTTP_FINANCE_MAX_CONNECTIONS=200 or HTTP_GCP_LLM_READ_TIMEOUT=300.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", "30"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+HTTP_ENABLE_HTTP2 = os.getenv("HTTP_ENABLE_HTTP2", "false").lower() == "true"
+
+# Upstream Circuit Breaker Config
+# Rolling window used for error-rate, slow-call-rate and p99 latency tracking
+BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "60"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_ERROR_RATE_THRESHOLD = float(os.getenv("BREAKER_ERROR_RATE_THRESHOLD", "0.5"))
+BREAKER_SLOW_CALL_RATE_THRESHOLD = float(os.getenv("BREAKER_SLOW_CALL_RATE_THRESHOLD", "0.8"))
+# A call counts as slow once it takes this fraction of its own timeout; calls reaching the timeout itself fail instead
+BREAKER_SLOW_CALL_TIMEOUT_FRACTION = float(os.getenv("BREAKER_SLOW_CALL_TIMEOUT_FRACTION", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_MAX_CALLS = int(os.getenv("BREAKER_HALF_OPEN_MAX_CALLS", "1"))
+# Bulkhead: max concurrent calls per upstream and how long to wait for a free slot
+BREAKER_MAX_CONCURRENCY = int(os.getenv("BREAKER_MAX_CONCURRENCY", "50"))
+BREAKER_BULKHEAD_WAIT_SECONDS = float(os.getenv("BREAKER_BULKHEAD_WAIT_SECONDS", "0.5"))
+# Adaptive timeouts: observed p99 * multiplier, never below the floor
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "3"))
+ADAPTIVE_TIMEOUT_FLOOR = float(os.getenv("ADAPTIVE_TIMEOUT_FLOOR", "2"))
+
+# Verified JWT Cache Config
+JWT_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "10000"))
+# Used for tokens without an 'exp' claim
+JWT_CACHE_DEFAULT_TTL = float(os.getenv("JWT_CACHE_DEFAULT_TTL", "300"))
+
+# Response Compression Config
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# Chat Admission Control Config
+# Per-user token bucket: sustained requests per minute and burst size
+CHAT_RATE_LIMIT_PER_MINUTE = float(os.getenv("CHAT_RATE_LIMIT_PER_MINUTE", "20"))
+CHAT_RATE_LIMIT_BURST = int(os.getenv("CHAT_RATE_LIMIT_BURST", "5"))
+# Per-backend concurrency cap and bounded wait queue (per gateway worker)
+CHAT_BACKEND_LIMITS = {
+    "local": {
+        # Defaults to the batching engine's slot count so concurrent chats can share decode steps
+        "max_concurrency": int(os.getenv("CHAT_LOCAL_MAX_CONCURRENCY", os.getenv("LLM_BATCH_MAX_SIZE", "4"))),
+        "max_queue": int(os.getenv("CHAT_LOCAL_MAX_QUEUE", "8")),
+    },
+    "gcp": {
+        "max_concurrency": int(os.getenv("CHAT_GCP_MAX_CONCURRENCY", "16")),
+        "max_queue": int(os.getenv("CHAT_GCP_MAX_QUEUE", "32")),
+    },
+    "ncc": {
+        "max_concurrency": int(os.getenv("CHAT_NCC_MAX_CONCURRENCY", "8")),
+        "max_queue": int(os.getenv("CHAT_NCC_MAX_QUEUE", "16")),
+    },
+}
+CHAT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "30"))
+
+# Multi-Worker Deployment Config
+GATEWAY_WORKERS = int(os.getenv("GATEWAY_WORKERS", "1"))
+# State shared by all gateway workers: "memory://" (single process) or a Redis-compatible URL
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "memory://")
+# When set, local LLM calls go to a dedicated inference process (inference_server.py)
+# instead of loading the model inside every gateway worker.
+LOCAL_LLM_SERVER_URL = os.getenv("LOCAL_LLM_SERVER_URL")
+
+# Chat History Window Config
+# Only the most recent turns that fit the backend's token budget are sent; older
+# turns are folded into a rolling summary stored on the Chat row.
+CHAT_HISTORY_MAX_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", "20"))
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "10"))
+# Share of the window (turns and tokens) kept when it overflows; the rest is folded at once, so the
+# prompt prefix (summary + window start) stays fixed until the window fills again
+CHAT_HISTORY_KEEP_FRACTION = float(os.getenv("CHAT_HISTORY_KEEP_FRACTION", "0.5"))
+CHAT_HISTORY_TOKEN_BUDGETS = {
+    "local": int(os.getenv("CHAT_HISTORY_LOCAL_TOKEN_BUDGET", "1024")),
+    "gcp": int(os.getenv("CHAT_HISTORY_GCP_TOKEN_BUDGET", "4096")),
+    "ncc": int(os.getenv("CHAT_HISTORY_NCC_TOKEN_BUDGET", "2048")),
+}
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "256"))
+CHAT_SUMMARY_FOLD_LIMIT = int(os.getenv("CHAT_SUMMARY_FOLD_LIMIT", "50")) # Max turns folded per request
+
+# Local Inference Executor Config
+# Worker threads shared by all local models. llama.cpp contexts are not thread-safe, so jobs for
+# the same model always run one at a time; more workers only let different models run in parallel.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_QUEUE_MAX = int(os.getenv("INFERENCE_QUEUE_MAX", "32"))
+
+# Continuous Batching Config (local llama.cpp)
+# Concurrent local requests share decode steps in one multi-sequence llama.cpp context.
+LLM_BATCHING_ENABLED = os.getenv("LLM_BATCHING_ENABLED", "true").lower() == "true"
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "4")) # Sequences decoded together
+LLM_BATCH_WAIT_MS = float(os.getenv("LLM_BATCH_WAIT_MS", "20")) # How long an idle engine waits to fill a batch
+LLM_BATCH_N_CTX = int(os.getenv("LLM_BATCH_N_CTX", "4096")) # KV cache shared by all sequences in the batch
+
+# Prefix KV Cache Config (local llama.cpp)
+# KV state of finished sequences is kept so the next chat turn only evaluates new tokens. 0 disables.
+LLM_PREFIX_CACHE_BYTES = int(os.getenv("LLM_PREFIX_CACHE_BYTES", str(1 << 30)))
+LLM_PREFIX_CACHE_MIN_TOKENS = int(os.getenv("LLM_PREFIX_CACHE_MIN_TOKENS", "32")) # Shorter prefixes are cheaper to re-evaluate
+
+# Local Model Registry Config
+# Local models load on first use (memory-mapped) and the least recently used idle
+# model is evicted once their combined size would exceed the budget.
+LLM_MODEL_RAM_BUDGET_BYTES = int(os.getenv("LLM_MODEL_RAM_BUDGET_BYTES", str(8 << 30)))
+LLM_MODEL_USE_MLOCK = os.getenv("LLM_MODEL_USE_MLOCK", "false").lower() == "true"
+
+# Response Cache Config
+# Opt-in cache of chat answers in front of the AI backends. Exact matches are looked up
+# in shared state; near-duplicates are matched by embedding similarity in each worker.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_SCOPE = os.getenv("RESPONSE_CACHE_SCOPE", "user") # "user" or "global" (global only for context-free prompts)
+RESPONSE_CACHE_SEMANTIC_ENABLED = os.getenv("RESPONSE_CACHE_SEMANTIC_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_EMBEDDING_MODEL = os.getenv("RESPONSE_CACHE_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY_THRESHOLD", "0.92"))
+RESPONSE_CACHE_MAX_SEMANTIC_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_SEMANTIC_ENTRIES", "5000"))
+
+# Speculative Decoding Config (local llama.cpp)
+# Models with a "draft_model" in AI_MODELS are verified against drafts from that smaller
+# model (or "prompt_lookup" n-gram drafts). Speculating models run unbatched, one request at a time.
+LLM_SPECULATIVE_ENABLED = os.getenv("LLM_SPECULATIVE_ENABLED", "false").lower() == "true"
+LLM_SPECULATIVE_DRAFT_TOKENS = int(os.getenv("LLM_SPECULATIVE_DRAFT_TOKENS", "4")) # Tokens proposed per verification pass
+
+# Backend Router Config
+# With no ai_backend selected, each chat goes to the eligible backend expected to finish
+# first, from per-backend EWMA latency, error rate and current admission queue depth.
+ROUTER_EWMA_ALPHA = float(os.getenv("ROUTER_EWMA_ALPHA", "0.2"))
+ROUTER_PRIOR_LATENCY_SECONDS = { # Starting estimates until real samples arrive
+    "local": float(os.getenv("ROUTER_PRIOR_LOCAL_SECONDS", "10")),
+    "gcp": float(os.getenv("ROUTER_PRIOR_GCP_SECONDS", "5")),
+    "ncc": float(os.getenv("ROUTER_PRIOR_NCC_SECONDS", "300")),
+}
+ROUTER_STATS_TTL_SECONDS = float(os.getenv("ROUTER_STATS_TTL_SECONDS", "600")) # Unsampled backends revert to their prior so they get retried
+ROUTER_LONG_PROMPT_TOKENS = int(os.getenv("ROUTER_LONG_PROMPT_TOKENS", "2000")) # Longer prompts prefer NCC
+ROUTER_OFFLOAD_BACKEND = os.getenv("ROUTER_OFFLOAD_BACKEND", "ncc") # Receives long and background requests
@@ -1,24 +1,63 @@
 
 import os
+import time
 from sqlmodel import create_engine, SQLModel
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
+from services.metrics import metrics, DB_POOL_CHECKOUT_SECONDS
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+asyncpg://user:password@db/app")
 
+class _TimedQueuePool(AsyncAdaptedQueuePool):
+    """Records how long each checkout waits for a connection, including opening a new one.
+
+    Timed here because the pool's "checkout" event fires only after the wait is over.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+
 # Create an async engine
-async_engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+async_engine = create_async_engine(DATABASE_URL, echo=True, future=True, poolclass=_TimedQueuePool)
+
+# Also used directly by code that outlives a request's get_session dependency (e.g. streamed responses)
+async_session = sessionmaker(
+    bind=async_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 async def get_session() -> AsyncSession:
-    async_session = sessionmaker(
-        bind=async_engine, class_=AsyncSession, expire_on_commit=False
-    )
     async with async_session() as session:
         yield session
 
+def _pool_status():
+    pool = async_engine.pool
+    for name in ("size", "checkedout", "overflow"):
+        method = getattr(pool, name, None) # NullPool/StaticPool do not track these
+        if method is not None:
+            yield {"state": name}, method()
+
+metrics.gauge_callback("gateway_db_pool_connections", "Database connection pool status.", _pool_status)
+
+# create_all only creates missing tables, so columns and indexes added to existing ones are applied here.
+# Each statement is idempotent and safe to run on every startup.
+_SCHEMA_UPGRADES = (
+    "ALTER TABLE chat ADD COLUMN IF NOT EXISTS summary VARCHAR",
+    "ALTER TABLE chat ADD COLUMN IF NOT EXISTS summary_through_message_id INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_message_chat_id_id ON message (chat_id, id)",
+)
+
 async def init_db():
     async with async_engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
+        for statement in _SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
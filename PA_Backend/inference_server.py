@@ -0,0 +1,75 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Optional, List, Dict
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from services.local_llm_service import local_llm_service
+from services.model_registry import model_registry
+from services.admission_control import AdmissionRejected
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Dedicated process that owns the local LLM. Gateway workers reach it through
+# LOCAL_LLM_SERVER_URL, so the model is loaded once no matter how many workers run.
+app = FastAPI(title="Local LLM Inference Server")
+
+
+class GenerateRequest(BaseModel):
+    prompt: str
+    chat_history: List[Dict] = []
+    context: Optional[List[Dict]] = None
+    model: Optional[str] = None # Registry model name; the server's default model when omitted
+    profile: str = "chat" # Generation profile from LLM_GENERATION_PROFILES
+    max_tokens: Optional[int] = None # Request budget; can only lower the profile's max_tokens
+
+
+class GenerateResponse(BaseModel):
+    response: str
+
+
+@app.on_event("startup")
+async def on_startup():
+    model_path = os.getenv("LOCAL_LLM_MODEL_PATH")
+    n_gpu_layers = int(os.getenv("LOCAL_LLM_N_GPU_LAYERS", "0"))
+    if not model_path:
+        raise RuntimeError("LOCAL_LLM_MODEL_PATH environment variable not set.")
+    await asyncio.to_thread(local_llm_service.load_model, model_path=model_path, n_gpu_layers=n_gpu_layers)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "model_path": local_llm_service._model_path, "models": model_registry.snapshot()}
+
+
+@app.post("/generate", response_model=GenerateResponse)
+async def generate(request: GenerateRequest):
+    # In-process path: the batching engine when available, otherwise the inference executor
+    try:
+        text = await local_llm_service.generate_in_process(request.prompt, request.chat_history, request.context, request.model, request.profile, request.max_tokens)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(int(e.retry_after))})
+    except Exception as e:
+        logger.error(f"Local LLM generation failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Local LLM generation failed: {e}")
+    return GenerateResponse(response=text)
+
+
+@app.post("/generate/stream")
+async def generate_stream(request: GenerateRequest):
+    # NDJSON: one {"token": ...} object per line, flushed as llama.cpp produces it
+    async def tokens():
+        async for token in local_llm_service.stream_in_process(request.prompt, request.chat_history, request.context, request.model, request.profile, request.max_tokens):
+            yield json.dumps({"token": token}) + "\n"
+
+    return StreamingResponse(tokens(), media_type="application/x-ndjson")
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("LOCAL_LLM_SERVER_PORT", "5001")))
@@ -0,0 +1,39 @@
+import sys
+import time
+import importlib
+import importlib.util
+import logging
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Seconds spent importing each module loaded through timed_import (includes its own imports)
+IMPORT_TIMINGS: Dict[str, float] = {}
+
+
+def lazy_import(name: str):
+    """Returns a module whose body only executes on first attribute access.
+
+    Use for heavy optional dependencies (googleapiclient, pandas, ...) that most
+    requests never touch, so they stay off the gateway's import path.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def timed_import(name: str):
+    """Imports a module eagerly and records how long it took in IMPORT_TIMINGS."""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMINGS[name] = time.perf_counter() - start
+    logger.debug(f"Imported {name} in {IMPORT_TIMINGS[name] * 1000:.1f} ms")
+    return module
@@ -2,7 +2,7 @@ import uvicorn
 from fastapi import FastAPI, HTTPException, Depends, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 import os
 from sqlmodel import select
@@ -11,17 +11,35 @@ import httpx
 from jose import jwt, JWTError
 from fastapi.security import OAuth2PasswordBearer
 from typing import Annotated, Optional, List
+import time
+import json
+import asyncio
 import logging # Import logging module
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-from database import init_db, get_session
+from config import GATEWAY_WORKERS, LOCAL_LLM_SERVER_URL, NCC_STREAM_HEARTBEAT_SECONDS
+from database import init_db, get_session, async_session
 from models import Chat, Message, ApplicationContext # Keep Chat and Message for history persistence
-from routers import email, calendar, tasks, documents, coding, brave_search # Keep these for now
+from lazy_imports import timed_import, IMPORT_TIMINGS # Router registration and startup import report
 from services.local_llm_service import local_llm_service # Import local LLM service
 from services.gcp_llm_service import gcp_llm_service # Import GCP LLM service
+from services.http_client_service import http_client_service # Shared pooled HTTP clients
+from services.circuit_breaker import circuit_breakers, CircuitOpenError # Per-upstream breakers
+from services.token_cache import verified_token_cache # Verified JWT cache
+from services.admission_control import admission_controller, AdmissionRejected # Chat load shedding
+from services.request_coalescer import request_coalescer # Single-flight upstream GETs
+from services.chat_history_service import chat_history_service # Windowed chat history
+from services.inference_executor import inference_executor # Off-loop local LLM worker pool
+from services.model_registry import model_registry # Lazily loaded, memory-capped local models
+from services.response_cache import response_cache # Opt-in exact/semantic chat answer cache
+from services.backend_router import backend_router # Latency-aware default AI backend selection
+from services.shared_state import shared_state # State shared across gateway workers
+from middleware.compression import CompressionMiddleware # Negotiated gzip/brotli compression
+from middleware.metrics import MetricsMiddleware # Per-route latency histograms
+from services.metrics import metrics, LLM_GENERATION_SECONDS, LLM_FIRST_TOKEN_SECONDS # Prometheus-format metrics registry
 
 # --- Environment Variables for Microservice URLs ---
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://localhost:8080")
@@ -33,7 +51,8 @@ GCP_LLM_CLOUD_RUN_URL = os.getenv("GCP_LLM_CLOUD_RUN_URL") # New environment var
 app = FastAPI(
     title="AI Agent Orchestration Server (API Gateway)",
     description="A FastAPI server acting as an API Gateway for microservices.",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse # orjson serialisation for every route, including routers
 )
 
 # --- CORS Middleware ---
@@ -46,10 +65,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Response Compression Middleware ---
+app.add_middleware(CompressionMiddleware)
+
+# --- Metrics Middleware (outermost, so latency includes compression) ---
+app.add_middleware(MetricsMiddleware)
+
 # --- JWT Authentication Dependency ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "super-secret-jwt-key")
 
 async def get_current_user_id(token: Annotated[str, Depends(oauth2_scheme)]) -> int:
+    # Tokens already verified by this process skip the HMAC check until they expire
+    user_id = verified_token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -57,14 +88,17 @@ async def get_current_user_id(token: Annotated[str, Depends(oauth2_scheme)]) ->
     )
     try:
         # Assuming the token is issued by the Auth service and contains user_id in 'sub' claim
-        payload = jwt.decode(token, os.getenv("JWT_SECRET_KEY", "super-secret-jwt-key"), algorithms=["HS256"])
-        user_id: int = int(payload.get("sub"))
-        if user_id is None:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=["HS256"])
+        subject = payload.get("sub")
+        if subject is None:
             logger.warning("User ID is None after JWT decoding.")
             raise credentials_exception
-        logger.info(f"User {user_id} authenticated successfully.")
+        user_id = int(subject)
+        verified_token_cache.put(token, user_id, payload.get("exp"))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"User {user_id} authenticated successfully.")
         return user_id
-    except JWTError as e:
+    except (JWTError, ValueError) as e:
         logger.error(f"JWT decoding error: {e}")
         raise credentials_exception
 
@@ -81,6 +115,94 @@ async def serve_test_page():
         logger.error(f"Test HTML page not found at: {file_path}")
         raise HTTPException(status_code=404, detail="Test HTML page not found.")
 
+# --- Upstream Resilience ---
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    logger.warning(f"Rejected call to upstream '{exc.upstream}': {exc.reason}")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, int(exc.retry_after)))},
+    )
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(max(1, int(exc.retry_after + 0.5)))},
+    )
+
+@app.get("/api/gateway/upstreams", summary="Upstream Circuit Breaker State")
+async def get_upstream_state():
+    return circuit_breakers.snapshot()
+
+@app.get("/api/gateway/admission", summary="Chat Admission Control State")
+async def get_admission_state():
+    return admission_controller.snapshot()
+
+@app.get("/api/gateway/coalescing", summary="Upstream GET Coalescing Stats")
+async def get_coalescing_state():
+    return request_coalescer.snapshot()
+
+@app.get("/api/gateway/routing", summary="Automatic AI Backend Routing Estimates")
+async def get_routing_state():
+    return backend_router.snapshot()
+
+@app.get("/api/gateway/response-cache", summary="Chat Response Cache Stats")
+async def get_response_cache_stats():
+    return response_cache.snapshot()
+
+@app.get("/api/gateway/inference", summary="Local Inference Executor, Model Registry and Batching State")
+async def get_inference_state():
+    models = model_registry.snapshot()
+    return {
+        "executor": inference_executor.snapshot(),
+        "models": models,
+        "batching": {
+            name: model.batching_engine.snapshot()
+            for name in models["models"]
+            if (model := model_registry.loaded(name)) is not None and model.batching_engine is not None
+        },
+    }
+
+# --- Metrics ---
+# Existing gateway state is read at scrape time rather than duplicated into counters
+_BREAKER_STATES = ("closed", "half_open", "open")
+
+def _breaker_samples(field: str):
+    for upstream, snap in circuit_breakers.snapshot().items():
+        if field == "state":
+            for state in _BREAKER_STATES:
+                yield {"upstream": upstream, "state": state}, 1 if snap["state"] == state else 0
+        else:
+            yield {"upstream": upstream}, snap[field]
+
+def _admission_samples(field: str):
+    for backend, snap in admission_controller.snapshot()["backends"].items():
+        yield {"backend": backend}, snap[field]
+
+metrics.gauge_callback("gateway_circuit_breaker_state", "Current circuit breaker state per upstream (1 = active state).", lambda: _breaker_samples("state"))
+metrics.gauge_callback("gateway_circuit_breaker_in_flight", "Calls currently in flight per upstream.", lambda: _breaker_samples("in_flight"))
+metrics.gauge_callback("gateway_circuit_breaker_timeout_seconds", "Current adaptive timeout per upstream.", lambda: _breaker_samples("timeout_seconds"))
+metrics.counter_callback("gateway_circuit_breaker_rejected_total", "Calls rejected by the breaker or bulkhead.", lambda: _breaker_samples("rejected_total"))
+metrics.counter_callback("gateway_circuit_breaker_opened_total", "Times each breaker has opened.", lambda: _breaker_samples("opened_total"))
+metrics.gauge_callback("gateway_chat_backend_active", "Chat requests currently running per AI backend.", lambda: _admission_samples("active"))
+metrics.gauge_callback("gateway_chat_backend_waiting", "Chat requests queued per AI backend.", lambda: _admission_samples("waiting"))
+metrics.counter_callback("gateway_chat_backend_admitted_total", "Chat requests admitted per AI backend.", lambda: _admission_samples("admitted_total"))
+metrics.counter_callback("gateway_chat_backend_rejected_total", "Chat requests shed per AI backend.", lambda: _admission_samples("rejected_total"))
+metrics.counter_callback("gateway_chat_rate_limited_total", "Chat requests rejected by the per-user rate limit.", lambda: [({}, admission_controller.rate_limited_total)])
+metrics.gauge_callback("gateway_coalescer_in_flight", "Distinct upstream GETs currently in flight.", lambda: [({}, request_coalescer.snapshot()["in_flight"])])
+metrics.counter_callback("gateway_coalescer_leaders_total", "Upstream GETs actually sent.", lambda: [({}, request_coalescer.leaders_total)])
+metrics.counter_callback("gateway_coalescer_coalesced_total", "GETs served by joining an in-flight request.", lambda: [({}, request_coalescer.coalesced_total)])
+metrics.counter_callback("gateway_jwt_cache_hits_total", "Verified-token cache hits.", lambda: [({}, verified_token_cache.hits)])
+metrics.counter_callback("gateway_jwt_cache_misses_total", "Verified-token cache misses.", lambda: [({}, verified_token_cache.misses)])
+
+@app.get("/metrics", summary="Prometheus Metrics", include_in_schema=False)
+async def get_metrics():
+    # Metrics are per worker; with GATEWAY_WORKERS > 1 each scrape reaches one process
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # --- Environment Detection ---
 def get_current_environment():
     if os.getenv("GCP_PROJECT"):
@@ -97,10 +219,18 @@ def get_current_environment():
 @app.on_event("startup")
 async def on_startup():
     logger.info("Application startup event triggered.")
+    if IMPORT_TIMINGS:
+        slowest = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in sorted(IMPORT_TIMINGS.items(), key=lambda item: item[1], reverse=True)[:5])
+        logger.info(f"Router import time: {sum(IMPORT_TIMINGS.values()) * 1000:.0f}ms total (slowest: {slowest})")
+    http_client_service.initialize()
     await init_db()
     logger.info("Database initialized.")
-    # Load local LLM model on startup if in a local environment
-    if get_current_environment() == "local":
+    # Load the embedding model before serving, so no /api/chat request pays for it (or finds it missing)
+    await response_cache.load_encoder()
+    # Load local LLM model on startup if in a local environment, unless a dedicated inference process serves it
+    if get_current_environment() == "local" and local_llm_service.is_remote:
+        logger.info(f"Local LLM served by inference process at {LOCAL_LLM_SERVER_URL}. Skipping in-process model load.")
+    elif get_current_environment() == "local":
         local_llm_model_path = os.getenv("LOCAL_LLM_MODEL_PATH")
         local_llm_n_gpu_layers = int(os.getenv("LOCAL_LLM_N_GPU_LAYERS", "0")) # Default to 0 for CPU
         if local_llm_model_path:
@@ -116,74 +246,202 @@ async def on_startup():
     else:
         logger.info("GCP_LLM_CLOUD_RUN_URL not set. GCP LLM service will not be initialized.")
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    logger.info("Application shutdown event triggered.")
+    await http_client_service.close()
+    await shared_state.close()
+    inference_executor.shutdown()
+
 # --- Root Endpoint ---
 @app.get("/", summary="Root Endpoint")
 async def read_root():
     return {"message": "Welcome to the AI Agent Orchestration Server (API Gateway)!"}
 
-# --- Proxy Endpoints for Auth Service ---
-@app.api_route("/api/auth/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
-async def proxy_auth_service(path: str, request: Request):
-    async with httpx.AsyncClient() as client:
-        url = f"{AUTH_SERVICE_URL}/auth/{path}"
-        headers = {k: v for k, v in request.headers.items() if k.lower() not in ["host", "authorization"]}
-        if request.headers.get("authorization"):
-            headers["Authorization"] = request.headers["authorization"]
-        
-        try:
+# --- Upstream Proxying ---
+# "stream" forwards request and response bodies chunk by chunk; "buffered" reads the
+# whole upstream body before replying. Neither mode decodes JSON.
+GATEWAY_PROXY_MODE = os.getenv("GATEWAY_PROXY_MODE", "stream").lower()
+
+# Hop-by-hop headers are connection-specific and must not be forwarded (RFC 7230 6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade",
+}
+
+def _forwardable_request_headers(request: Request) -> dict:
+    return {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() != "host"}
+
+def _forwardable_response_headers(response: httpx.Response, decoded: bool) -> dict:
+    excluded = set(HOP_BY_HOP_HEADERS)
+    if decoded:
+        # httpx has already decompressed the body, so the upstream framing no longer applies
+        excluded.update({"content-encoding", "content-length"})
+    return {k: v for k, v in response.headers.items() if k.lower() not in excluded}
+
+async def _proxy_request(upstream: str, url: str, request: Request, headers: dict) -> Response:
+    client = http_client_service.get_client(upstream)
+    async with circuit_breakers.get(upstream).guard() as call:
+        if GATEWAY_PROXY_MODE == "buffered":
             response = await client.request(
                 method=request.method,
                 url=url,
                 headers=headers,
                 content=await request.body(),
-                params=request.query_params
+                params=request.query_params,
+                timeout=call.timeout
+            )
+            if response.status_code >= 500:
+                call.fail()
+            return Response(
+                content=response.content,
+                status_code=response.status_code,
+                headers=_forwardable_response_headers(response, decoded=True)
             )
-            return JSONResponse(content=response.json(), status_code=response.status_code)
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=500, detail=f"Auth service communication error: {exc}")
-        except httpx.HTTPStatusError as exc:
-            raise HTTPException(status_code=exc.response.status_code, detail=exc.response.text)
+
+        has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+        upstream_request = client.build_request(
+            method=request.method,
+            url=url,
+            headers=headers,
+            content=request.stream() if has_body else None,
+            params=request.query_params,
+            timeout=call.timeout
+        )
+        response = await client.send(upstream_request, stream=True)
+        if response.status_code >= 500:
+            call.fail()
+
+    async def _relay():
+        # finally runs on completion and on client disconnect (the generator is closed), so the
+        # pooled upstream connection is always returned; a background task would be skipped on disconnect
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await response.aclose()
+
+    # Raw bytes keep the upstream content-encoding, so its headers stay valid as-is
+    return StreamingResponse(
+        _relay(),
+        status_code=response.status_code,
+        headers=_forwardable_response_headers(response, decoded=False),
+    )
+
+# --- Proxy Endpoints for Auth Service ---
+@app.api_route("/api/auth/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+async def proxy_auth_service(path: str, request: Request):
+    url = f"{AUTH_SERVICE_URL}/auth/{path}"
+    headers = _forwardable_request_headers(request)
+
+    try:
+        return await _proxy_request("auth", url, request, headers)
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=500, detail=f"Auth service communication error: {exc}")
 
 # --- Proxy Endpoints for Finance Service ---
 @app.api_route("/api/finance/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
 async def proxy_finance_service(path: str, request: Request, user_id: Annotated[int, Depends(get_current_user_id)]):
-    async with httpx.AsyncClient() as client:
-        url = f"{FINANCE_SERVICE_URL}/finance/{path}"
-        headers = {k: v for k, v in request.headers.items() if k.lower() not in ["host"]}
-        # Pass user_id to finance service, potentially in a custom header or as part of the body if needed
-        headers["X-User-ID"] = str(user_id) # Example: pass user_id in a custom header
-        
-        try:
-            response = await client.request(
-                method=request.method,
-                url=url,
-                headers=headers,
-                content=await request.body(),
-                params=request.query_params
-            )
-            return JSONResponse(content=response.json(), status_code=response.status_code)
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=500, detail=f"Finance service communication error: {exc}")
-        except httpx.HTTPStatusError as exc:
-            raise HTTPException(status_code=exc.response.status_code, detail=exc.response.text)
+    url = f"{FINANCE_SERVICE_URL}/finance/{path}"
+    headers = _forwardable_request_headers(request)
+    headers.pop("x-user-id", None) # Never trust a client-supplied user ID
+    # Pass user_id to finance service, potentially in a custom header or as part of the body if needed
+    headers["X-User-ID"] = str(user_id) # Example: pass user_id in a custom header
+
+    try:
+        return await _proxy_request("finance", url, request, headers)
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=500, detail=f"Finance service communication error: {exc}")
 
 # --- AI Chatbot Endpoint ---
 class UserMessageInput(BaseModel):
     message: str
     context: Optional[List[ApplicationContext]] = None
     ai_backend: Optional[str] = None # Add field for AI backend selection
+    priority: Optional[str] = None # "background" lets automatic routing send the request to NCC
+    max_latency_seconds: Optional[float] = None # Automatic routing prefers backends expected to finish within this
 
 class AIChatResponse(BaseModel):
     final_answer: str
     thinking: str
     session_id: str
 
+async def _generate_via_ncc_service(user_id: int, user_input: UserMessageInput, chat_history: List[dict]):
+    client = http_client_service.get_client("ai_chatbot")
+    async with circuit_breakers.get("ai_chatbot").guard() as call:
+        ai_response = await client.post(
+            f"{AI_CHATBOT_SERVICE_URL}/ai-chat/message",
+            json={
+                "user_id": user_id,
+                "message": user_input.message,
+                "chat_history": chat_history,
+                "context": [c.dict() for c in user_input.context] if user_input.context else []
+            },
+            timeout=call.timeout
+        )
+        if ai_response.status_code >= 500:
+            call.fail()
+    ai_response.raise_for_status()
+    ai_data = ai_response.json()
+    return ai_data.get("final_answer"), ai_data.get("thinking"), ai_data.get("session_id")
+
+def _resolve_backend_pool(selected_backend: Optional[str], current_env: str) -> Optional[str]:
+    """Maps the requested ai_backend (or the environment default) to an admission-control pool."""
+    if selected_backend == "backendLocal":
+        return "local"
+    if selected_backend in ("gcp", "ncc"):
+        return selected_backend
+    if selected_backend is None and current_env in ("local", "gcp", "ncc"):
+        return current_env
+    return None
+
+_BACKEND_SELECTIONS = {"local": "backendLocal", "gcp": "gcp", "ncc": "ncc"}
+
+def _route_backend(user_input: UserMessageInput, current_env: str) -> Optional[str]:
+    """Picks an ai_backend for a chat that did not select one; None when no backend is usable here."""
+    eligible = []
+    for pool_name in _BACKEND_SELECTIONS:
+        try:
+            _check_backend_available(pool_name, current_env)
+        except HTTPException:
+            continue
+        eligible.append(pool_name)
+    # ~4 characters per token is close enough to tell long prompts from short ones
+    prompt_chars = len(user_input.message) + sum(len(c.activeItemContent or "") for c in user_input.context or [])
+    pool_name, _ = backend_router.choose(eligible, prompt_chars // 4, user_input.priority, user_input.max_latency_seconds)
+    return _BACKEND_SELECTIONS.get(pool_name)
+
+async def _cancel_on_disconnect(request: Request, awaitable):
+    """Awaits `awaitable`, cancelling it and answering 499 if the client disconnects first."""
+    work = asyncio.ensure_future(awaitable)
+
+    async def _watch():
+        # The body has already been read, so the next message is the disconnect
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+
+    watcher = asyncio.create_task(_watch())
+    try:
+        await asyncio.wait((work, watcher), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not work.done():
+            work.cancel() # Queued local jobs are dropped, running ones stop at the next token
+            await asyncio.gather(work, return_exceptions=True)
+    if work.cancelled() and watcher.done() and not watcher.cancelled():
+        raise HTTPException(status_code=499, detail="Client closed the request before the answer was ready.")
+    return work.result()
+
 @app.post("/api/chat", response_model=AIChatResponse)
 async def chat_with_ai(
+    request: Request,
     user_input: UserMessageInput,
     user_id: Annotated[int, Depends(get_current_user_id)],
     session: AsyncSession = Depends(get_session)
 ):
+    # Shed abusive clients before doing any database or model work
+    await admission_controller.check_rate_limit(user_id)
+
     # 1. Retrieve chat history for the user
     # For simplicity, let's assume one chat per user for now, or create a new one if none exists
     chat = (await session.execute(select(Chat).where(Chat.user_id == user_id))).scalars().first()
@@ -193,98 +451,99 @@ async def chat_with_ai(
         await session.commit()
         await session.refresh(chat)
 
-    messages = (await session.execute(select(Message).where(Message.chat_id == chat.id).order_by(Message.created_at))).scalars().all()
-    
-    chat_history = [{"message": msg.message, "response": msg.response} for msg in messages]
-
     current_env = get_current_environment()
-    selected_backend = user_input.ai_backend
+    selected_backend = user_input.ai_backend or _route_backend(user_input, current_env)
+
+    # Recent turns that fit the backend's token budget, preceded by the rolling summary of older ones
+    chat_history = await chat_history_service.load(session, chat, _resolve_backend_pool(selected_backend, current_env))
 
     final_answer = ""
     thinking_process = ""
     session_id = "default_session" # Placeholder
 
     try:
-        if selected_backend == "backendLocal":
-            if current_env != "local":
-                raise HTTPException(status_code=400, detail=f"Backend Local AI can only be used in 'local' environment. Current environment: '{current_env}'.")
-            # Use local LLM service
-            final_answer = local_llm_service.generate_response(
-                prompt=user_input.message,
-                chat_history=chat_history,
-                context=[c.dict() for c in user_input.context] if user_input.context else []
-            )
-            thinking_process = "Generated by local LLM."
-        elif selected_backend == "gcp":
-            if current_env != "gcp":
-                raise HTTPException(status_code=400, detail=f"GCP AI can only be used in 'gcp' environment. Current environment: '{current_env}'.")
-            if not gcp_llm_service._cloud_run_url:
-                raise HTTPException(status_code=500, detail="GCP LLM service not configured. GCP_LLM_CLOUD_RUN_URL environment variable is missing.")
-            final_answer = await gcp_llm_service.generate_response(
-                prompt=user_input.message,
-                chat_history=chat_history,
-                context=[c.dict() for c in user_input.context] if user_input.context else []
-            )
-            thinking_process = "Generated by GCP LLM."
-        elif selected_backend == "ncc":
-            if current_env != "ncc" and AI_CHATBOT_SERVICE_URL == "http://localhost:8001": # Assuming localhost:8001 is for local dev of NCC service
-                raise HTTPException(status_code=400, detail=f"NCC AI can only be used in 'ncc' environment or with a configured AI_CHATBOT_SERVICE_URL. Current environment: '{current_env}'.")
-            async with httpx.AsyncClient() as client:
-                ai_response = await client.post(
-                    f"{AI_CHATBOT_SERVICE_URL}/ai-chat/message",
-                    json={
-                        "user_id": user_id,
-                        "message": user_input.message,
-                        "chat_history": chat_history,
-                        "context": [c.dict() for c in user_input.context] if user_input.context else []
-                    }
-                )
-                ai_response.raise_for_status()
-                ai_data = ai_response.json()
-                final_answer = ai_data.get("final_answer")
-                thinking_process = ai_data.get("thinking")
-                session_id = ai_data.get("session_id")
-        elif selected_backend is None:
-            # Default routing if no backend is explicitly selected by the frontend
-            if current_env == "local":
-                # Fallback to local LLM if running locally and no specific backend chosen
-                final_answer = local_llm_service.generate_response(
-                    prompt=user_input.message,
-                    chat_history=chat_history,
-                    context=[c.dict() for c in user_input.context] if user_input.context else []
-                )
-                thinking_process = "Generated by default local LLM."
-            elif current_env == "gcp":
-                if not gcp_llm_service._cloud_run_url:
-                    raise HTTPException(status_code=500, detail="GCP LLM service not configured for default routing. GCP_LLM_CLOUD_RUN_URL environment variable is missing.")
-                final_answer = await gcp_llm_service.generate_response(
-                    prompt=user_input.message,
-                    chat_history=chat_history,
-                    context=[c.dict() for c in user_input.context] if user_input.context else []
-                )
-                thinking_process = "Generated by default GCP LLM."
-            elif current_env == "ncc":
-                # Fallback to NCC if running on NCC and no specific backend chosen
-                async with httpx.AsyncClient() as client:
-                    ai_response = await client.post(
-                        f"{AI_CHATBOT_SERVICE_URL}/ai-chat/message",
-                        json={
-                            "user_id": user_id,
-                            "message": user_input.message,
-                            "chat_history": chat_history,
-                            "context": [c.dict() for c in user_input.context] if user_input.context else []
-                        }
-                    )
-                    ai_response.raise_for_status()
-                    ai_data = ai_response.json()
-                    final_answer = ai_data.get("final_answer")
-                    thinking_process = ai_data.get("thinking")
-                    session_id = ai_data.get("session_id")
-            else:
-                raise HTTPException(status_code=501, detail=f"No default AI backend configured for environment '{current_env}'. Please select an AI backend.")
-        else:
+        pool_name = _resolve_backend_pool(selected_backend, current_env)
+        if pool_name is None and selected_backend is None:
+            raise HTTPException(status_code=501, detail=f"No default AI backend configured for environment '{current_env}'. Please select an AI backend.")
+        if pool_name is None:
             raise HTTPException(status_code=400, detail=f"AI backend '{selected_backend}' is not a valid selection or not supported in current environment '{current_env}'.")
 
+        # Repeated questions are answered from the response cache without touching a backend
+        request_context = [c.dict() for c in user_input.context] if user_input.context else []
+        cached = await response_cache.lookup(user_id, pool_name, user_input.message, request_context)
+        if cached is not None:
+            final_answer = cached["final_answer"]
+            thinking_process = cached["thinking"] # The session id stays this request's own
+        else:
+            async def _generate():
+                nonlocal final_answer, thinking_process, session_id
+                async with admission_controller.pool(pool_name).admit():
+                    generation_started = time.perf_counter()
+                    generation_outcome = "error"
+                    try:
+                        if selected_backend == "backendLocal":
+                            if current_env != "local":
+                                raise HTTPException(status_code=400, detail=f"Backend Local AI can only be used in 'local' environment. Current environment: '{current_env}'.")
+                            # Use local LLM service
+                            final_answer = await local_llm_service.agenerate(
+                                prompt=user_input.message,
+                                chat_history=chat_history,
+                                context=[c.dict() for c in user_input.context] if user_input.context else []
+                            )
+                            thinking_process = "Generated by local LLM."
+                        elif selected_backend == "gcp":
+                            if current_env != "gcp":
+                                raise HTTPException(status_code=400, detail=f"GCP AI can only be used in 'gcp' environment. Current environment: '{current_env}'.")
+                            if not gcp_llm_service._cloud_run_url:
+                                raise HTTPException(status_code=500, detail="GCP LLM service not configured. GCP_LLM_CLOUD_RUN_URL environment variable is missing.")
+                            final_answer = await gcp_llm_service.generate_response(
+                                prompt=user_input.message,
+                                chat_history=chat_history,
+                                context=[c.dict() for c in user_input.context] if user_input.context else []
+                            )
+                            thinking_process = "Generated by GCP LLM."
+                        elif selected_backend == "ncc":
+                            if current_env != "ncc" and AI_CHATBOT_SERVICE_URL == "http://localhost:8001": # Assuming localhost:8001 is for local dev of NCC service
+                                raise HTTPException(status_code=400, detail=f"NCC AI can only be used in 'ncc' environment or with a configured AI_CHATBOT_SERVICE_URL. Current environment: '{current_env}'.")
+                            final_answer, thinking_process, session_id = await _generate_via_ncc_service(user_id, user_input, chat_history)
+                        elif selected_backend is None:
+                            # Default routing if no backend is explicitly selected by the frontend
+                            if current_env == "local":
+                                # Fallback to local LLM if running locally and no specific backend chosen
+                                final_answer = await local_llm_service.agenerate(
+                                    prompt=user_input.message,
+                                    chat_history=chat_history,
+                                    context=[c.dict() for c in user_input.context] if user_input.context else []
+                                )
+                                thinking_process = "Generated by default local LLM."
+                            elif current_env == "gcp":
+                                if not gcp_llm_service._cloud_run_url:
+                                    raise HTTPException(status_code=500, detail="GCP LLM service not configured for default routing. GCP_LLM_CLOUD_RUN_URL environment variable is missing.")
+                                final_answer = await gcp_llm_service.generate_response(
+                                    prompt=user_input.message,
+                                    chat_history=chat_history,
+                                    context=[c.dict() for c in user_input.context] if user_input.context else []
+                                )
+                                thinking_process = "Generated by default GCP LLM."
+                            elif current_env == "ncc":
+                                # Fallback to NCC if running on NCC and no specific backend chosen
+                                final_answer, thinking_process, session_id = await _generate_via_ncc_service(user_id, user_input, chat_history)
+                            else:
+                                raise HTTPException(status_code=501, detail=f"No default AI backend configured for environment '{current_env}'. Please select an AI backend.")
+                        else:
+                            raise HTTPException(status_code=400, detail=f"AI backend '{selected_backend}' is not a valid selection or not supported in current environment '{current_env}'.")
+                        generation_outcome = "success"
+                    finally:
+                        generation_seconds = time.perf_counter() - generation_started
+                        LLM_GENERATION_SECONDS.observe(generation_seconds, backend=pool_name, outcome=generation_outcome)
+                        backend_router.record(pool_name, generation_seconds, generation_outcome == "success")
+            # Starlette never cancels a plain handler when its client goes away, so watch for it here
+            await _cancel_on_disconnect(request, _generate())
+            await response_cache.store(
+                user_id, pool_name, user_input.message, request_context,
+                {"final_answer": final_answer, "thinking": thinking_process},
+            )
+
         # 3. Persist the new user message and AI response
         new_message = Message(
             chat_id=chat.id,
@@ -298,6 +557,8 @@ async def chat_with_ai(
 
         return AIChatResponse(final_answer=final_answer, thinking=thinking_process, session_id=session_id)
 
+    except (HTTPException, CircuitOpenError, AdmissionRejected):
+        raise
     except httpx.RequestError as exc:
         raise HTTPException(status_code=500, detail=f"Communication error with AI service: {exc}")
     except httpx.HTTPStatusError as exc:
@@ -305,16 +566,156 @@ async def chat_with_ai(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred during AI processing: {e}")
 
+# --- Streaming AI Chat Endpoint ---
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _check_backend_available(pool_name: str, current_env: str):
+    """Same environment checks /api/chat applies, raised before any bytes are streamed."""
+    if pool_name == "local" and current_env != "local":
+        raise HTTPException(status_code=400, detail=f"Backend Local AI can only be used in 'local' environment. Current environment: '{current_env}'.")
+    if pool_name == "gcp":
+        if current_env != "gcp":
+            raise HTTPException(status_code=400, detail=f"GCP AI can only be used in 'gcp' environment. Current environment: '{current_env}'.")
+        if not gcp_llm_service._cloud_run_url:
+            raise HTTPException(status_code=500, detail="GCP LLM service not configured. GCP_LLM_CLOUD_RUN_URL environment variable is missing.")
+    if pool_name == "ncc" and current_env != "ncc" and AI_CHATBOT_SERVICE_URL == "http://localhost:8001":
+        raise HTTPException(status_code=400, detail=f"NCC AI can only be used in 'ncc' environment or with a configured AI_CHATBOT_SERVICE_URL. Current environment: '{current_env}'.")
+
+async def _stream_tokens(pool_name: str, user_id: int, user_input: UserMessageInput, chat_history: List[dict], result: dict):
+    context = [c.dict() for c in user_input.context] if user_input.context else []
+    if pool_name == "local":
+        result["thinking"] = "Generated by local LLM."
+        async for token in local_llm_service.astream(user_input.message, chat_history, context):
+            yield token
+    elif pool_name == "gcp":
+        result["thinking"] = "Generated by GCP LLM."
+        async for token in gcp_llm_service.stream_response(user_input.message, chat_history, context):
+            yield token
+    else:
+        # The AI chatbot service returns NCC output only once the SLURM job has finished;
+        # until then a None marks each heartbeat, so the idle stream is not timed out
+        job = asyncio.ensure_future(_generate_via_ncc_service(user_id, user_input, chat_history))
+        try:
+            while not (await asyncio.wait((job,), timeout=NCC_STREAM_HEARTBEAT_SECONDS))[0]:
+                yield None
+        finally:
+            job.cancel() # No-op once finished; stops the request if the client has gone
+        final_answer, result["thinking"], result["session_id"] = job.result()
+        yield final_answer or ""
+
+@app.post("/api/chat/stream", summary="Stream an AI chat response as server-sent events")
+async def chat_with_ai_stream(
+    user_input: UserMessageInput,
+    user_id: Annotated[int, Depends(get_current_user_id)],
+    session: AsyncSession = Depends(get_session)
+):
+    """Events: "token" ({"text"}) as text is produced, then "done" ({"final_answer", "thinking",
+    "session_id"}) once the message is persisted, or "error" ({"detail"}) if generation fails.
+    While an NCC job is still queued or running, "progress" ({"elapsed_seconds"}) is sent every
+    NCC_STREAM_HEARTBEAT_SECONDS instead."""
+    await admission_controller.check_rate_limit(user_id)
+
+    chat = (await session.execute(select(Chat).where(Chat.user_id == user_id))).scalars().first()
+    if not chat:
+        chat = Chat(user_id=user_id) # Assuming Chat model has user_id
+        session.add(chat)
+        await session.commit()
+        await session.refresh(chat)
+
+    current_env = get_current_environment()
+    selected_backend = user_input.ai_backend or _route_backend(user_input, current_env)
+    pool_name = _resolve_backend_pool(selected_backend, current_env)
+    if pool_name is None and selected_backend is None:
+        raise HTTPException(status_code=501, detail=f"No default AI backend configured for environment '{current_env}'. Please select an AI backend.")
+    if pool_name is None:
+        raise HTTPException(status_code=400, detail=f"AI backend '{selected_backend}' is not a valid selection or not supported in current environment '{current_env}'.")
+    _check_backend_available(pool_name, current_env)
+
+    chat_history = await chat_history_service.load(session, chat, pool_name)
+    await session.commit() # Persist any summary update; the dependency session closes before streaming
+    chat_id = chat.id
+
+    async def event_stream():
+        async with admission_controller.pool(pool_name).admit():
+            # Admission is decided on the first step, which runs before the response starts
+            yield None
+            result = {"thinking": "", "session_id": "default_session"}
+            parts = []
+            generation_started = time.perf_counter()
+            generation_outcome = "error"
+            try:
+                async for token in _stream_tokens(pool_name, user_id, user_input, chat_history, result):
+                    if token is None:
+                        yield _sse("progress", {"elapsed_seconds": round(time.perf_counter() - generation_started)})
+                        continue
+                    if not parts:
+                        LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - generation_started, backend=pool_name)
+                    parts.append(token)
+                    yield _sse("token", {"text": token})
+                generation_outcome = "success"
+            except Exception as e:
+                logger.error(f"Streaming chat generation failed for user {user_id}: {e}")
+                yield _sse("error", {"detail": f"An unexpected error occurred during AI processing: {e}"})
+                return
+            finally:
+                generation_seconds = time.perf_counter() - generation_started
+                LLM_GENERATION_SECONDS.observe(generation_seconds, backend=pool_name, outcome=generation_outcome)
+                backend_router.record(pool_name, generation_seconds, generation_outcome == "success")
+
+        final_answer = "".join(parts)
+        async with async_session() as stream_session:
+            stream_session.add(Message(chat_id=chat_id, user_id=user_id, message=user_input.message, response=final_answer))
+            await stream_session.commit()
+        yield _sse("done", {"final_answer": final_answer, **result})
+
+    events = event_stream()
+    await events.__anext__() # Raises AdmissionRejected here, while a 503 can still be returned
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # --- Routers for other existing Python services (will be updated to use get_current_user_id) ---
-app.include_router(email.router, prefix="/api", tags=["email"])
-app.include_router(calendar.router, prefix="/api", tags=["calendar"])
-app.include_router(tasks.router, prefix="/api", tags=["tasks"])
-app.include_router(documents.router, prefix="/api", tags=["documents"])
-app.include_router(coding.router, prefix="/api", tags=["coding"])
-app.include_router(brave_search.router, prefix="/api", tags=["brave_search"])
-app.include_router(outlook.router, prefix="/api", tags=["outlook"]) # New Outlook router
-app.include_router(todo.router, prefix="/api", tags=["todo"]) # New To Do router
+# (router module, tag, env vars that must all be set for the integration to be registered).
+# Routers are imported here, after get_current_user_id exists, because several import it from main.
+INTEGRATION_ROUTERS = [
+    ("routers.email", "email", []),
+    ("routers.calendar", "calendar", []),
+    ("routers.tasks", "tasks", []),
+    ("routers.documents", "documents", []),
+    ("routers.coding", "coding", []),
+    ("routers.brave_search", "brave_search", ["BRAVE_SEARCH_API_KEY"]),
+    ("routers.outlook", "outlook", ["OUTLOOK_TENANT_ID", "OUTLOOK_CLIENT_ID", "OUTLOOK_CLIENT_SECRET"]),
+    ("routers.todo", "todo", ["TODO_TENANT_ID", "TODO_CLIENT_ID", "TODO_CLIENT_SECRET"]),
+    ("routers.onedrive", "onedrive", ["ONEDRIVE_TENANT_ID", "ONEDRIVE_CLIENT_ID", "ONEDRIVE_CLIENT_SECRET"]),
+    ("routers.jira", "jira", ["JIRA_CLIENT_ID", "JIRA_CLIENT_SECRET", "JIRA_SITE_URL"]),
+]
+
+def _register_integration_routers():
+    for module_name, tag, required_env in INTEGRATION_ROUTERS:
+        missing = [name for name in required_env if not os.getenv(name)]
+        if missing:
+            logger.info(f"Skipping '{tag}' integration; not configured (missing {', '.join(missing)}).")
+            continue
+        try:
+            module = timed_import(module_name)
+        except ImportError as e:
+            logger.error(f"Skipping '{tag}' integration; failed to import {module_name}: {e}")
+            continue
+        app.include_router(module.router, prefix="/api", tags=[tag])
+
+_register_integration_routers()
+
+@app.get("/api/gateway/startup", summary="Router Import-Time Report")
+async def get_startup_report():
+    return {
+        "router_import_seconds": dict(sorted(IMPORT_TIMINGS.items(), key=lambda item: item[1], reverse=True)),
+        "total_router_import_seconds": sum(IMPORT_TIMINGS.values()),
+    }
 
 # --- Main Block for Running with Uvicorn (Optional) ---
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=5000, reload=True)
\ No newline at end of file
+    # Reload only works with a single worker; GATEWAY_WORKERS > 1 forks independent gateway processes
+    uvicorn.run("main:app", host="0.0.0.0", port=5000, reload=GATEWAY_WORKERS == 1, workers=GATEWAY_WORKERS)
\ No newline at end of file
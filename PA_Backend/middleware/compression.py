@@ -0,0 +1,170 @@
+import io
+import gzip
+from typing import Optional, List, Tuple
+
+from config import COMPRESSION_MINIMUM_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Only compress payloads that actually shrink. Event streams are left alone so
+# every event reaches the client as soon as it is written.
+COMPRESSIBLE_CONTENT_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "text/xml",
+    "image/svg+xml",
+)
+
+
+def _parse_accept_encoding(value: str) -> dict:
+    encodings = {}
+    for part in value.split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[token.strip().lower()] = quality
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    encodings = _parse_accept_encoding(accept_encoding)
+    wildcard = encodings.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for encoding in candidates:
+        quality = encodings.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._buffer = io.BytesIO()
+            self._gzip = gzip.GzipFile(mode="wb", fileobj=self._buffer, compresslevel=COMPRESSION_GZIP_LEVEL)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        self._gzip.write(data)
+        if final:
+            self._gzip.close()
+        else:
+            self._gzip.flush()
+        out = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return out
+
+
+class CompressionMiddleware:
+    """ASGI middleware that brotli- or gzip-encodes responses based on Accept-Encoding.
+
+    Responses below minimum_size, responses that already carry a Content-Encoding
+    (e.g. raw bytes relayed by the streaming proxy) and non-compressible content
+    types pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.passthrough = False
+        self.compressor: Optional[_Compressor] = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    def _should_skip(self, headers: List[Tuple[bytes, bytes]]) -> bool:
+        content_type = b""
+        for name, value in headers:
+            if name == b"content-encoding":
+                return True
+            if name == b"content-type":
+                content_type = value
+        return not content_type.decode("latin-1").lower().startswith(COMPRESSIBLE_CONTENT_TYPES)
+
+    async def send_wrapper(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            self.passthrough = self._should_skip(message.get("headers", []))
+            if self.passthrough:
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding)
+            vary = [v for k, v in self.start_message.get("headers", []) if k == b"vary"]
+            headers = [(k, v) for k, v in self.start_message.get("headers", []) if k not in (b"content-length", b"vary")]
+            headers.append((b"content-encoding", self.encoding.encode()))
+            headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+            compressed = self.compressor.compress(body, final=not more_body)
+            if not more_body:
+                headers.append((b"content-length", str(len(compressed)).encode()))
+            self.start_message["headers"] = headers
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+
+        compressed = self.compressor.compress(body, final=not more_body)
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
@@ -0,0 +1,53 @@
+import time
+
+from services.metrics import metrics
+
+REQUEST_SECONDS = metrics.histogram(
+    "gateway_http_request_duration_seconds",
+    "Gateway request latency from receipt to the last body byte sent.",
+    ("method", "route", "status"),
+)
+REQUESTS_IN_PROGRESS = {"value": 0}
+metrics.gauge_callback(
+    "gateway_http_requests_in_progress",
+    "Requests currently being handled by this worker.",
+    lambda: [({}, REQUESTS_IN_PROGRESS["value"])],
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records per-route latency histograms.
+
+    Routes are labelled by their path template (e.g. /api/finance/{path:path}) so
+    request paths never explode label cardinality; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS["value"] += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS["value"] -= 1
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status_code,
+            )
@@ -1,6 +1,7 @@
 from typing import Optional, List
 from pydantic import BaseModel
 from sqlmodel import Field, SQLModel, Relationship
+from sqlalchemy import Index
 import datetime
 from datetime import date
 from enum import Enum
@@ -49,9 +50,15 @@ class User(SQLModel, table=True):
 class Chat(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+    # Rolling summary of turns that have dropped out of the history window
+    summary: Optional[str] = None
+    summary_through_message_id: Optional[int] = None
     messages: List["Message"] = Relationship(back_populates="chat")
 
 class Message(SQLModel, table=True):
+    # Keyset pagination over a chat's history walks (chat_id, id) backwards
+    __table_args__ = (Index("ix_message_chat_id_id", "chat_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     chat_id: int = Field(foreign_key="chat.id")
     user_id: int = Field(foreign_key="user.id")
@@ -1,7 +1,26 @@
-
+import os
 import sys
 import time
 
+# Simulated costs of the dummy model; a real script loads and runs its model in load_model() and generate()
+DUMMY_LOAD_SECONDS = float(os.getenv("NCC_DUMMY_LOAD_SECONDS", "0"))
+DUMMY_INFERENCE_SECONDS = float(os.getenv("NCC_DUMMY_INFERENCE_SECONDS", "5"))
+
+def load_model():
+    # Called once per process, so the warm worker (inference_worker.py) pays it only once
+    time.sleep(DUMMY_LOAD_SECONDS)
+    return None
+
+def read_prompt(input_file: str) -> str:
+    with open(input_file, "r") as f:
+        return f.readline().strip()
+
+def generate(model, prompt: str) -> str:
+    # Simulate a delay for inference
+    time.sleep(DUMMY_INFERENCE_SECONDS)
+
+    return f"This is a dummy response to the prompt: '{prompt}'"
+
 def main():
     if len(sys.argv) != 3:
         print("Usage: python inference.py <input_file> <output_file>")
@@ -10,13 +29,8 @@ def main():
     input_file = sys.argv[1]
     output_file = sys.argv[2]
 
-    with open(input_file, "r") as f:
-        prompt = f.readline().strip()
-
-    # Simulate a delay for inference
-    time.sleep(5)
-
-    response = f"This is a dummy response to the prompt: '{prompt}'"
+    model = load_model()
+    response = generate(model, read_prompt(input_file))
 
     with open(output_file, "w") as f:
         f.write(response)
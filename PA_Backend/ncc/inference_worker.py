@@ -0,0 +1,86 @@
+"""Long-lived NCC inference worker.
+
+Loads the model of an inference script once, then answers every prompt dropped
+into <queue_dir>/inbox until none has arrived for idle_seconds. The inference
+script must define load_model(), read_prompt(input_file) and generate(model, prompt),
+as ncc/inference.py does.
+
+A request is claimed by renaming it into working/, so it is answered once even if
+two workers overlap. Answers are written to outbox/ under a temporary name and
+renamed into place; their first line is "ok" or "error".
+
+Usage: python inference_worker.py <inference_script> <queue_dir> <idle_seconds>
+"""
+import os
+import sys
+import time
+import importlib.util
+
+POLL_SECONDS = 0.2
+
+def load_inference_module(path: str):
+    spec = importlib.util.spec_from_file_location("inference", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def pending_requests(inbox: str):
+    # Oldest first; clients write "<id>.tmp" and rename it to "<id>.txt" once complete
+    names = [name for name in os.listdir(inbox) if name.endswith(".txt")]
+    def _mtime(name):
+        try:
+            return os.path.getmtime(os.path.join(inbox, name))
+        except FileNotFoundError:
+            return 0.0
+    return sorted(names, key=_mtime)
+
+def answer(inference, model, claimed_path: str, outbox: str, name: str):
+    try:
+        body = "ok\n" + inference.generate(model, inference.read_prompt(claimed_path))
+    except Exception as e:
+        body = f"error\n{e}"
+    temporary_path = os.path.join(outbox, name[:-len(".txt")] + ".tmp")
+    with open(temporary_path, "w") as f:
+        f.write(body)
+    os.replace(temporary_path, os.path.join(outbox, name))
+    os.remove(claimed_path)
+
+def main():
+    if len(sys.argv) != 4:
+        print("Usage: python inference_worker.py <inference_script> <queue_dir> <idle_seconds>")
+        sys.exit(1)
+
+    inference = load_inference_module(sys.argv[1])
+    queue_dir = sys.argv[2]
+    idle_seconds = float(sys.argv[3])
+
+    inbox, working, outbox = (os.path.join(queue_dir, name) for name in ("inbox", "working", "outbox"))
+    for directory in (inbox, working, outbox):
+        os.makedirs(directory, exist_ok=True)
+
+    # Requests claimed by a worker that died mid-answer go back in the queue
+    for name in os.listdir(working):
+        os.replace(os.path.join(working, name), os.path.join(inbox, name))
+
+    model = inference.load_model()
+    print(f"Worker ready, serving {queue_dir}", flush=True)
+
+    last_request_at = time.monotonic()
+    while time.monotonic() - last_request_at < idle_seconds:
+        names = pending_requests(inbox)
+        if not names:
+            time.sleep(POLL_SECONDS)
+            continue
+        for name in names:
+            claimed_path = os.path.join(working, name)
+            try:
+                os.rename(os.path.join(inbox, name), claimed_path)
+            except FileNotFoundError:
+                continue # Claimed by another worker
+            answer(inference, model, claimed_path, outbox, name)
+        last_request_at = time.monotonic()
+
+    print(f"Worker idle for {idle_seconds:.0f}s, exiting", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,191 +1,171 @@
 
 
-import os
+import io
+import time
 import uuid
-import asyncio
-import paramiko
-from typing import Tuple, Optional
-from config (
-    NCC_USER,
-    NCC_HOST,
-    NCC_PRIVATE_KEY_PATH,
+import logging
+import tarfile
+from typing import Dict, Tuple, Optional
+from config import (
     NCC_REMOTE_JOB_DIR,
     NCC_REMOTE_INFERENCE_SCRIPT_PATH,
     NCC_REMOTE_VENV_PATH,
+    NCC_WORKER_ENABLED,
 )
+from services.metrics import NCC_PHASE_SECONDS, NCC_MONITOR_POLLS
+from services.ssh_pool import SSHConnectionPool
+from services.slurm_job_monitor import SlurmJobMonitor, FAILED_STATES
+from services.ncc_worker import NCCInferenceWorker
+from services.ncc_batcher import SlurmSubmissionBatcher
+
+logger = logging.getLogger(__name__)
+
+# Per-job resources, used by single submissions and by every task of a batched job array
+_JOB_DIRECTIVES = {
+    "inference": "#SBATCH --ntasks=1\n#SBATCH --cpus-per-task=4\n#SBATCH --mem=16G\n#SBATCH --time=00:10:00",
+    "compute": "#SBATCH --ntasks=1\n#SBATCH --cpus-per-task=1\n#SBATCH --mem=4G\n#SBATCH --time=00:05:00",
+}
+
+def _bundle(files: Dict[str, str]) -> bytes:
+    """Packs a job directory's files into an in-memory tar archive."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, content in files.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+def _record_job_phases(job_kind: str, result: Dict):
+    NCC_PHASE_SECONDS.observe(result["queue_seconds"], job_kind=job_kind, phase="queue")
+    NCC_PHASE_SECONDS.observe(result["run_seconds"], job_kind=job_kind, phase="run")
+
+def _serialize_inference_input(prompt: str, chat_history: list) -> str:
+    lines = [prompt]
+    for entry in chat_history:
+        lines += [entry['message'], entry['response']]
+    return "".join(f"{line}\n" for line in lines)
 
 class NCCService:
     def __init__(self):
-        self.client = paramiko.SSHClient()
-        self.client.load_system_host_keys()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        try:
-            self.client.connect(
-                hostname=NCC_HOST,
-                username=NCC_USER,
-                key_filename=NCC_PRIVATE_KEY_PATH
-            )
-        except paramiko.AuthenticationException:
-            raise Exception("Authentication failed, please verify your credentials and key path.")
-        except paramiko.SSHException as e:
-            raise Exception(f"Could not establish SSH connection: {e}")
-
-    def _execute_command(self, command: str) -> Tuple[str, str]:
-        stdin, stdout, stderr = self.client.exec_command(command)
-        return stdout.read().decode().strip(), stderr.read().decode().strip()
-
-    def _sftp_put(self, local_path: str, remote_path: str):
-        sftp = self.client.open_sftp()
-        sftp.put(local_path, remote_path)
-        sftp.close()
-
-    def _sftp_get(self, remote_path: str, local_path: str):
-        sftp = self.client.open_sftp()
-        sftp.get(remote_path, local_path)
-        sftp.close()
-
-    async def run_slurm_job(self, slurm_script_path: str, remote_job_dir: str, output_filename: str) -> str:
-        # Create remote directory
-        stdout, stderr = self._execute_command(f"mkdir -p {remote_job_dir}")
-        if stderr:
-            raise Exception(f"Error creating remote directory: {stderr}")
-
-        # Submit SLURM job
-        stdout, stderr = self._execute_command(f"sbatch {slurm_script_path}")
-        if stderr and "Submitted batch job" not in stderr: # sbatch often prints job ID to stderr
-            raise Exception(f"Error submitting SLURM job: {stderr}")
-        
-        job_id = stdout.strip().split()[-1] if stdout else stderr.strip().split()[-1]
-
-        # Monitor job status
-        while True:
-            stdout, stderr = self._execute_command(f"squeue -j {job_id}")
-            if job_id not in stdout:
-                break
-            await asyncio.sleep(10)
+        # Connections open on first use; every remote operation runs off the event loop
+        self.pool = SSHConnectionPool()
+        self.monitor = SlurmJobMonitor(
+            self._execute_command,
+            on_poll=lambda command: NCC_MONITOR_POLLS.inc(command=command),
+            on_finished=_record_job_phases,
+        )
+        # Concurrent jobs of one kind share a single sbatch as a job array
+        self.batcher = SlurmSubmissionBatcher(self._execute_command, self.pool.put_bytes, self.monitor)
+        # Keeps the model loaded between prompts instead of submitting one job per prompt
+        self.worker = NCCInferenceWorker(self.pool) if NCC_WORKER_ENABLED else None
+
+    async def _execute_command(self, command: str) -> Tuple[str, str]:
+        return await self.pool.execute(command)
+
+    async def _upload_bundle(self, remote_job_dir: str, files: Dict[str, str]):
+        # The whole job directory travels as one tar stream over a single exec: no per-file round trips
+        status, stdout, stderr = await self.pool.execute_with_status(f"mkdir -p {remote_job_dir} && tar -xmf - -C {remote_job_dir}", stdin=_bundle(files))
+        # tar may warn on stderr (timestamps, unknown headers) and still succeed, so only the exit status counts
+        if status != 0:
+            raise Exception(f"Error staging job files on NCC (exit status {status}): {stderr}")
+
+    async def run_slurm_job(self, slurm_script_path: str, remote_job_dir: str, output_filename: str, job_kind: str = "job") -> str:
+        # Submit SLURM job, batched with concurrent jobs of the same kind, and wait for it via the shared monitor
+        result = await self.batcher.run(job_kind, slurm_script_path, _JOB_DIRECTIVES.get(job_kind, ""))
+        job_id = result["job_id"]
 
         # Check for job errors (optional, but good practice)
-        stdout, stderr = self._execute_command(f"cat {remote_job_dir}/error.log")
+        stdout, stderr = await self._execute_command(f"cat {remote_job_dir}/error.log")
         if stdout:
-            print(f"SLURM Job Error Log: {stdout}") # Log errors, don't necessarily raise
+            logger.warning(f"SLURM job {job_id} error log: {stdout}") # Log errors, don't necessarily raise
+
+        if result["state"] in FAILED_STATES:
+            # Its output is missing or partial; the caller's own cleanup will not run
+            self.pool.execute_in_background(f"rm -rf {remote_job_dir}")
+            raise Exception(f"SLURM job {job_id} finished in state {result['state']}.")
 
         return job_id
 
     async def run_inference_on_ncc(self, prompt: str, chat_history: list) -> Tuple[str, str]:
         session_id = str(uuid.uuid4())
-        remote_session_dir = f"{NCC_REMOTE_JOB_DIR}/{session_id}"
-        local_session_dir = f"/tmp/{session_id}"
+        if self.worker is not None:
+            return await self.worker.infer(_serialize_inference_input(prompt, chat_history)), session_id
 
-        os.makedirs(local_session_dir, exist_ok=True)
-
-        # Serialize chat history and prompt
-        with open(f"{local_session_dir}/input.txt", "w") as f:
-            f.write(f"{prompt}\n")
-            for entry in chat_history:
-                f.write(f"{entry['message']}\n{entry['response']}\n")
+        remote_session_dir = f"{NCC_REMOTE_JOB_DIR}/{session_id}"
 
         # Generate SLURM script
         slurm_script_content = f"""#!/bin/bash
 #SBATCH --job-name=llm-inference-{session_id}
 #SBATCH --output={remote_session_dir}/output.log
 #SBATCH --error={remote_session_dir}/error.log
-#SBATCH --ntasks=1
-#SBATCH --cpus-per-task=4
-#SBATCH --mem=16G
-#SBATCH --time=00:10:00
+{_JOB_DIRECTIVES["inference"]}
 
 source {NCC_REMOTE_VENV_PATH}
 python {NCC_REMOTE_INFERENCE_SCRIPT_PATH} {remote_session_dir}/input.txt {remote_session_dir}/output.txt
 """
-        slurm_script_local_path = f"{local_session_dir}/run_inference.slurm"
-        with open(slurm_script_local_path, "w") as f:
-            f.write(slurm_script_content)
 
         # Transfer files to NCC
-        self._sftp_put(f"{local_session_dir}/input.txt", f"{remote_session_dir}/input.txt")
-        self._sftp_put(slurm_script_local_path, f"{remote_session_dir}/run_inference.slurm")
+        with NCC_PHASE_SECONDS.time(job_kind="inference", phase="upload"):
+            await self._upload_bundle(remote_session_dir, {
+                "input.txt": _serialize_inference_input(prompt, chat_history),
+                "run_inference.slurm": slurm_script_content,
+            })
 
         # Run SLURM job
-        job_id = await self.run_slurm_job(f"{remote_session_dir}/run_inference.slurm", remote_session_dir, "output.txt")
-
-        # SCP results back
-        output_remote_path = f"{remote_session_dir}/output.txt"
-        output_local_path = f"{local_session_dir}/output.txt"
-        self._sftp_get(output_remote_path, output_local_path)
-        
-        with open(output_local_path, "r") as f:
-            response = f.read()
-
-        # Cleanup
-        self._execute_command(f"rm -rf {remote_session_dir}")
-        os.remove(f"{local_session_dir}/input.txt")
-        os.remove(slurm_script_local_path)
-        os.remove(output_local_path)
-        os.rmdir(local_session_dir)
+        await self.run_slurm_job(f"{remote_session_dir}/run_inference.slurm", remote_session_dir, "output.txt", job_kind="inference")
+
+        # Read results back
+        with NCC_PHASE_SECONDS.time(job_kind="inference", phase="download"):
+            response = (await self.pool.get_bytes(f"{remote_session_dir}/output.txt")).decode("utf-8")
+
+        # Cleanup, off the response path
+        self.pool.execute_in_background(f"rm -rf {remote_session_dir}")
 
         return response, session_id
 
     async def run_compute_on_ncc(self, python_script_content: str, input_data: Optional[str] = None) -> str:
         session_id = str(uuid.uuid4())
         remote_session_dir = f"{NCC_REMOTE_JOB_DIR}/{session_id}"
-        local_session_dir = f"/tmp/{session_id}"
-
-        os.makedirs(local_session_dir, exist_ok=True)
-
-        # Write Python script to local file
-        python_script_local_path = f"{local_session_dir}/compute_script.py"
-        with open(python_script_local_path, "w") as f:
-            f.write(python_script_content)
-
-        # Write input data to local file if provided
-        input_local_path = None
-        if input_data:
-            input_local_path = f"{local_session_dir}/input_data.txt"
-            with open(input_local_path, "w") as f:
-                f.write(input_data)
 
         # Generate SLURM script
         slurm_script_content = f"""#!/bin/bash
 #SBATCH --job-name=generic-compute-{session_id}
 #SBATCH --output={remote_session_dir}/output.log
 #SBATCH --error={remote_session_dir}/error.log
-#SBATCH --ntasks=1
-#SBATCH --cpus-per-task=1
-#SBATCH --mem=4G
-#SBATCH --time=00:05:00
+{_JOB_DIRECTIVES["compute"]}
 
 source {NCC_REMOTE_VENV_PATH}
 python {remote_session_dir}/compute_script.py {remote_session_dir}/input_data.txt {remote_session_dir}/output.txt
 """
-        slurm_script_local_path = f"{local_session_dir}/run_compute.slurm"
-        with open(slurm_script_local_path, "w") as f:
-            f.write(slurm_script_content)
+        files = {"compute_script.py": python_script_content, "run_compute.slurm": slurm_script_content}
+        if input_data:
+            files["input_data.txt"] = input_data
 
         # Transfer files to NCC
-        self._sftp_put(python_script_local_path, f"{remote_session_dir}/compute_script.py")
-        if input_local_path:
-            self._sftp_put(input_local_path, f"{remote_session_dir}/input_data.txt")
-        self._sftp_put(slurm_script_local_path, f"{remote_session_dir}/run_compute.slurm")
+        with NCC_PHASE_SECONDS.time(job_kind="compute", phase="upload"):
+            await self._upload_bundle(remote_session_dir, files)
 
         # Run SLURM job
-        job_id = await self.run_slurm_job(f"{remote_session_dir}/run_compute.slurm", remote_session_dir, "output.txt")
-
-        # SCP results back
-        output_remote_path = f"{remote_session_dir}/output.txt"
-        output_local_path = f"{local_session_dir}/output.txt"
-        self._sftp_get(output_remote_path, output_local_path)
-        
-        with open(output_local_path, "r") as f:
-            response = f.read()
-
-        # Cleanup
-        self._execute_command(f"rm -rf {remote_session_dir}")
-        os.remove(python_script_local_path)
-        if input_local_path:
-            os.remove(input_local_path)
-        os.remove(slurm_script_local_path)
-        os.remove(output_local_path)
-        os.rmdir(local_session_dir)
+        await self.run_slurm_job(f"{remote_session_dir}/run_compute.slurm", remote_session_dir, "output.txt", job_kind="compute")
+
+        # Read results back
+        with NCC_PHASE_SECONDS.time(job_kind="compute", phase="download"):
+            response = (await self.pool.get_bytes(f"{remote_session_dir}/output.txt")).decode("utf-8")
+
+        # Cleanup, off the response path
+        self.pool.execute_in_background(f"rm -rf {remote_session_dir}")
 
         return response
 
+
+_ncc_service: Optional[NCCService] = None
+
+def get_ncc_service() -> NCCService:
+    # Created on first use; the SSH pool itself connects lazily, so workers that never reach NCC hold no session
+    global _ncc_service
+    if _ncc_service is None:
+        _ncc_service = NCCService()
+    return _ncc_service
@@ -2,12 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import RedirectResponse
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from sqlmodel import Session, select
 
 from database import get_session
+from lazy_imports import lazy_import
 from models import User
 
+# googleapiclient is slow to import; load it on the first Google API call
+discovery = lazy_import("googleapiclient.discovery")
+
 router = APIRouter()
 
 # This should be configured securely, e.g., via environment variables
@@ -38,7 +41,7 @@ async def auth_google_callback(code: str, session: Session = Depends(get_session
     credentials = flow.credentials
 
     # Get user info from Google
-    service = build('oauth2', 'v2', credentials=credentials)
+    service = discovery.build('oauth2', 'v2', credentials=credentials)
     user_info = service.userinfo().get().execute()
     
     email = user_info.get('email')
@@ -3,6 +3,8 @@ from pydantic import BaseModel
 import httpx
 import os
 from ..config import BRAVE_SEARCH_API_KEY
+from services.http_client_service import http_client_service
+from services.request_coalescer import request_coalescer
 
 router = APIRouter()
 
@@ -21,12 +23,12 @@ async def brave_search(search_query: SearchQuery):
         "q": search_query.query
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get("https://api.search.brave.com/res/v1/web/search", headers=headers, params=params)
-            response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
-            return response.json()
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=500, detail=f"An error occurred while requesting Brave Search: {exc}")
-        except httpx.HTTPStatusError as exc:
-            raise HTTPException(status_code=exc.response.status_code, detail=f"Error from Brave Search API: {exc.response.text}")
+    client = http_client_service.get_client("brave")
+    try:
+        response = await request_coalescer.get(client, "https://api.search.brave.com/res/v1/web/search", headers=headers, params=params)
+        response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
+        return response.json()
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=500, detail=f"An error occurred while requesting Brave Search: {exc}")
+    except httpx.HTTPStatusError as exc:
+        raise HTTPException(status_code=exc.response.status_code, detail=f"Error from Brave Search API: {exc.response.text}")
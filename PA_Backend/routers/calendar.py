@@ -4,14 +4,17 @@ from sqlmodel import Session
 from google.auth.transport.requests import Request as GoogleAuthRequest
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 import datetime
 
 from database import get_session
+from lazy_imports import lazy_import
 from . import calendar_crud, calendar_schemas
 from .auth import get_current_user
 from models import User
 
+# googleapiclient is slow to import; load it on the first Google API call
+discovery = lazy_import("googleapiclient.discovery")
+
 router = APIRouter()
 
 # Google Calendar API scopes
@@ -64,7 +67,7 @@ async def get_google_events(user_id: int, db: Session = Depends(get_session), us
     if credentials.expired and credentials.refresh_token:
         credentials.refresh(GoogleAuthRequest())
 
-    service = build('calendar', 'v3', credentials=credentials)
+    service = discovery.build('calendar', 'v3', credentials=credentials)
 
     now = datetime.datetime.utcnow().isoformat() + 'Z'
     events_result = service.events().list(
@@ -85,7 +88,7 @@ async def create_google_event(user_id: int, event: calendar_schemas.GoogleCalend
     if credentials.expired and credentials.refresh_token:
         credentials.refresh(GoogleAuthRequest())
 
-    service = build('calendar', 'v3', credentials=credentials)
+    service = discovery.build('calendar', 'v3', credentials=credentials)
 
     event = service.events().insert(calendarId='primary', body=event.dict()).execute()
     return {"event": event}
@@ -100,7 +103,7 @@ async def update_google_event(user_id: int, event_id: str, event: calendar_schem
     if credentials.expired and credentials.refresh_token:
         credentials.refresh(GoogleAuthRequest())
 
-    service = build('calendar', 'v3', credentials=credentials)
+    service = discovery.build('calendar', 'v3', credentials=credentials)
 
     updated_event = service.events().update(calendarId='primary', eventId=event_id, body=event.dict()).execute()
     return {"event": updated_event}
@@ -115,7 +118,7 @@ async def delete_google_event(user_id: int, event_id: str, db: Session = Depends
     if credentials.expired and credentials.refresh_token:
         credentials.refresh(GoogleAuthRequest())
 
-    service = build('calendar', 'v3', credentials=credentials)
+    service = discovery.build('calendar', 'v3', credentials=credentials)
 
     service.events().delete(calendarId='primary', eventId=event_id).execute()
     return {"message": "Event deleted successfully"}
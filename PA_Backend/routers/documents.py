@@ -3,7 +3,6 @@ from fastapi.responses import RedirectResponse, HTMLResponse, StreamingResponse
 from sqlmodel import Session, select
 from google.auth.transport.requests import Request as GoogleAuthRequest
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 import base64
 import io
 import os
@@ -11,11 +10,15 @@ from typing import Annotated, Optional
 import json # Import json for parsing file metadata
 
 from database import get_session
+from lazy_imports import lazy_import
 from . import documents_crud, documents_schemas
 from .auth import get_current_user
 from models import User
 from main import get_current_user_id # Import from main to reuse dependency
 
+# googleapiclient is slow to import; load it on the first Google API call
+discovery = lazy_import("googleapiclient.discovery")
+
 router = APIRouter()
 
 # Google Drive API scopes
@@ -44,7 +47,7 @@ async def google_drive_auth_callback(request: Request, state: str, code: str, db
 
     return HTMLResponse("<h1>Google Drive Connected!</h1><p>You can close this window.</p>")
 
-async def get_google_drive_service(user_id: int, session: Session) -> build:
+async def get_google_drive_service(user_id: int, session: Session) -> "discovery.Resource":
     user = session.query(User).filter(User.id == user_id).first()
     if not user or not user.google_credentials:
         raise HTTPException(status_code=401, detail="Google Drive not authenticated for this user.")
@@ -58,7 +61,7 @@ async def get_google_drive_service(user_id: int, session: Session) -> build:
         session.commit()
         session.refresh(user)
 
-    return build('drive', 'v3', credentials=credentials)
+    return discovery.build('drive', 'v3', credentials=credentials)
 
 @router.get("/documents/google/files")
 async def list_google_drive_files(
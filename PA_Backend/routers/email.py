@@ -3,16 +3,19 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from google.auth.transport.requests import Request as GoogleAuthRequest
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from sqlmodel import Session, select
 import base64
 from email.mime.text import MIMEText
 
 from database import get_session
+from lazy_imports import lazy_import
 from models import User
 from .auth import get_current_user
 from . import email_crud, email_schemas
 
+# googleapiclient is slow to import; load it on the first Google API call
+discovery = lazy_import("googleapiclient.discovery")
+
 router = APIRouter()
 
 # Google Gmail API scopes
@@ -82,7 +85,7 @@ async def get_google_emails(db: Session = Depends(get_session), user: User = Dep
     if credentials.expired and credentials.refresh_token:
         credentials.refresh(GoogleAuthRequest())
 
-    service = build('gmail', 'v1', credentials=credentials)
+    service = discovery.build('gmail', 'v1', credentials=credentials)
     
     # Call the Gmail API
     results = service.users().messages().list(userId='me', labelIds=['INBOX']).execute()
@@ -128,7 +131,7 @@ async def send_google_email(email: email_schemas.GoogleEmail, db: Session = Depe
     if credentials.expired and credentials.refresh_token:
         credentials.refresh(GoogleAuthRequest())
 
-    service = build('gmail', 'v1', credentials=credentials)
+    service = discovery.build('gmail', 'v1', credentials=credentials)
 
     message = MIMEText(email.message)
     message['to'] = ', '.join(email.to)
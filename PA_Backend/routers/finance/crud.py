@@ -1,8 +1,11 @@
 from sqlmodel import Session, select
 from .. import models, schemas, security
-import pandas as pd
 from datetime import datetime
 from ..models import ExpenseAttributionStatus, InvoiceStatus
+from lazy_imports import lazy_import
+
+# pandas is only needed for CSV imports; keep it off the import path until then
+pd = lazy_import("pandas")
 
 # --- User CRUD ---
 def get_user_by_username(db: Session, username: str):
@@ -11,6 +11,8 @@ from pydantic import BaseModel
 from database import get_session
 from models import User
 from main import get_current_user_id # Import from main to reuse dependency
+from services.http_client_service import http_client_service
+from services.request_coalescer import request_coalescer
 
 router = APIRouter()
 
@@ -85,15 +87,15 @@ async def jira_auth_callback(
         "redirect_uri": REDIRECT_URI,
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(TOKEN_URL, data=token_data)
-            response.raise_for_status()
-            tokens = response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to get tokens: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during token exchange: {str(e)}")
+    client = http_client_service.get_client("oauth")
+    try:
+        response = await client.post(TOKEN_URL, data=token_data)
+        response.raise_for_status()
+        tokens = response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to get tokens: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred during token exchange: {str(e)}")
 
     access_token = tokens.get("access_token")
     refresh_token = tokens.get("refresh_token")
@@ -131,15 +133,15 @@ async def get_jira_projects(access_token: Annotated[str, Depends(get_jira_access
         "Authorization": f"Bearer {access_token}",
         "Accept": "application/json",
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(projects_url, headers=headers)
-            response.raise_for_status()
-            return response.json().get("values", [])
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to fetch Jira projects: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("jira")
+    try:
+        response = await request_coalescer.get(client, projects_url, headers=headers)
+        response.raise_for_status()
+        return response.json().get("values", [])
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to fetch Jira projects: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.get("/jira/issues")
 async def get_jira_issues(
@@ -161,15 +163,15 @@ async def get_jira_issues(
     if jql:
         params["jql"] = jql # Overrides project_key if jql is provided
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(search_url, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json().get("issues", [])
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to fetch Jira issues: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("jira")
+    try:
+        response = await request_coalescer.get(client, search_url, headers=headers, params=params)
+        response.raise_for_status()
+        return response.json().get("issues", [])
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to fetch Jira issues: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.post("/jira/issue")
 async def create_jira_issue(
@@ -213,15 +215,15 @@ async def create_jira_issue(
             ]
         }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(create_url, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to create Jira issue: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("jira")
+    try:
+        response = await client.post(create_url, headers=headers, json=payload)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to create Jira issue: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.put("/jira/issue/{issue_id}")
 async def update_jira_issue(
@@ -257,23 +259,22 @@ async def update_jira_issue(
                 }
             ]
         }
+    client = http_client_service.get_client("jira")
     if issue_update.status:
         # Transition issue to new status
         transitions_url = f"{JIRA_SITE_URL}/rest/api/3/issue/{issue_id}/transitions"
         transition_payload = {"transition": {"id": issue_update.status}} # Assuming status is transition ID or name
-        async with httpx.AsyncClient() as client:
-            transition_response = await client.post(transitions_url, headers=headers, json=transition_payload)
-            transition_response.raise_for_status()
+        transition_response = await client.post(transitions_url, headers=headers, json=transition_payload)
+        transition_response.raise_for_status()
         
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.put(update_url, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to update Jira issue: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    try:
+        response = await client.put(update_url, headers=headers, json=payload)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to update Jira issue: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.delete("/jira/issue/{issue_id}")
 async def delete_jira_issue(
@@ -287,12 +288,12 @@ async def delete_jira_issue(
     headers = {
         "Authorization": f"Bearer {access_token}",
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.delete(delete_url, headers=headers)
-            response.raise_for_status()
-            return {"message": "Issue deleted successfully!"}
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to delete Jira issue: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("jira")
+    try:
+        response = await client.delete(delete_url, headers=headers)
+        response.raise_for_status()
+        return {"message": "Issue deleted successfully!"}
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to delete Jira issue: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
@@ -12,6 +12,8 @@ import io
 from database import get_session
 from models import User
 from main import get_current_user_id # Import from main to reuse dependency
+from services.http_client_service import http_client_service
+from services.request_coalescer import request_coalescer
 
 router = APIRouter()
 
@@ -76,15 +78,15 @@ async def onedrive_auth_callback(
         "client_secret": CLIENT_SECRET,
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(token_url, data=token_data)
-            response.raise_for_status()
-            tokens = response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to get tokens: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during token exchange: {str(e)}")
+    client = http_client_service.get_client("oauth")
+    try:
+        response = await client.post(token_url, data=token_data)
+        response.raise_for_status()
+        tokens = response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to get tokens: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred during token exchange: {str(e)}")
 
     access_token = tokens.get("access_token")
     refresh_token = tokens.get("refresh_token")
@@ -133,15 +135,15 @@ async def list_onedrive_files(
         "Content-Type": "application/json",
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(list_url, headers=headers)
-            response.raise_for_status()
-            return response.json().get("value", [])
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to list OneDrive files: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("graph")
+    try:
+        response = await request_coalescer.get(client, list_url, headers=headers)
+        response.raise_for_status()
+        return response.json().get("value", [])
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to list OneDrive files: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.post("/onedrive/upload")
 async def upload_onedrive_file(
@@ -162,16 +164,16 @@ async def upload_onedrive_file(
         "Content-Type": file.content_type,
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            content = await file.read()
-            response = await client.put(upload_url, headers=headers, content=content)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to upload file to OneDrive: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("graph")
+    try:
+        content = await file.read()
+        response = await client.put(upload_url, headers=headers, content=content)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to upload file to OneDrive: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.get("/onedrive/download/{item_id}")
 async def download_onedrive_file(
@@ -190,17 +192,17 @@ async def download_onedrive_file(
         "Authorization": f"Bearer {access_token}",
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(download_url, headers=headers)
-            response.raise_for_status()
-            
-            # Stream the content back to the client
-            return StreamingResponse(io.BytesIO(response.content), media_type=response.headers['Content-Type'])
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to download file from OneDrive: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("graph")
+    try:
+        response = await request_coalescer.get(client, download_url, headers=headers)
+        response.raise_for_status()
+        
+        # Stream the content back to the client
+        return StreamingResponse(io.BytesIO(response.content), media_type=response.headers['Content-Type'])
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to download file from OneDrive: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.delete("/onedrive/delete/{item_id}")
 async def delete_onedrive_item(
@@ -219,12 +221,12 @@ async def delete_onedrive_item(
         "Authorization": f"Bearer {access_token}",
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.delete(delete_url, headers=headers)
-            response.raise_for_status()
-            return {"message": "Item deleted successfully!"}
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to delete item from OneDrive: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("graph")
+    try:
+        response = await client.delete(delete_url, headers=headers)
+        response.raise_for_status()
+        return {"message": "Item deleted successfully!"}
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to delete item from OneDrive: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
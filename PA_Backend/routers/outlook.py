@@ -10,6 +10,8 @@ from sqlmodel import select
 from database import get_session
 from models import User
 from main import get_current_user_id # Import from main to reuse dependency
+from services.http_client_service import http_client_service
+from services.request_coalescer import request_coalescer
 
 router = APIRouter()
 
@@ -76,15 +78,15 @@ async def outlook_auth_callback(
         "client_secret": CLIENT_SECRET,
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(token_url, data=token_data)
-            response.raise_for_status()
-            tokens = response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to get tokens: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during token exchange: {str(e)}")
+    client = http_client_service.get_client("oauth")
+    try:
+        response = await client.post(token_url, data=token_data)
+        response.raise_for_status()
+        tokens = response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to get tokens: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred during token exchange: {str(e)}")
 
     access_token = tokens.get("access_token")
     refresh_token = tokens.get("refresh_token")
@@ -123,24 +125,24 @@ async def get_outlook_emails(user_id: Annotated[int, Depends(get_current_user_id
         "Content-Type": "application/json",
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(messages_url, headers=headers)
-            response.raise_for_status()
-            messages_data = response.json().get("value", [])
-
-            email_list = []
-            for msg in messages_data:
-                email_list.append({
-                    "sender": msg.get("sender", {}).get("emailAddress", {}).get("address", "Unknown Sender"),
-                    "subject": msg.get("subject", "No Subject"),
-                    "body": msg.get("bodyPreview", "No Body Preview") # bodyPreview is a snippet
-                })
-            return email_list
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to fetch emails from Outlook: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("graph")
+    try:
+        response = await request_coalescer.get(client, messages_url, headers=headers)
+        response.raise_for_status()
+        messages_data = response.json().get("value", [])
+
+        email_list = []
+        for msg in messages_data:
+            email_list.append({
+                "sender": msg.get("sender", {}).get("emailAddress", {}).get("address", "Unknown Sender"),
+                "subject": msg.get("subject", "No Subject"),
+                "body": msg.get("bodyPreview", "No Body Preview") # bodyPreview is a snippet
+            })
+        return email_list
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to fetch emails from Outlook: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.post("/outlook/send_email")
 async def send_outlook_email(
@@ -184,12 +186,12 @@ async def send_outlook_email(
         "saveToSentItems": "true"
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(send_mail_url, headers=headers, json=email_payload)
-            response.raise_for_status()
-            return {"message": "Email sent successfully!", "status_code": response.status_code}
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to send email: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("graph")
+    try:
+        response = await client.post(send_mail_url, headers=headers, json=email_payload)
+        response.raise_for_status()
+        return {"message": "Email sent successfully!", "status_code": response.status_code}
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to send email: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
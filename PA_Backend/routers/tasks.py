@@ -4,13 +4,16 @@ from sqlmodel import Session
 from google.auth.transport.requests import Request as GoogleAuthRequest
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 
 from database import get_session
+from lazy_imports import lazy_import
 from . import tasks_crud, tasks_schemas
 from .auth import get_current_user
 from models import User
 
+# googleapiclient is slow to import; load it on the first Google API call
+discovery = lazy_import("googleapiclient.discovery")
+
 router = APIRouter()
 
 # Google Tasks API scopes
@@ -63,7 +66,7 @@ async def get_google_tasks(db: Session = Depends(get_session), user: User = Depe
     if credentials.expired and credentials.refresh_token:
         credentials.refresh(GoogleAuthRequest())
 
-    service = build('tasks', 'v1', credentials=credentials)
+    service = discovery.build('tasks', 'v1', credentials=credentials)
 
     results = service.tasks().list(tasklist='@default', maxResults=10).execute()
     items = results.get('items', [])
@@ -88,7 +91,7 @@ async def create_google_task(task: tasks_schemas.GoogleTask, db: Session = Depen
     if credentials.expired and credentials.refresh_token:
         credentials.refresh(GoogleAuthRequest())
 
-    service = build('tasks', 'v1', credentials=credentials)
+    service = discovery.build('tasks', 'v1', credentials=credentials)
 
     created_task = service.tasks().insert(tasklist='@default', body=task.dict()).execute()
     return { # Return a dictionary matching the Task model
@@ -108,7 +111,7 @@ async def update_google_task(list_id: str, task_id: str, task: tasks_schemas.Goo
     if credentials.expired and credentials.refresh_token:
         credentials.refresh(GoogleAuthRequest())
 
-    service = build('tasks', 'v1', credentials=credentials)
+    service = discovery.build('tasks', 'v1', credentials=credentials)
 
     updated_task = service.tasks().update(tasklist=list_id, task=task_id, body=task.dict()).execute()
     return { # Return a dictionary matching the Task model
@@ -128,7 +131,7 @@ async def delete_google_task(list_id: str, task_id: str, db: Session = Depends(g
     if credentials.expired and credentials.refresh_token:
         credentials.refresh(GoogleAuthRequest())
 
-    service = build('tasks', 'v1', credentials=credentials)
+    service = discovery.build('tasks', 'v1', credentials=credentials)
 
     service.tasks().delete(tasklist=list_id, task=task_id).execute()
     return {"message": "Task deleted successfully"}
@@ -143,7 +146,7 @@ async def get_google_task_lists(db: Session = Depends(get_session), user: User =
     if credentials.expired and credentials.refresh_token:
         credentials.refresh(GoogleAuthRequest())
 
-    service = build('tasks', 'v1', credentials=credentials)
+    service = discovery.build('tasks', 'v1', credentials=credentials)
 
     results = service.tasklists().list().execute()
     items = results.get('items', [])
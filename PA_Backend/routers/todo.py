@@ -11,6 +11,8 @@ from pydantic import BaseModel
 from database import get_session
 from models import User
 from main import get_current_user_id # Import from main to reuse dependency
+from services.http_client_service import http_client_service
+from services.request_coalescer import request_coalescer
 
 router = APIRouter()
 
@@ -84,15 +86,15 @@ async def todo_auth_callback(
         "client_secret": CLIENT_SECRET,
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(token_url, data=token_data)
-            response.raise_for_status()
-            tokens = response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to get tokens: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during token exchange: {str(e)}")
+    client = http_client_service.get_client("oauth")
+    try:
+        response = await client.post(token_url, data=token_data)
+        response.raise_for_status()
+        tokens = response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to get tokens: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred during token exchange: {str(e)}")
 
     access_token = tokens.get("access_token")
     refresh_token = tokens.get("refresh_token")
@@ -130,15 +132,15 @@ async def get_todo_task_lists(access_token: Annotated[str, Depends(get_todo_acce
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json",
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(task_lists_url, headers=headers)
-            response.raise_for_status()
-            return response.json().get("value", [])
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to fetch task lists: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("graph")
+    try:
+        response = await request_coalescer.get(client, task_lists_url, headers=headers)
+        response.raise_for_status()
+        return response.json().get("value", [])
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to fetch task lists: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.get("/todo/tasks/{list_id}")
 async def get_todo_tasks(list_id: str, access_token: Annotated[str, Depends(get_todo_access_token)]):
@@ -150,15 +152,15 @@ async def get_todo_tasks(list_id: str, access_token: Annotated[str, Depends(get_
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json",
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(tasks_url, headers=headers)
-            response.raise_for_status()
-            return response.json().get("value", [])
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to fetch tasks: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("graph")
+    try:
+        response = await request_coalescer.get(client, tasks_url, headers=headers)
+        response.raise_for_status()
+        return response.json().get("value", [])
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to fetch tasks: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.post("/todo/tasks/{list_id}")
 async def create_todo_task(list_id: str, task: TodoTaskCreate, access_token: Annotated[str, Depends(get_todo_access_token)]):
@@ -174,15 +176,15 @@ async def create_todo_task(list_id: str, task: TodoTaskCreate, access_token: Ann
     if task.due_date:
         task_payload["dueDateTime"] = {"dateTime": task.due_date, "timeZone": "UTC"} # Assuming UTC for simplicity
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(create_task_url, headers=headers, json=task_payload)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to create task: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("graph")
+    try:
+        response = await client.post(create_task_url, headers=headers, json=task_payload)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to create task: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.patch("/todo/tasks/{list_id}/{task_id}")
 async def update_todo_task(list_id: str, task_id: str, task: TodoTaskUpdate, access_token: Annotated[str, Depends(get_todo_access_token)]):
@@ -202,15 +204,15 @@ async def update_todo_task(list_id: str, task_id: str, task: TodoTaskUpdate, acc
     if task.due_date:
         task_payload["dueDateTime"] = {"dateTime": task.due_date, "timeZone": "UTC"}
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.patch(update_task_url, headers=headers, json=task_payload)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to update task: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("graph")
+    try:
+        response = await client.patch(update_task_url, headers=headers, json=task_payload)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to update task: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.delete("/todo/tasks/{list_id}/{task_id}")
 async def delete_todo_task(list_id: str, task_id: str, access_token: Annotated[str, Depends(get_todo_access_token)]):
@@ -221,12 +223,12 @@ async def delete_todo_task(list_id: str, task_id: str, access_token: Annotated[s
     headers = {
         "Authorization": f"Bearer {access_token}",
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.delete(delete_task_url, headers=headers)
-            response.raise_for_status()
-            return {"message": "Task deleted successfully!"}
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Failed to delete task: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    client = http_client_service.get_client("graph")
+    try:
+        response = await client.delete(delete_task_url, headers=headers)
+        response.raise_for_status()
+        return {"message": "Task deleted successfully!"}
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to delete task: {e.response.text}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
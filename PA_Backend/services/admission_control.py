@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from config import (
+    CHAT_RATE_LIMIT_PER_MINUTE,
+    CHAT_RATE_LIMIT_BURST,
+    CHAT_BACKEND_LIMITS,
+    CHAT_QUEUE_TIMEOUT_SECONDS,
+)
+from services.shared_state import shared_state
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries the HTTP status and Retry-After to return."""
+
+    def __init__(self, status_code: int, retry_after: float, detail: str):
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+        super().__init__(detail)
+
+
+class BackendPool:
+    """Concurrency cap for one AI backend with a bounded queue of waiting requests."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.admitted_total = 0
+        self.rejected_total = 0
+
+    @asynccontextmanager
+    async def admit(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected_total += 1
+                raise AdmissionRejected(503, CHAT_QUEUE_TIMEOUT_SECONDS, f"AI backend '{self.name}' is at capacity. Please retry later.")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=CHAT_QUEUE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self.rejected_total += 1
+                raise AdmissionRejected(503, CHAT_QUEUE_TIMEOUT_SECONDS, f"Timed out waiting for AI backend '{self.name}'. Please retry later.")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.active += 1
+        self.admitted_total += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def snapshot(self) -> Dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted_total": self.admitted_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+class AdmissionController:
+    """Per-user rate limits (shared by all gateway workers) and per-backend pools (per worker)."""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AdmissionController, cls).__new__(cls)
+            cls._instance._pools = {
+                name: BackendPool(name, limits["max_concurrency"], limits["max_queue"])
+                for name, limits in CHAT_BACKEND_LIMITS.items()
+            }
+            cls._instance.rate_limited_total = 0
+        return cls._instance
+
+    async def check_rate_limit(self, user_id: int):
+        allowed, retry_after = await shared_state.take_token(
+            f"ratelimit:chat:{user_id}", CHAT_RATE_LIMIT_PER_MINUTE / 60.0, CHAT_RATE_LIMIT_BURST
+        )
+        if not allowed:
+            self.rate_limited_total += 1
+            logger.warning(f"User {user_id} exceeded the chat rate limit.")
+            raise AdmissionRejected(429, retry_after, "Too many chat requests. Please slow down.")
+
+    def pool(self, backend: str) -> BackendPool:
+        return self._pools[backend]
+
+    def snapshot(self) -> Dict:
+        return {
+            "rate_limited_total": self.rate_limited_total,
+            "backends": {name: pool.snapshot() for name, pool in self._pools.items()},
+        }
+
+# Singleton instance
+admission_controller = AdmissionController()
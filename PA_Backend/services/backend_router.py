@@ -0,0 +1,137 @@
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    ROUTER_EWMA_ALPHA,
+    ROUTER_PRIOR_LATENCY_SECONDS,
+    ROUTER_STATS_TTL_SECONDS,
+    ROUTER_LONG_PROMPT_TOKENS,
+    ROUTER_OFFLOAD_BACKEND,
+)
+from services.admission_control import admission_controller
+from services.circuit_breaker import circuit_breakers, OPEN
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker guarding each backend's upstream; local generation has none in-process
+BACKEND_UPSTREAMS = {"local": "local_llm", "gcp": "gcp_llm", "ncc": "ai_chatbot"}
+
+_DECISIONS = metrics.counter(
+    "gateway_router_decisions_total",
+    "Automatic AI backend selections by chosen backend and reason.",
+    ("backend", "reason"),
+)
+
+
+class BackendStats:
+    """Exponentially weighted latency and error rate of one backend, as seen by this worker."""
+
+    def __init__(self, prior_latency: float):
+        self.prior_latency = prior_latency
+        self.latency = prior_latency
+        self.error_rate = 0.0
+        self.samples = 0
+        self.updated_at = 0.0
+
+    def expire(self):
+        # A backend that stopped being chosen never gets fresh samples, so stale stats are dropped
+        if self.samples and time.monotonic() - self.updated_at > ROUTER_STATS_TTL_SECONDS:
+            self.latency, self.error_rate, self.samples = self.prior_latency, 0.0, 0
+
+    def record(self, seconds: float, ok: bool):
+        self.expire()
+        alpha = ROUTER_EWMA_ALPHA if self.samples else 1.0 # The first sample replaces the prior
+        if ok:
+            self.latency += alpha * (seconds - self.latency)
+        self.error_rate += ROUTER_EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        self.samples += 1
+        self.updated_at = time.monotonic()
+
+
+class BackendRouter:
+    """Chooses an AI backend for chats that did not select one.
+
+    A backend's expected completion time is its EWMA latency scaled by the waves of
+    queued work ahead of the request (from admission control) and inflated by its
+    recent error rate. Long prompts and background requests go to the offload
+    backend (NCC) when it is eligible, keeping interactive capacity free.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(BackendRouter, cls).__new__(cls)
+            cls._instance._stats = {name: BackendStats(prior) for name, prior in ROUTER_PRIOR_LATENCY_SECONDS.items()}
+        return cls._instance
+
+    def record(self, backend: str, seconds: float, ok: bool):
+        stats = self._stats.get(backend)
+        if stats is not None:
+            stats.record(seconds, ok)
+
+    def estimate(self, backend: str) -> float:
+        stats = self._stats[backend]
+        stats.expire()
+        pool = admission_controller.pool(backend).snapshot()
+        ahead = pool["active"] + pool["waiting"] + 1
+        waves = max(1.0, ahead / pool["max_concurrency"])
+        return stats.latency * waves / max(0.05, 1.0 - stats.error_rate)
+
+    def _breaker_open(self, backend: str) -> bool:
+        snap = circuit_breakers.snapshot().get(BACKEND_UPSTREAMS.get(backend))
+        return snap is not None and snap["state"] == OPEN
+
+    def choose(self, eligible: List[str], prompt_tokens: int, priority: Optional[str] = None, max_latency_seconds: Optional[float] = None) -> Tuple[Optional[str], str]:
+        """Returns (backend, reason), or (None, reason) when nothing is eligible."""
+        candidates = [backend for backend in eligible if backend in self._stats and not self._breaker_open(backend)]
+        if not candidates:
+            # Every eligible breaker is open; let the request fail fast on one of them
+            candidates = [backend for backend in eligible if backend in self._stats]
+        if not candidates:
+            return None, "no_backend"
+
+        if ROUTER_OFFLOAD_BACKEND in candidates and len(candidates) > 1:
+            if priority == "background":
+                return self._decide(ROUTER_OFFLOAD_BACKEND, "background")
+            if prompt_tokens >= ROUTER_LONG_PROMPT_TOKENS and max_latency_seconds is None:
+                return self._decide(ROUTER_OFFLOAD_BACKEND, "long_prompt")
+
+        estimates = {backend: self.estimate(backend) for backend in candidates}
+        if max_latency_seconds is not None:
+            within = {backend: seconds for backend, seconds in estimates.items() if seconds <= max_latency_seconds}
+            if within:
+                return self._decide(min(within, key=within.get), "deadline")
+            return self._decide(min(estimates, key=estimates.get), "deadline_unmet")
+        return self._decide(min(estimates, key=estimates.get), "fastest" if len(candidates) > 1 else "only_option")
+
+    def _decide(self, backend: str, reason: str) -> Tuple[str, str]:
+        _DECISIONS.inc(backend=backend, reason=reason)
+        logger.debug(f"Routed chat to '{backend}' ({reason}).")
+        return backend, reason
+
+    def snapshot(self) -> Dict:
+        return {
+            name: {
+                "latency_seconds": stats.latency,
+                "error_rate": stats.error_rate,
+                "samples": stats.samples,
+                "estimated_seconds": self.estimate(name),
+            }
+            for name, stats in self._stats.items()
+        }
+
+# Singleton instance
+backend_router = BackendRouter()
+
+metrics.gauge_callback(
+    "gateway_router_estimated_seconds",
+    "Expected completion time per AI backend used for automatic routing.",
+    lambda: [({"backend": name}, snap["estimated_seconds"]) for name, snap in backend_router.snapshot().items()],
+)
+metrics.gauge_callback(
+    "gateway_router_error_rate",
+    "EWMA error rate per AI backend.",
+    lambda: [({"backend": name}, snap["error_rate"]) for name, snap in backend_router.snapshot().items()],
+)
@@ -0,0 +1,370 @@
+import time
+import queue
+import ctypes
+import codecs
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import llama_cpp
+
+from config import (
+    LLM_BATCH_MAX_SIZE,
+    LLM_BATCH_WAIT_MS,
+    LLM_BATCH_N_CTX,
+    LLM_PREFIX_CACHE_BYTES,
+    LLM_PREFIX_CACHE_MIN_TOKENS,
+    INFERENCE_QUEUE_MAX,
+)
+from services.admission_control import AdmissionRejected
+from services.metrics import metrics
+from services.prefix_cache import PrefixStateCache
+
+logger = logging.getLogger(__name__)
+
+BATCH_TOKENS = metrics.counter(
+    "gateway_llm_batch_tokens_total",
+    "Tokens processed by the local batching engine.",
+    ("model", "phase"),
+)
+BATCH_OCCUPANCY = metrics.histogram(
+    "gateway_llm_batch_occupancy",
+    "Sequences sharing each decode step of the local batching engine.",
+    ("model",),
+    buckets=tuple(range(1, LLM_BATCH_MAX_SIZE + 1)),
+)
+
+THROUGHPUT_WINDOW_SECONDS = 10.0
+_STOP = object()
+
+
+class _Sequence:
+    """One request being decoded. Owned by the engine thread once submitted."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, prompt_tokens: List[int], max_tokens: int, stop: List[str], temperature: float, top_p: float, top_k: int):
+        self.loop = loop
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.prompt_tokens = prompt_tokens
+        self.max_tokens = max_tokens
+        self.stop = stop
+        self.temperature = temperature
+        self.top_p = top_p
+        self.top_k = top_k
+        self.cancel_event = threading.Event()
+        self.seq_id: Optional[int] = None
+        self.n_past = 0
+        self.n_cached = 0 # Prompt tokens restored from the prefix cache
+        self.fed_tokens: List[int] = [] # Tokens whose KV is held in this sequence
+        self.generated = 0
+        self.last_token: Optional[int] = None
+        self.logits_index: Optional[int] = None
+        self.text = ""
+        self.emitted = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    @property
+    def reserved_tokens(self) -> int:
+        return len(self.prompt_tokens) + self.max_tokens
+
+    def send(self, kind: str, value=None):
+        self.loop.call_soon_threadsafe(self.events.put_nowait, (kind, value))
+
+    def append(self, piece: bytes) -> bool:
+        """Adds decoded text and emits what is safe to emit. Returns True if a stop sequence was hit."""
+        self.text += self._decoder.decode(piece)
+        for stop in self.stop:
+            index = self.text.find(stop)
+            if index != -1:
+                self.text = self.text[:index]
+                self.flush()
+                return True
+        # Hold back a possible partial stop sequence at the end of the text
+        holdback = max((len(stop) - 1 for stop in self.stop), default=0)
+        safe = max(self.emitted, len(self.text) - holdback)
+        if safe > self.emitted:
+            self.send("token", self.text[self.emitted:safe])
+            self.emitted = safe
+        return False
+
+    def flush(self):
+        if len(self.text) > self.emitted:
+            self.send("token", self.text[self.emitted:])
+            self.emitted = len(self.text)
+
+
+class BatchingEngine:
+    """Continuous batching over llama.cpp's multi-sequence batch API.
+
+    A single engine thread owns a dedicated llama_context with one KV sequence per
+    slot. Each step packs the next token of every running sequence, plus the prompts
+    of newly admitted ones, into one llama_decode call. Sequences join as soon as a
+    slot and KV space are free and leave as soon as they finish, so one long reply
+    does not hold up the others. When idle, the first request waits up to
+    LLM_BATCH_WAIT_MS for company before the first decode.
+    """
+    running: Dict[str, "BatchingEngine"] = {} # model name -> engine, read by /metrics
+
+    def __init__(self, llm, name: str = "default"):
+        self.name = name
+        self._llm = llm
+        self.max_batch = LLM_BATCH_MAX_SIZE
+        self.n_ctx = LLM_BATCH_N_CTX
+        params = llama_cpp.llama_context_default_params()
+        params.n_ctx = self.n_ctx
+        params.n_batch = self.n_ctx
+        params.n_seq_max = self.max_batch
+        params.n_threads = llm.context_params.n_threads
+        params.n_threads_batch = llm.context_params.n_threads_batch
+        self._ctx = llama_cpp.llama_init_from_model(llm.model, params)
+        if self._ctx is None:
+            raise RuntimeError("Failed to create llama.cpp context for the batching engine.")
+        self._memory = llama_cpp.llama_get_memory(self._ctx)
+        self._batch = llama_cpp.llama_batch_init(self.n_ctx, 0, 1)
+        self._n_vocab = llm.n_vocab()
+        self._eos = llm.token_eos()
+        self._rng = np.random.default_rng()
+        self.prefix_cache = PrefixStateCache(LLM_PREFIX_CACHE_BYTES, LLM_PREFIX_CACHE_MIN_TOKENS) if LLM_PREFIX_CACHE_BYTES > 0 else None
+
+        self._pending: "queue.Queue" = queue.Queue()
+        self._waiting: Deque[_Sequence] = deque()
+        self._active: Dict[int, _Sequence] = {}
+        self._free_slots = list(range(self.max_batch))
+        self._throughput: Deque[Tuple[float, int]] = deque()
+        self.steps_total = 0
+        self.occupancy_sum = 0
+
+        BatchingEngine.running[name] = self
+        self._thread = threading.Thread(target=self._run, name="llm-batching", daemon=True)
+        self._thread.start()
+        logger.info(f"Batching engine for '{name}' started (max_batch={self.max_batch}, n_ctx={self.n_ctx}, wait={LLM_BATCH_WAIT_MS}ms).")
+
+    # --- Async API ---
+    async def stream(self, prompt: str, max_tokens: int, stop: List[str], temperature: float = 0.8, top_p: float = 0.95, top_k: int = 40) -> AsyncIterator[str]:
+        if self._pending.qsize() + len(self._waiting) >= INFERENCE_QUEUE_MAX:
+            raise AdmissionRejected(503, 5, "Local inference queue is full. Please retry later.")
+        prompt_tokens = self._llm.tokenize(prompt.encode("utf-8"), add_bos=True)
+        max_tokens = min(max_tokens, self.n_ctx - len(prompt_tokens))
+        if max_tokens <= 0:
+            raise ValueError(f"Prompt of {len(prompt_tokens)} tokens does not fit the batching context ({self.n_ctx}).")
+        seq = _Sequence(asyncio.get_running_loop(), prompt_tokens, max_tokens, stop, temperature, top_p, top_k)
+        self._pending.put(seq)
+        try:
+            while True:
+                kind, value = await seq.events.get()
+                if kind == "token":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            # Consumer finished, stopped early or was cancelled; the engine drops the sequence next step
+            seq.cancel_event.set()
+
+    async def generate(self, prompt: str, max_tokens: int, stop: List[str], **sampling) -> str:
+        return "".join([token async for token in self.stream(prompt, max_tokens, stop, **sampling)])
+
+    # --- Engine thread ---
+    def _run(self):
+        while True:
+            if not self._active and not self._waiting:
+                item = self._pending.get()
+                if item is _STOP:
+                    break
+                self._waiting.append(item)
+                # Idle engine: give concurrent requests a short window to share the first step
+                deadline = time.monotonic() + LLM_BATCH_WAIT_MS / 1000.0
+                while len(self._waiting) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._pending.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        return self._close()
+                    self._waiting.append(item)
+            else:
+                while True:
+                    try:
+                        item = self._pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        return self._close()
+                    self._waiting.append(item)
+            try:
+                self._step()
+            except Exception as e:
+                logger.error(f"Batching engine step failed: {e}")
+                for seq in list(self._active.values()):
+                    self._finish(seq, error=e)
+        self._close()
+
+    def _reserved(self) -> int:
+        return sum(seq.reserved_tokens for seq in self._active.values())
+
+    def _admit(self) -> List[_Sequence]:
+        admitted = []
+        while self._waiting and self._free_slots:
+            seq = self._waiting[0]
+            if seq.cancel_event.is_set():
+                self._waiting.popleft()
+                seq.send("done")
+                continue
+            # Reserve prompt + max_tokens of KV space up front so running sequences never run out
+            if self._reserved() + seq.reserved_tokens > self.n_ctx:
+                break
+            self._waiting.popleft()
+            seq.seq_id = self._free_slots.pop()
+            self._active[seq.seq_id] = seq
+            self._restore_prefix(seq)
+            admitted.append(seq)
+        return admitted
+
+    def _restore_prefix(self, seq: _Sequence):
+        if self.prefix_cache is None:
+            return
+        state, length = self.prefix_cache.lookup(seq.prompt_tokens)
+        if state is None:
+            return
+        # At least one prompt token must still be evaluated to get logits for the first sample
+        length = min(length, len(seq.prompt_tokens) - 1)
+        if not llama_cpp.llama_state_seq_set_data(self._ctx, state, len(state), seq.seq_id):
+            logger.warning(f"Failed to restore cached KV state into sequence {seq.seq_id}.")
+            llama_cpp.llama_memory_seq_rm(self._memory, seq.seq_id, -1, -1)
+            return
+        # Drop cached positions past the shared prefix (e.g. the end of the previous reply)
+        llama_cpp.llama_memory_seq_rm(self._memory, seq.seq_id, length, -1)
+        seq.n_cached = length
+
+    def _save_prefix(self, seq: _Sequence):
+        if self.prefix_cache is None or len(seq.fed_tokens) < self.prefix_cache.min_tokens:
+            return
+        size = llama_cpp.llama_state_seq_get_size(self._ctx, seq.seq_id)
+        if size > self.prefix_cache.capacity_bytes:
+            return
+        state = (ctypes.c_uint8 * size)()
+        written = llama_cpp.llama_state_seq_get_data(self._ctx, state, size, seq.seq_id)
+        if written:
+            self.prefix_cache.put(seq.fed_tokens, state)
+
+    def _add_token(self, index: int, token: int, pos: int, seq_id: int, logits: bool):
+        self._batch.token[index] = token
+        self._batch.pos[index] = pos
+        self._batch.n_seq_id[index] = 1
+        self._batch.seq_id[index][0] = seq_id
+        self._batch.logits[index] = logits
+
+    def _step(self):
+        for seq in [seq for seq in self._active.values() if seq.cancel_event.is_set()]:
+            self._finish(seq)
+        admitted = self._admit()
+        if not self._active:
+            return
+
+        n = 0
+        prefill = 0
+        for seq in self._active.values():
+            if seq in admitted:
+                for pos in range(seq.n_cached, len(seq.prompt_tokens)):
+                    self._add_token(n, seq.prompt_tokens[pos], pos, seq.seq_id, pos == len(seq.prompt_tokens) - 1)
+                    n += 1
+                seq.n_past = len(seq.prompt_tokens)
+                seq.fed_tokens = list(seq.prompt_tokens)
+                prefill += len(seq.prompt_tokens) - seq.n_cached
+            else:
+                self._add_token(n, seq.last_token, seq.n_past, seq.seq_id, True)
+                n += 1
+                seq.n_past += 1
+                seq.fed_tokens.append(seq.last_token)
+            seq.logits_index = n - 1
+        self._batch.n_tokens = n
+
+        result = llama_cpp.llama_decode(self._ctx, self._batch)
+        if result != 0:
+            raise RuntimeError(f"llama_decode returned {result}")
+
+        occupancy = len(self._active)
+        decoded = n - prefill # Sequences admitted this step only ran their prompt
+        self.steps_total += 1
+        self.occupancy_sum += occupancy
+        BATCH_OCCUPANCY.observe(occupancy, model=self.name)
+        BATCH_TOKENS.inc(prefill, model=self.name, phase="prefill")
+        BATCH_TOKENS.inc(decoded, model=self.name, phase="decode")
+        self._throughput.append((time.monotonic(), decoded))
+
+        for seq in list(self._active.values()):
+            token = self._sample(seq)
+            seq.generated += 1
+            if token == self._eos:
+                self._finish(seq)
+                continue
+            seq.last_token = token
+            if seq.append(self._llm.detokenize([token])) or seq.generated >= seq.max_tokens:
+                self._finish(seq)
+
+    def _sample(self, seq: _Sequence) -> int:
+        logits = np.ctypeslib.as_array(llama_cpp.llama_get_logits_ith(self._ctx, seq.logits_index), shape=(self._n_vocab,))
+        if seq.temperature <= 0:
+            return int(np.argmax(logits))
+        top = np.argpartition(logits, -seq.top_k)[-seq.top_k:] if seq.top_k > 0 else np.arange(self._n_vocab)
+        scaled = logits[top].astype(np.float64) / seq.temperature
+        probs = np.exp(scaled - scaled.max())
+        probs /= probs.sum()
+        order = np.argsort(-probs)
+        keep = order[: int(np.searchsorted(np.cumsum(probs[order]), seq.top_p)) + 1]
+        return int(top[self._rng.choice(keep, p=probs[keep] / probs[keep].sum())])
+
+    def _finish(self, seq: _Sequence, error: Optional[Exception] = None):
+        self._active.pop(seq.seq_id, None)
+        if error is None and seq.fed_tokens:
+            try:
+                self._save_prefix(seq)
+            except Exception as e:
+                logger.warning(f"Failed to cache KV state for sequence {seq.seq_id}: {e}")
+        llama_cpp.llama_memory_seq_rm(self._memory, seq.seq_id, -1, -1)
+        self._free_slots.append(seq.seq_id)
+        if error is not None:
+            seq.send("error", error)
+            return
+        seq.flush()
+        seq.send("done")
+
+    def _close(self):
+        for seq in list(self._waiting) + list(self._active.values()):
+            seq.send("error", RuntimeError("Batching engine stopped."))
+        llama_cpp.llama_batch_free(self._batch)
+        llama_cpp.llama_free(self._ctx)
+
+    def shutdown(self):
+        if BatchingEngine.running.get(self.name) is self:
+            del BatchingEngine.running[self.name]
+        self._pending.put(_STOP)
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        while self._throughput and now - self._throughput[0][0] > THROUGHPUT_WINDOW_SECONDS:
+            self._throughput.popleft()
+        return {
+            "max_batch": self.max_batch,
+            "active": len(self._active),
+            "waiting": len(self._waiting) + self._pending.qsize(),
+            "tokens_per_second": sum(tokens for _, tokens in self._throughput) / THROUGHPUT_WINDOW_SECONDS,
+            "mean_occupancy": self.occupancy_sum / self.steps_total if self.steps_total else 0.0,
+            "steps_total": self.steps_total,
+            "prefix_cache": self.prefix_cache.snapshot() if self.prefix_cache is not None else None,
+        }
+
+
+def _engine_samples(field: str):
+    for name, engine in list(BatchingEngine.running.items()):
+        yield {"model": name}, engine.snapshot()[field]
+
+metrics.gauge_callback("gateway_llm_batch_tokens_per_second", f"Decode throughput of the local batching engine over the last {THROUGHPUT_WINDOW_SECONDS:.0f}s.", lambda: _engine_samples("tokens_per_second"))
+metrics.gauge_callback("gateway_llm_batch_active_sequences", "Sequences currently decoding in the local batching engine.", lambda: _engine_samples("active"))
+metrics.gauge_callback("gateway_llm_batch_waiting_sequences", "Requests waiting for a batching engine slot.", lambda: _engine_samples("waiting"))
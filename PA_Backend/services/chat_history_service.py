@@ -0,0 +1,129 @@
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlmodel import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import (
+    CHAT_HISTORY_MAX_TURNS,
+    CHAT_HISTORY_PAGE_SIZE,
+    CHAT_HISTORY_KEEP_FRACTION,
+    CHAT_HISTORY_TOKEN_BUDGETS,
+    CHAT_SUMMARY_MAX_TOKENS,
+    CHAT_SUMMARY_FOLD_LIMIT,
+)
+from models import Chat, Message
+from services.local_llm_service import local_llm_service
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = "(Summary of the earlier conversation)"
+SUMMARY_LINE_CHARS = 200 # Each folded turn is clipped to this many characters per side
+
+
+def _approximate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _clip(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= SUMMARY_LINE_CHARS else text[:SUMMARY_LINE_CHARS - 3] + "..."
+
+
+class ChatHistoryService:
+    """Loads a bounded, token-budgeted window of recent turns for a chat.
+
+    Turns are read newest-first with keyset pagination on (chat_id, id), so the cost
+    of a request does not grow with the age of the conversation. Turns that fall out
+    of the window are folded into Chat.summary, which is sent ahead of the window.
+
+    The window starts right after the summarised turns. Once it overflows, older turns
+    are folded in one block, down to CHAT_HISTORY_KEEP_FRACTION of the window, so the
+    summary and window start (the prompt prefix) then stay fixed for several turns.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ChatHistoryService, cls).__new__(cls)
+        return cls._instance
+
+    def token_counter(self, backend: Optional[str]) -> Callable[[str], int]:
+        # Only the local model's tokenizer is available in-process
+        if backend == "local" and not local_llm_service.is_remote:
+            return local_llm_service.count_tokens
+        return _approximate_tokens
+
+    async def _page(self, session: AsyncSession, chat_id: int, before_id: Optional[int], after_id: Optional[int], limit: int) -> List[Message]:
+        query = select(Message).where(Message.chat_id == chat_id)
+        if before_id is not None:
+            query = query.where(Message.id < before_id)
+        if after_id is not None:
+            query = query.where(Message.id > after_id)
+        query = query.order_by(Message.id.desc()).limit(limit)
+        return (await session.execute(query)).scalars().all()
+
+    async def load(self, session: AsyncSession, chat: Chat, backend: Optional[str]) -> List[Dict]:
+        count_tokens = self.token_counter(backend)
+        budget = CHAT_HISTORY_TOKEN_BUDGETS.get(backend, min(CHAT_HISTORY_TOKEN_BUDGETS.values())) - CHAT_SUMMARY_MAX_TOKENS
+
+        # Unsummarised turns, newest first, with their token cost
+        turns: List[Tuple[Message, int]] = []
+        used = 0
+        cursor = None
+        overflow: Optional[Message] = None
+        while overflow is None:
+            page = await self._page(session, chat.id, cursor, chat.summary_through_message_id, CHAT_HISTORY_PAGE_SIZE)
+            for msg in page:
+                cost = count_tokens(msg.message) + count_tokens(msg.response)
+                if len(turns) == CHAT_HISTORY_MAX_TURNS or used + cost > budget:
+                    overflow = msg
+                    break
+                turns.append((msg, cost))
+                used += cost
+            if len(page) < CHAT_HISTORY_PAGE_SIZE:
+                break
+            cursor = page[-1].id
+
+        if overflow is not None:
+            # Fold a block rather than one turn per request, leaving room for the next turns to append
+            kept, used = 0, 0
+            for _, cost in turns:
+                if kept + 1 > CHAT_HISTORY_MAX_TURNS * CHAT_HISTORY_KEEP_FRACTION or used + cost > budget * CHAT_HISTORY_KEEP_FRACTION:
+                    break
+                kept += 1
+                used += cost
+            newest_folded = turns[kept][0] if kept < len(turns) else overflow
+            turns = turns[:kept]
+            await self._fold(session, chat, newest_folded.id + 1)
+
+        window = [msg for msg, _ in reversed(turns)]
+        history = [{"message": msg.message, "response": msg.response} for msg in window]
+        if chat.summary:
+            history.insert(0, {"message": SUMMARY_PROMPT, "response": chat.summary})
+        logger.debug(f"Chat {chat.id}: {len(window)} turns (~{used} tokens) in window, summary through message {chat.summary_through_message_id}")
+        return history
+
+    async def _fold(self, session: AsyncSession, chat: Chat, before_id: int):
+        """Appends turns older than before_id that are not yet summarised to the rolling summary."""
+        query = select(Message).where(Message.chat_id == chat.id, Message.id < before_id)
+        if chat.summary_through_message_id is not None:
+            query = query.where(Message.id > chat.summary_through_message_id)
+        # Bounded per request; anything older than the newest FOLD_LIMIT unsummarised turns is dropped
+        query = query.order_by(Message.id.desc()).limit(CHAT_SUMMARY_FOLD_LIMIT)
+        dropped = list(reversed((await session.execute(query)).scalars().all()))
+        if not dropped:
+            return
+
+        lines = chat.summary.split("\n") if chat.summary else []
+        lines.extend(f"User: {_clip(msg.message)} | Assistant: {_clip(msg.response)}" for msg in dropped)
+        # Keep the newest lines that fit the summary budget
+        while len(lines) > 1 and _approximate_tokens("\n".join(lines)) > CHAT_SUMMARY_MAX_TOKENS:
+            lines.pop(0)
+        chat.summary = "\n".join(lines)
+        chat.summary_through_message_id = dropped[-1].id
+        session.add(chat)
+        logger.info(f"Folded {len(dropped)} turns into the summary for chat {chat.id}.")
+
+# Singleton instance
+chat_history_service = ChatHistoryService()
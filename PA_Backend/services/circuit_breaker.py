@@ -0,0 +1,201 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Deque, Tuple
+
+from config import (
+    BREAKER_WINDOW_SECONDS,
+    BREAKER_MIN_CALLS,
+    BREAKER_ERROR_RATE_THRESHOLD,
+    BREAKER_SLOW_CALL_RATE_THRESHOLD,
+    BREAKER_SLOW_CALL_TIMEOUT_FRACTION,
+    BREAKER_OPEN_SECONDS,
+    BREAKER_HALF_OPEN_MAX_CALLS,
+    BREAKER_MAX_CONCURRENCY,
+    BREAKER_BULKHEAD_WAIT_SECONDS,
+    ADAPTIVE_TIMEOUT_MULTIPLIER,
+    ADAPTIVE_TIMEOUT_FLOOR,
+)
+from services.http_client_service import http_client_service
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when an upstream call is rejected without being attempted."""
+
+    def __init__(self, upstream: str, retry_after: float, reason: str = "circuit open"):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        self.reason = reason
+        super().__init__(f"Upstream '{upstream}' unavailable ({reason}). Retry after {retry_after:.0f}s.")
+
+
+class _Call:
+    """Handle yielded by CircuitBreaker.guard() so callers can flag soft failures (e.g. HTTP 5xx)."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, max_timeout: float):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        # (timestamp, succeeded, latency_seconds, slow)
+        self._window: Deque[Tuple[float, bool, float, bool]] = deque()
+        self._semaphore = asyncio.Semaphore(BREAKER_MAX_CONCURRENCY)
+        self._in_flight = 0
+        self.rejected_total = 0
+        self.opened_total = 0
+
+    def _trim(self, now: float):
+        while self._window and now - self._window[0][0] > BREAKER_WINDOW_SECONDS:
+            self._window.popleft()
+
+    def p99_latency(self) -> Optional[float]:
+        latencies = sorted(latency for _, ok, latency, _ in self._window if ok)
+        if len(latencies) < BREAKER_MIN_CALLS:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+    def timeout(self) -> float:
+        """Adaptive timeout: a multiple of the observed p99, capped at the configured upstream timeout."""
+        p99 = self.p99_latency()
+        if p99 is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(ADAPTIVE_TIMEOUT_FLOOR, p99 * ADAPTIVE_TIMEOUT_MULTIPLIER))
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        logger.warning(f"Circuit breaker '{self.name}' {self.state} -> {state}")
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.opened_total += 1
+        elif state == HALF_OPEN:
+            self._half_open_calls = 0
+        elif state == CLOSED:
+            self._window.clear()
+
+    def _before_call(self):
+        if self.state == OPEN:
+            remaining = BREAKER_OPEN_SECONDS - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                self.rejected_total += 1
+                raise CircuitOpenError(self.name, remaining)
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._half_open_calls >= BREAKER_HALF_OPEN_MAX_CALLS:
+                self.rejected_total += 1
+                raise CircuitOpenError(self.name, BREAKER_OPEN_SECONDS, "half-open probe in progress")
+            self._half_open_calls += 1
+
+    def _record(self, succeeded: bool, latency: float, timeout: float):
+        now = time.monotonic()
+        slow = latency >= timeout * BREAKER_SLOW_CALL_TIMEOUT_FRACTION
+        if self.state == HALF_OPEN:
+            # A single probe decides whether the upstream has recovered
+            self._transition(CLOSED if succeeded else OPEN)
+            if succeeded:
+                self._window.append((now, succeeded, latency, slow))
+            return
+
+        self._window.append((now, succeeded, latency, slow))
+        self._trim(now)
+        calls = len(self._window)
+        if self.state != CLOSED or calls < BREAKER_MIN_CALLS:
+            return
+        error_rate = sum(1 for _, ok, _, _ in self._window if not ok) / calls
+        slow_rate = sum(1 for _, _, _, slow in self._window if slow) / calls
+        if error_rate >= BREAKER_ERROR_RATE_THRESHOLD or slow_rate >= BREAKER_SLOW_CALL_RATE_THRESHOLD:
+            self._transition(OPEN)
+
+    def _release_probe(self):
+        # A call that ends without a verdict (rejected or cancelled) hands its half-open probe slot back
+        if self.state == HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    @asynccontextmanager
+    async def guard(self):
+        self._before_call()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=BREAKER_BULKHEAD_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            self._release_probe()
+            self.rejected_total += 1
+            raise CircuitOpenError(self.name, 1, "bulkhead full")
+        except BaseException:
+            self._release_probe()
+            raise
+
+        call = _Call(self.timeout())
+        self._in_flight += 1
+        start = time.monotonic()
+        try:
+            yield call
+        except Exception:
+            self._record(False, time.monotonic() - start, call.timeout)
+            raise
+        except BaseException:
+            # Cancelled (client gone, outer timeout): says nothing about the upstream's health
+            self._release_probe()
+            raise
+        else:
+            self._record(not call.failed, time.monotonic() - start, call.timeout)
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        self._trim(now)
+        calls = len(self._window)
+        failures = sum(1 for _, ok, _, _ in self._window if not ok)
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "window_error_rate": failures / calls if calls else 0.0,
+            "p99_latency_seconds": self.p99_latency(),
+            "timeout_seconds": self.timeout(),
+            "in_flight": self._in_flight,
+            "rejected_total": self.rejected_total,
+            "opened_total": self.opened_total,
+        }
+
+
+class CircuitBreakerRegistry:
+    _instance = None
+    _breakers: Dict[str, CircuitBreaker] = {}
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CircuitBreakerRegistry, cls).__new__(cls)
+        return cls._instance
+
+    def get(self, upstream: str) -> CircuitBreaker:
+        breaker = self._breakers.get(upstream)
+        if breaker is None:
+            breaker = CircuitBreaker(upstream, max_timeout=http_client_service.read_timeout(upstream))
+            self._breakers[upstream] = breaker
+        return breaker
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {name: breaker.snapshot() for name, breaker in self._breakers.items()}
+
+# Singleton instance
+circuit_breakers = CircuitBreakerRegistry()
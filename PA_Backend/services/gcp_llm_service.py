@@ -1,7 +1,11 @@
 import os
+import json
 import httpx
 import logging # Import logging module
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, AsyncIterator
+
+from services.http_client_service import http_client_service
+from services.circuit_breaker import circuit_breakers
 
 logger = logging.getLogger(__name__) # Get logger for this module
 
@@ -33,23 +37,71 @@ class GcpLLMService:
             "context": context if context else []
         }
 
-        async with httpx.AsyncClient() as client:
-            try:
-                logger.info(f"Sending request to GCP LLM at: {self._cloud_run_url}")
+        client = http_client_service.get_client("gcp_llm")
+        try:
+            logger.info(f"Sending request to GCP LLM at: {self._cloud_run_url}")
+            async with circuit_breakers.get("gcp_llm").guard() as call:
                 response = await client.post(
                     self._cloud_run_url,
                     json=request_payload,
-                    timeout=300.0 # Long timeout for LLM inference
+                    timeout=call.timeout
                 )
-                response.raise_for_status()
-                logger.info("Received successful response from GCP LLM.")
-                return response.json().get("response", "No response from GCP LLM.")
-            except httpx.RequestError as exc:
-                logger.error(f"GCP LLM service communication error: {exc}")
-                raise Exception(f"GCP LLM service communication error: {exc}")
-            except httpx.HTTPStatusError as exc:
-                logger.error(f"GCP LLM service returned error: {exc.response.status_code} - {exc.response.text}")
-                raise Exception(f"GCP LLM service returned error: {exc.response.status_code} - {exc.response.text}")
+                if response.status_code >= 500:
+                    call.fail()
+            response.raise_for_status()
+            logger.info("Received successful response from GCP LLM.")
+            return response.json().get("response", "No response from GCP LLM.")
+        except httpx.RequestError as exc:
+            logger.error(f"GCP LLM service communication error: {exc}")
+            raise Exception(f"GCP LLM service communication error: {exc}")
+        except httpx.HTTPStatusError as exc:
+            logger.error(f"GCP LLM service returned error: {exc.response.status_code} - {exc.response.text}")
+            raise Exception(f"GCP LLM service returned error: {exc.response.status_code} - {exc.response.text}")
+
+    async def stream_response(self, prompt: str, chat_history: List[Dict], context: Optional[List[Dict]] = None) -> AsyncIterator[str]:
+        """Yields response text as the Cloud Run service produces it.
+
+        Expects NDJSON or SSE lines carrying {"token": ...}; a service that ignores
+        "stream" and replies with plain JSON is yielded as a single chunk.
+        """
+        if not self._cloud_run_url:
+            logger.error("GCP LLM Service not initialized. Call initialize() first.")
+            raise Exception("GCP LLM Service not initialized. Call initialize() first.")
+
+        request_payload = {
+            "prompt": prompt,
+            "chat_history": chat_history,
+            "context": context if context else [],
+            "stream": True,
+        }
+
+        client = http_client_service.get_client("gcp_llm")
+        logger.info(f"Streaming request to GCP LLM at: {self._cloud_run_url}")
+        error = None
+        async with circuit_breakers.get("gcp_llm").guard() as call:
+            async with client.stream("POST", self._cloud_run_url, json=request_payload, timeout=call.timeout) as response:
+                if response.is_error:
+                    # Only 5xx counts against the breaker; the error is raised once the guard has recorded the call
+                    if response.status_code >= 500:
+                        call.fail()
+                    await response.aread()
+                    error = f"GCP LLM service returned error: {response.status_code} - {response.text}"
+                else:
+                    content_type = response.headers.get("content-type", "")
+                    if "ndjson" not in content_type and "event-stream" not in content_type:
+                        yield json.loads(await response.aread()).get("response", "No response from GCP LLM.")
+                        return
+                    async for line in response.aiter_lines():
+                        line = line.strip()
+                        if line.startswith("data:"):
+                            line = line[5:].strip()
+                        if not line or line == "[DONE]":
+                            continue
+                        chunk = json.loads(line)
+                        yield chunk.get("token", chunk.get("response", ""))
+        if error:
+            logger.error(error)
+            raise Exception(error)
 
 # Singleton instance
 gcp_llm_service = GcpLLMService()
@@ -0,0 +1,24 @@
+from typing import Dict, Optional
+
+from config import AI_MODELS, LLM_GENERATION_DEFAULTS, LLM_GENERATION_PROFILES, LLM_LOAD_DEFAULTS
+
+SAMPLING_KEYS = ("temperature", "top_p", "top_k")
+
+
+def generation_settings(model_name: Optional[str], profile: str = "chat", max_tokens: Optional[int] = None) -> Dict:
+    """Resolves max_tokens, stop and sampling settings for one local generation."""
+    if profile not in LLM_GENERATION_PROFILES:
+        raise ValueError(f"Unknown generation profile '{profile}'.")
+    model_config = AI_MODELS.get(model_name, {}) if model_name else {}
+    settings = {**LLM_GENERATION_DEFAULTS, **model_config.get("generation", {}), **LLM_GENERATION_PROFILES[profile]}
+    # A caller's budget can shorten a reply but never lengthen it past the profile
+    if max_tokens is not None:
+        settings["max_tokens"] = max(1, min(settings["max_tokens"], max_tokens))
+    return settings
+
+
+def load_settings(model_name: Optional[str]) -> Dict:
+    """llama.cpp constructor settings (n_ctx, n_batch, n_threads) for a local model."""
+    model_config = AI_MODELS.get(model_name, {}) if model_name else {}
+    settings = {**LLM_LOAD_DEFAULTS, **model_config.get("llama", {})}
+    return {key: value for key, value in settings.items() if value is not None}
@@ -0,0 +1,161 @@
+import os
+import time
+import httpx
+import logging
+import ipaddress
+import urllib.request
+from typing import Dict, Optional
+
+from config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_WRITE_TIMEOUT,
+    HTTP_POOL_TIMEOUT,
+    HTTP_ENABLE_HTTP2,
+)
+from services.metrics import UPSTREAM_REQUEST_SECONDS, UPSTREAM_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Upstreams that get their own connection pool. Anything else shares "default".
+UPSTREAMS = ["auth", "finance", "ai_chatbot", "gcp_llm", "graph", "jira", "brave", "oauth", "local_llm", "default"]
+
+# Per-upstream defaults that differ from the global settings
+UPSTREAM_DEFAULTS = {
+    "gcp_llm": {"read_timeout": 300.0},  # LLM inference can take minutes
+    "ai_chatbot": {"read_timeout": 900.0},  # NCC jobs wait on SLURM queueing
+    "local_llm": {"read_timeout": 300.0},  # Dedicated local inference process
+}
+
+
+def _upstream_setting(upstream: str, name: str, default, cast):
+    value = os.getenv(f"HTTP_{upstream.upper()}_{name.upper()}")
+    if value is None:
+        return UPSTREAM_DEFAULTS.get(upstream, {}).get(name, default)
+    if cast is bool:
+        return value.lower() == "true"
+    return cast(value)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _environment_proxies() -> Dict[str, str]:
+    """HTTP(S)_PROXY / ALL_PROXY / NO_PROXY as mount patterns, as httpx reads them when it builds its own transport.
+
+    A NO_PROXY pattern maps to "" (no proxy).
+    """
+    settings = urllib.request.getproxies()
+    proxies = {}
+    for scheme in ("http", "https", "all"):
+        if settings.get(scheme):
+            url = settings[scheme]
+            proxies[f"{scheme}://"] = url if "://" in url else f"http://{url}"
+    for host in (host.strip() for host in settings.get("no", "").split(",")):
+        if host == "*":
+            return {}
+        if not host:
+            continue
+        if "://" in host:
+            proxies[host] = ""
+            continue
+        try:
+            address = ipaddress.ip_address(host)
+            proxies[f"all://[{host}]" if address.version == 6 else f"all://{host}"] = ""
+        except ValueError:
+            proxies[f"all://{host}" if host.lower() == "localhost" else f"all://*{host}"] = ""
+    return proxies
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Records time-to-response-headers and transport errors for one upstream."""
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TransportError as exc:
+            UPSTREAM_ERRORS.inc(upstream=self.upstream, error=type(exc).__name__)
+            raise
+        UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - start, upstream=self.upstream, status=response.status_code)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class HttpClientService:
+    """App-lifetime registry of pooled httpx clients, one per upstream service."""
+    _instance = None
+    _clients: Dict[str, httpx.AsyncClient] = {}
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(HttpClientService, cls).__new__(cls)
+        return cls._instance
+
+    def _build_client(self, upstream: str) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=_upstream_setting(upstream, "max_connections", HTTP_MAX_CONNECTIONS, int),
+            max_keepalive_connections=_upstream_setting(upstream, "max_keepalive_connections", HTTP_MAX_KEEPALIVE_CONNECTIONS, int),
+            keepalive_expiry=_upstream_setting(upstream, "keepalive_expiry", HTTP_KEEPALIVE_EXPIRY, float),
+        )
+        timeout = httpx.Timeout(
+            connect=_upstream_setting(upstream, "connect_timeout", HTTP_CONNECT_TIMEOUT, float),
+            read=_upstream_setting(upstream, "read_timeout", HTTP_READ_TIMEOUT, float),
+            write=_upstream_setting(upstream, "write_timeout", HTTP_WRITE_TIMEOUT, float),
+            pool=_upstream_setting(upstream, "pool_timeout", HTTP_POOL_TIMEOUT, float),
+        )
+        http2 = _upstream_setting(upstream, "enable_http2", HTTP_ENABLE_HTTP2, bool)
+        if http2 and not _http2_available():
+            logger.warning(f"HTTP/2 requested for upstream '{upstream}' but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+            http2 = False
+        logger.info(f"Creating HTTP client for upstream '{upstream}' (limits={limits}, timeout={timeout}, http2={http2})")
+
+        def transport(proxy: Optional[str] = None) -> _InstrumentedTransport:
+            return _InstrumentedTransport(upstream, httpx.AsyncHTTPTransport(limits=limits, http2=http2, proxy=proxy))
+
+        # httpx ignores proxy environment variables once a transport is passed, so they are mounted here;
+        # a None mount (NO_PROXY) falls back to the direct transport
+        mounts = {pattern: transport(proxy) if proxy else None for pattern, proxy in _environment_proxies().items()}
+        return httpx.AsyncClient(transport=transport(), mounts=mounts, timeout=timeout)
+
+    def read_timeout(self, upstream: str) -> float:
+        return _upstream_setting(upstream, "read_timeout", HTTP_READ_TIMEOUT, float)
+
+    def initialize(self):
+        for upstream in UPSTREAMS:
+            if upstream not in self._clients:
+                self._clients[upstream] = self._build_client(upstream)
+        logger.info(f"HTTP client pools initialized for upstreams: {', '.join(UPSTREAMS)}")
+
+    def get_client(self, upstream: str = "default") -> httpx.AsyncClient:
+        if upstream not in UPSTREAMS:
+            upstream = "default"
+        client = self._clients.get(upstream)
+        if client is None or client.is_closed:
+            # Callers outside the app lifecycle (e.g. agent tools) still get a pooled client
+            client = self._build_client(upstream)
+            self._clients[upstream] = client
+        return client
+
+    async def close(self):
+        for upstream, client in list(self._clients.items()):
+            await client.aclose()
+            logger.info(f"Closed HTTP client for upstream '{upstream}'")
+        self._clients.clear()
+
+# Singleton instance
+http_client_service = HttpClientService()
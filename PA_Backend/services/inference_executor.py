@@ -0,0 +1,183 @@
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Hashable, Optional
+
+from config import INFERENCE_WORKERS, INFERENCE_QUEUE_MAX
+from services.admission_control import AdmissionRejected
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first. Streaming users are waiting on the first token; blocking calls can wait a little longer.
+PRIORITY_STREAM = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BACKGROUND = 10
+
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "gateway_inference_queue_wait_seconds",
+    "Time local inference jobs spend queued before a worker picks them up.",
+    ("priority",),
+)
+_JOBS = metrics.counter(
+    "gateway_inference_jobs_total",
+    "Local inference jobs by final outcome.",
+    ("outcome",),
+)
+
+_END = object()
+
+
+class _Job:
+    def __init__(self, priority: int, seq: int, ready: asyncio.Future, lane: Optional[Hashable] = None):
+        self.priority = priority
+        self.seq = seq
+        self.ready = ready
+        self.lane = lane
+        self.enqueued_at = time.perf_counter()
+        self.cancel_event = threading.Event() # Checked by llama.cpp stopping criteria between tokens
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class InferenceExecutor:
+    """Runs blocking llama.cpp calls on dedicated worker threads, off the event loop.
+
+    Jobs wait in a bounded priority queue; a full queue rejects with 503. A caller that
+    is cancelled (e.g. the client disconnected) is removed from the queue, or, if already
+    running, has its cancel_event set so generation stops at the next token.
+
+    Jobs sharing a `lane` (e.g. one llama.cpp context) never run at the same time, so
+    INFERENCE_WORKERS > 1 only runs different models in parallel.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(InferenceExecutor, cls).__new__(cls)
+            cls._instance._pool = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="llm-inference")
+            cls._instance._queue = [] # heap of _Job
+            cls._instance._seq = itertools.count()
+            cls._instance._busy_lanes = set()
+            cls._instance.running = 0
+        return cls._instance
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for job in self._queue if not job.ready.done())
+
+    def _dispatch(self):
+        blocked = [] # Jobs whose lane is busy keep their place in the queue
+        while self.running < INFERENCE_WORKERS and self._queue:
+            job = heapq.heappop(self._queue)
+            if job.ready.done(): # Caller went away while queued
+                continue
+            if job.lane is not None and job.lane in self._busy_lanes:
+                blocked.append(job)
+                continue
+            self.running += 1
+            if job.lane is not None:
+                self._busy_lanes.add(job.lane)
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - job.enqueued_at, priority=job.priority)
+            job.ready.set_result(None)
+        for job in blocked:
+            heapq.heappush(self._queue, job)
+
+    def _finish(self, job: _Job):
+        self.running -= 1
+        self._busy_lanes.discard(job.lane)
+        self._dispatch()
+
+    def _release(self, job: _Job, loop: asyncio.AbstractEventLoop):
+        # Called from the worker thread once the blocking call has actually returned
+        loop.call_soon_threadsafe(self._finish, job)
+
+    async def _acquire(self, priority: int, lane: Optional[Hashable]) -> _Job:
+        if self.queued >= INFERENCE_QUEUE_MAX:
+            _JOBS.inc(outcome="rejected")
+            raise AdmissionRejected(503, 5, "Local inference queue is full. Please retry later.")
+        job = _Job(priority, next(self._seq), asyncio.get_running_loop().create_future(), lane)
+        heapq.heappush(self._queue, job)
+        self._dispatch()
+        try:
+            await job.ready
+        except asyncio.CancelledError:
+            if job.ready.done() and not job.ready.cancelled():
+                # A worker slot was granted in the same tick the caller was cancelled
+                self._finish(job)
+            _JOBS.inc(outcome="cancelled")
+            raise
+        return job
+
+    def _submit(self, job: _Job, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        future = self._pool.submit(fn, *args, cancel_event=job.cancel_event, **kwargs)
+        future.add_done_callback(lambda _: self._release(job, loop))
+        return future
+
+    async def run(self, fn: Callable, *args, priority: int = PRIORITY_INTERACTIVE, lane: Optional[Hashable] = None, **kwargs):
+        """Runs fn(*args, cancel_event=..., **kwargs) on a worker thread and returns its result."""
+        job = await self._acquire(priority, lane)
+        future = self._submit(job, fn, *args, **kwargs)
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            job.cancel_event.set()
+            _JOBS.inc(outcome="cancelled")
+            raise
+        except Exception:
+            _JOBS.inc(outcome="error")
+            raise
+        _JOBS.inc(outcome="completed")
+        return result
+
+    async def stream(self, fn: Callable, *args, priority: int = PRIORITY_STREAM, lane: Optional[Hashable] = None, **kwargs) -> AsyncIterator:
+        """Iterates the generator fn(*args, cancel_event=..., **kwargs) on a worker thread."""
+        job = await self._acquire(priority, lane)
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+
+        def produce(cancel_event: threading.Event):
+            try:
+                for item in fn(*args, cancel_event=cancel_event, **kwargs):
+                    if cancel_event.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(items.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(items.put_nowait, _END)
+
+        self._submit(job, produce)
+        outcome = "cancelled"
+        try:
+            while True:
+                item = await items.get()
+                if item is _END:
+                    outcome = "completed"
+                    return
+                if isinstance(item, Exception):
+                    outcome = "error"
+                    raise item
+                yield item
+        finally:
+            # Also reached when the consumer stops early or the client disconnects
+            job.cancel_event.set()
+            _JOBS.inc(outcome=outcome)
+
+    def snapshot(self) -> Dict:
+        return {"workers": INFERENCE_WORKERS, "running": self.running, "queued": self.queued, "max_queue": INFERENCE_QUEUE_MAX}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+# Singleton instance
+inference_executor = InferenceExecutor()
+
+metrics.gauge_callback("gateway_inference_queue_depth", "Local inference jobs waiting for a worker.", lambda: [({}, inference_executor.queued)])
+metrics.gauge_callback("gateway_inference_running", "Local inference jobs currently running.", lambda: [({}, inference_executor.running)])
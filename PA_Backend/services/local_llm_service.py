@@ -1,14 +1,24 @@
-from llama_cpp import Llama
-import os
+import json
+import asyncio
 import logging # Import logging module
-from typing import Optional, List, Dict
+import threading
+from typing import TYPE_CHECKING, Optional, List, Dict, Iterator, AsyncIterator
+
+from config import LOCAL_LLM_SERVER_URL
+from services.http_client_service import http_client_service
+from services.inference_executor import inference_executor, PRIORITY_INTERACTIVE, PRIORITY_STREAM
+from services.model_registry import model_registry
+from services.generation_profiles import generation_settings, SAMPLING_KEYS
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama # Imported lazily at runtime by the model registry
 
 logger = logging.getLogger(__name__) # Get logger for this module
 
 class LocalLLMService:
     _instance = None
-    _llm: Optional[Llama] = None
     _model_path: Optional[str] = None
+    _default_model: Optional[str] = None # Registry name of the model served when no model is requested
 
     def __new__(cls):
         if cls._instance is None:
@@ -18,22 +28,19 @@ class LocalLLMService:
     def load_model(self, model_path: str, n_gpu_layers: int = 0):
         # n_gpu_layers: Number of layers to offload to GPU. Set to 0 for CPU only.
         # For optimal performance, use quantized models (e.g., GGUF Q4_K_M)
-        if self._llm is None or self._model_path != model_path:
-            logger.info(f"Loading LLM model from: {model_path}")
-            if not os.path.exists(model_path):
-                logger.error(f"Model file not found at: {model_path}")
-                raise FileNotFoundError(f"Model file not found at: {model_path}")
-            self._llm = Llama(model_path=model_path, n_gpu_layers=n_gpu_layers)
-            self._model_path = model_path
-            logger.info("LLM model loaded successfully.")
-        else:
-            logger.info(f"Model {model_path} already loaded.")
-
-    def generate_response(self, prompt: str, chat_history: List[Dict], context: Optional[List[Dict]] = None) -> str:
-        if self._llm is None:
-            logger.error("LLM model not loaded. Call load_model() first.")
-            raise Exception("LLM model not loaded. Call load_model() first.")
+        name = model_registry.name_for_path(model_path)
+        model_registry.register(name, model_path, n_gpu_layers)
+        # The default model backs every chat request, so it is pinned against eviction
+        model_registry.pin(name)
+        self._default_model = name
+        self._model_path = model_path
 
+    @property
+    def _llm(self) -> Optional["Llama"]:
+        model = model_registry.loaded(self._default_model) if self._default_model else None
+        return model.llm if model is not None else None
+
+    def _build_prompt(self, prompt: str, chat_history: List[Dict], context: Optional[List[Dict]] = None) -> str:
         # Construct the full prompt including chat history and context
         full_prompt = ""
         if context:
@@ -44,15 +51,131 @@ class LocalLLMService:
             full_prompt += f"Assistant: {entry.get('response', '')}\n"
         
         full_prompt += f"User: {prompt}\nAssistant:"
+        return full_prompt
+
+    @staticmethod
+    def _stopping_criteria(cancel_event: Optional[threading.Event]):
+        # Lets a cancelled caller stop llama.cpp at the next token instead of finishing the completion
+        if cancel_event is None:
+            return None
+        from llama_cpp import StoppingCriteriaList
+        return StoppingCriteriaList([lambda input_ids, logits: cancel_event.is_set()])
 
-        logger.info(f"Generating response with prompt: {full_prompt}")
-        output = self._llm(
+    def generate_response(self, prompt: str, chat_history: List[Dict], context: Optional[List[Dict]] = None, cancel_event: Optional[threading.Event] = None, llm=None, settings: Optional[Dict] = None) -> str:
+        llm = llm or self._llm
+        if llm is None:
+            logger.error("LLM model not loaded. Call load_model() first.")
+            raise Exception("LLM model not loaded. Call load_model() first.")
+
+        settings = settings or generation_settings(self._default_model)
+        full_prompt = self._build_prompt(prompt, chat_history, context)
+        logger.debug(f"Generating response with prompt: {full_prompt}")
+        output = llm(
             full_prompt,
-            max_tokens=256, # TODO: Make configurable
-            stop=["User:", "Assistant:"], # TODO: Make configurable
+            max_tokens=settings["max_tokens"],
+            stop=settings["stop"],
             echo=False,
+            **{key: settings[key] for key in SAMPLING_KEYS},
+            stopping_criteria=self._stopping_criteria(cancel_event),
         )
         return output["choices"][0]["text"]
 
+    def stream_response(self, prompt: str, chat_history: List[Dict], context: Optional[List[Dict]] = None, cancel_event: Optional[threading.Event] = None, llm=None, settings: Optional[Dict] = None) -> Iterator[str]:
+        llm = llm or self._llm
+        if llm is None:
+            logger.error("LLM model not loaded. Call load_model() first.")
+            raise Exception("LLM model not loaded. Call load_model() first.")
+
+        settings = settings or generation_settings(self._default_model)
+        full_prompt = self._build_prompt(prompt, chat_history, context)
+        logger.debug(f"Streaming response with prompt: {full_prompt}")
+        for chunk in llm(
+            full_prompt,
+            max_tokens=settings["max_tokens"],
+            stop=settings["stop"],
+            echo=False,
+            stream=True,
+            **{key: settings[key] for key in SAMPLING_KEYS},
+            stopping_criteria=self._stopping_criteria(cancel_event),
+        ):
+            yield chunk["choices"][0]["text"]
+
+    def count_tokens(self, text: str) -> int:
+        # Exact count from the loaded model's tokenizer; ~4 characters per token otherwise
+        if self._llm is not None:
+            return len(self._llm.tokenize(text.encode("utf-8"), add_bos=False))
+        return len(text) // 4 + 1
+
+    @property
+    def is_remote(self) -> bool:
+        return bool(LOCAL_LLM_SERVER_URL)
+
+    def _model_name(self, model_name: Optional[str]) -> str:
+        name = model_name or self._default_model
+        if name is None:
+            logger.error("LLM model not loaded. Call load_model() first.")
+            raise Exception("LLM model not loaded. Call load_model() first.")
+        return name
+
+    async def generate_in_process(self, prompt: str, chat_history: List[Dict], context: Optional[List[Dict]] = None, model_name: Optional[str] = None, profile: str = "chat", max_tokens: Optional[int] = None) -> str:
+        name = self._model_name(model_name)
+        settings = generation_settings(name, profile, max_tokens)
+        # Loading may take seconds on first use, so it happens off the event loop
+        model = await asyncio.to_thread(model_registry.acquire, name)
+        try:
+            if model.batching_engine is not None:
+                return await model.batching_engine.generate(
+                    self._build_prompt(prompt, chat_history, context), settings["max_tokens"], settings["stop"],
+                    **{key: settings[key] for key in SAMPLING_KEYS},
+                )
+            return await inference_executor.run(self.generate_response, prompt, chat_history, context, llm=model.llm, settings=settings, priority=PRIORITY_INTERACTIVE, lane=model.name)
+        finally:
+            model_registry.release(model)
+
+    async def stream_in_process(self, prompt: str, chat_history: List[Dict], context: Optional[List[Dict]] = None, model_name: Optional[str] = None, profile: str = "chat", max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        name = self._model_name(model_name)
+        settings = generation_settings(name, profile, max_tokens)
+        model = await asyncio.to_thread(model_registry.acquire, name)
+        try:
+            if model.batching_engine is not None:
+                async for token in model.batching_engine.stream(
+                    self._build_prompt(prompt, chat_history, context), settings["max_tokens"], settings["stop"],
+                    **{key: settings[key] for key in SAMPLING_KEYS},
+                ):
+                    yield token
+                return
+            async for token in inference_executor.stream(self.stream_response, prompt, chat_history, context, llm=model.llm, settings=settings, priority=PRIORITY_STREAM, lane=model.name):
+                yield token
+        finally:
+            model_registry.release(model)
+
+    async def agenerate(self, prompt: str, chat_history: List[Dict], context: Optional[List[Dict]] = None, model_name: Optional[str] = None, profile: str = "chat", max_tokens: Optional[int] = None) -> str:
+        # With LOCAL_LLM_SERVER_URL set, the model lives in one inference process shared by all gateway workers
+        if not self.is_remote:
+            return await self.generate_in_process(prompt, chat_history, context, model_name, profile, max_tokens)
+        client = http_client_service.get_client("local_llm")
+        response = await client.post(
+            f"{LOCAL_LLM_SERVER_URL.rstrip('/')}/generate",
+            json={"prompt": prompt, "chat_history": chat_history, "context": context or [], "model": model_name, "profile": profile, "max_tokens": max_tokens},
+        )
+        response.raise_for_status()
+        return response.json()["response"]
+
+    async def astream(self, prompt: str, chat_history: List[Dict], context: Optional[List[Dict]] = None, model_name: Optional[str] = None, profile: str = "chat", max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        if not self.is_remote:
+            async for token in self.stream_in_process(prompt, chat_history, context, model_name, profile, max_tokens):
+                yield token
+            return
+        client = http_client_service.get_client("local_llm")
+        async with client.stream(
+            "POST",
+            f"{LOCAL_LLM_SERVER_URL.rstrip('/')}/generate/stream",
+            json={"prompt": prompt, "chat_history": chat_history, "context": context or [], "model": model_name, "profile": profile, "max_tokens": max_tokens},
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    yield json.loads(line)["token"]
+
 # Singleton instance
 local_llm_service = LocalLLMService()
\ No newline at end of file
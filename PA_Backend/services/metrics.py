@@ -0,0 +1,183 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) covering fast proxy hops through multi-minute LLM/NCC work
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0)
+
+# (labels, value) pairs produced by a collector at scrape time
+Samples = Iterable[Tuple[Dict[str, str], float]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._series.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[index] += 1
+            self._series[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = ("le", _format_value(bound))
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter whose samples are read from existing state when /metrics is scraped."""
+
+    def __init__(self, name: str, documentation: str, metric_type: str, collect: Callable[[], Samples]):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in self.collect():
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metric registry rendered in the Prometheus text exposition format."""
+    _instance = None
+    _metrics: Dict[str, object] = {}
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MetricsRegistry, cls).__new__(cls)
+        return cls._instance
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, collect: Callable[[], Samples]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, "gauge", collect))
+
+    def counter_callback(self, name: str, documentation: str, collect: Callable[[], Samples]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, "counter", collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Singleton instance
+metrics = MetricsRegistry()
+
+# Metrics shared by several modules are declared once here
+UPSTREAM_REQUEST_SECONDS = metrics.histogram(
+    "gateway_upstream_request_duration_seconds",
+    "Time from sending an upstream request to receiving its response headers.",
+    ("upstream", "status"),
+)
+UPSTREAM_ERRORS = metrics.counter(
+    "gateway_upstream_errors_total",
+    "Upstream requests that failed without a response (connect errors, timeouts).",
+    ("upstream", "error"),
+)
+DB_POOL_CHECKOUT_SECONDS = metrics.histogram(
+    "gateway_db_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the database pool.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+LLM_GENERATION_SECONDS = metrics.histogram(
+    "gateway_llm_generation_duration_seconds",
+    "End-to-end generation time per AI backend.",
+    ("backend", "outcome"),
+)
+LLM_FIRST_TOKEN_SECONDS = metrics.histogram(
+    "gateway_llm_first_token_seconds",
+    "Time from admission to the first streamed token per AI backend.",
+    ("backend",),
+)
+NCC_PHASE_SECONDS = metrics.histogram(
+    "gateway_ncc_job_phase_duration_seconds",
+    "Duration of each NCC job phase (upload, queue, run, download; worker for warm-worker requests end to end).",
+    ("job_kind", "phase"),
+)
+NCC_MONITOR_POLLS = metrics.counter(
+    "gateway_ncc_monitor_polls_total",
+    "Batched SLURM status queries issued by the job monitor.",
+    ("command",),
+)
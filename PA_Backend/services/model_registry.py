@@ -0,0 +1,234 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from config import (
+    AI_MODELS,
+    LLM_MODEL_RAM_BUDGET_BYTES,
+    LLM_MODEL_USE_MLOCK,
+    LLM_BATCHING_ENABLED,
+    LLM_BATCH_MAX_SIZE,
+    LLM_PREFIX_CACHE_BYTES,
+    LLM_SPECULATIVE_ENABLED,
+)
+from services.metrics import metrics
+from services.generation_profiles import load_settings
+
+logger = logging.getLogger(__name__)
+
+_LOAD_SECONDS = metrics.histogram(
+    "gateway_llm_model_load_seconds",
+    "Time to load a local model into the registry.",
+    ("model",),
+)
+_EVICT_SECONDS = metrics.histogram(
+    "gateway_llm_model_evict_seconds",
+    "Time to release an evicted local model.",
+    ("model",),
+)
+_EVICTIONS = metrics.counter(
+    "gateway_llm_model_evictions_total",
+    "Local models evicted to stay under the RAM budget.",
+    ("model",),
+)
+
+
+class LoadedModel:
+    def __init__(self, name: str, model_path: str, llm, size_bytes: int, batching_engine=None, draft_model=None):
+        self.name = name
+        self.model_path = model_path
+        self.llm = llm
+        self.size_bytes = size_bytes
+        self.batching_engine = batching_engine
+        self.draft_model = draft_model # TrackedDraftModel when the model decodes speculatively
+        self.in_use = 0
+        self.pinned = False
+        self.loaded_at = time.time()
+        self.last_used = time.time()
+
+
+class ModelRegistry:
+    """Process-wide registry of local llama.cpp models shared by every route and agent.
+
+    Models load on first use with the weights memory-mapped, so the OS page cache
+    backs them and a reload after eviction is mostly page-ins. The budget is checked
+    against on-disk model size; idle, unpinned models are evicted least recently used
+    first. Models that are in use are never evicted.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ModelRegistry, cls).__new__(cls)
+            cls._instance._models = OrderedDict() # name -> LoadedModel, least recently used first
+            cls._instance._paths = {name: cfg["model_path"] for name, cfg in AI_MODELS.items() if cfg.get("type") == "local"}
+            cls._instance._drafts = {name: cfg.get("draft_model") for name, cfg in AI_MODELS.items() if cfg.get("type") == "local"}
+            cls._instance._n_gpu_layers = {}
+            cls._instance._lock = threading.RLock()
+            cls._instance._load_locks = {}
+            cls._instance.load_seconds = {} # name -> seconds taken by the most recent load
+        return cls._instance
+
+    def register(self, name: str, model_path: str, n_gpu_layers: int = 0):
+        with self._lock:
+            self._paths[name] = model_path
+            self._n_gpu_layers[name] = n_gpu_layers
+
+    def name_for_path(self, model_path: str) -> str:
+        for name, path in self._paths.items():
+            if os.path.abspath(path) == os.path.abspath(model_path):
+                return name
+        return os.path.splitext(os.path.basename(model_path))[0]
+
+    def _resident_bytes(self) -> int:
+        return sum(model.size_bytes for model in self._models.values())
+
+    def _evict_for(self, needed: int):
+        for name in list(self._models):
+            if self._resident_bytes() + needed <= LLM_MODEL_RAM_BUDGET_BYTES:
+                return
+            model = self._models[name]
+            if model.in_use or model.pinned:
+                continue
+            self._evict(model)
+        if self._resident_bytes() + needed > LLM_MODEL_RAM_BUDGET_BYTES:
+            logger.warning(f"Loading {needed} bytes exceeds the model RAM budget; all resident models are busy or pinned.")
+
+    def _evict(self, model: LoadedModel):
+        start = time.perf_counter()
+        del self._models[model.name]
+        if model.batching_engine is not None:
+            model.batching_engine.shutdown()
+        if model.draft_model is not None:
+            model.draft_model.close()
+        if hasattr(model.llm, "close"):
+            model.llm.close()
+        elapsed = time.perf_counter() - start
+        _EVICT_SECONDS.observe(elapsed, model=model.name)
+        _EVICTIONS.inc(model=model.name)
+        logger.info(f"Evicted local model '{model.name}' ({model.size_bytes} bytes) in {elapsed:.2f}s.")
+
+    def _load(self, name: str) -> LoadedModel:
+        model_path = self._paths.get(name)
+        if model_path is None:
+            raise ValueError(f"Local model '{name}' is not configured.")
+        if not os.path.exists(model_path):
+            logger.error(f"Model file not found at: {model_path}")
+            raise FileNotFoundError(f"Model file not found at: {model_path}")
+        size = os.path.getsize(model_path)
+        draft_name = self._drafts.get(name) if LLM_SPECULATIVE_ENABLED else None
+        draft_path = self._paths.get(draft_name) if draft_name else None
+        if draft_path and os.path.exists(draft_path):
+            size += os.path.getsize(draft_path) # The drafter keeps its own copy of the small model
+        with self._lock:
+            self._evict_for(size)
+
+        from llama_cpp import Llama, LlamaRAMCache # Deferred: llama_cpp is heavy and only needed once a model is loaded
+        start = time.perf_counter()
+        logger.info(f"Loading local model '{name}' from: {model_path}")
+        n_gpu_layers = self._n_gpu_layers.get(name, 0)
+        settings = load_settings(name) # n_ctx, n_batch, n_threads
+        draft = None
+        if draft_name:
+            from services.speculative_decoding import load_draft_model, validate_draft_model
+            draft = load_draft_model(name, draft_name, draft_path, n_gpu_layers, settings)
+        llm = Llama(model_path=model_path, n_gpu_layers=n_gpu_layers, use_mmap=True, use_mlock=LLM_MODEL_USE_MLOCK, draft_model=draft, **settings)
+        engine = None
+        if draft is not None:
+            llm.draft_model = draft = validate_draft_model(llm, draft)
+            if draft.drafter_name != draft_name and draft_path and os.path.exists(draft_path):
+                size -= os.path.getsize(draft_path) # Fell back to prompt lookup; the draft model was released
+            logger.info(f"Local model '{name}' decodes speculatively with drafts from '{draft.drafter_name}'; continuous batching is off for it.")
+        elif LLM_BATCHING_ENABLED and LLM_BATCH_MAX_SIZE > 1:
+            try:
+                from services.batching_engine import BatchingEngine
+                engine = BatchingEngine(llm, name=name) # Keeps its own prefix KV cache
+            except Exception as e:
+                logger.warning(f"Continuous batching unavailable for '{name}' ({e}). Serving its requests one at a time.")
+        if engine is None and LLM_PREFIX_CACHE_BYTES > 0:
+            # Unbatched path: llama-cpp-python's prompt-prefix state cache
+            llm.set_cache(LlamaRAMCache(capacity_bytes=LLM_PREFIX_CACHE_BYTES))
+        elapsed = time.perf_counter() - start
+        _LOAD_SECONDS.observe(elapsed, model=name)
+        self.load_seconds[name] = elapsed
+        logger.info(f"Loaded local model '{name}' in {elapsed:.2f}s.")
+        return LoadedModel(name, model_path, llm, size, engine, draft)
+
+    def get(self, name: str) -> LoadedModel:
+        """Returns the loaded model, loading it (and evicting others) if needed. Blocking."""
+        with self._lock:
+            model = self._models.get(name)
+            if model is not None:
+                self._models.move_to_end(name)
+                model.last_used = time.time()
+                return model
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        # One loader per model; concurrent callers wait for it instead of loading twice
+        with load_lock:
+            with self._lock:
+                model = self._models.get(name)
+                if model is not None:
+                    self._models.move_to_end(name)
+                    return model
+            model = self._load(name)
+            with self._lock:
+                self._models[name] = model
+            return model
+
+    def loaded(self, name: str) -> Optional[LoadedModel]:
+        with self._lock:
+            return self._models.get(name)
+
+    def pin(self, name: str):
+        self.get(name).pinned = True
+
+    def acquire(self, name: str) -> LoadedModel:
+        """Returns the model marked in use, so it cannot be evicted mid-generation. Blocking."""
+        while True:
+            model = self.get(name)
+            with self._lock:
+                if self._models.get(name) is model: # Not evicted between get() and here
+                    model.in_use += 1
+                    return model
+
+    def release(self, model: LoadedModel):
+        with self._lock:
+            model.in_use -= 1
+            model.last_used = time.time()
+
+    @contextmanager
+    def lease(self, name: str):
+        model = self.acquire(name)
+        try:
+            yield model
+        finally:
+            self.release(model)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "budget_bytes": LLM_MODEL_RAM_BUDGET_BYTES,
+                "resident_bytes": self._resident_bytes(),
+                "models": {
+                    name: {
+                        "size_bytes": model.size_bytes,
+                        "in_use": model.in_use,
+                        "pinned": model.pinned,
+                        "batching": model.batching_engine is not None,
+                        "speculative": model.draft_model.snapshot() if model.draft_model is not None else None,
+                        "load_seconds": self.load_seconds.get(name),
+                        "idle_seconds": time.time() - model.last_used,
+                    }
+                    for name, model in self._models.items()
+                },
+                "available": sorted(self._paths),
+            }
+
+# Singleton instance
+model_registry = ModelRegistry()
+
+metrics.gauge_callback("gateway_llm_models_resident_bytes", "On-disk size of local models currently loaded.", lambda: [({}, model_registry.snapshot()["resident_bytes"])])
@@ -0,0 +1,165 @@
+import uuid
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from config import NCC_REMOTE_JOB_DIR, NCC_BATCH_WINDOW_SECONDS, NCC_BATCH_MAX_SIZE
+from services.metrics import metrics
+from services.slurm_job_monitor import SlurmJobMonitor
+
+logger = logging.getLogger(__name__)
+
+_BATCH_SIZE = metrics.histogram(
+    "gateway_ncc_batch_size",
+    "NCC jobs submitted together in one sbatch call.",
+    ("job_kind",),
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+
+class _Batch:
+    def __init__(self, job_kind: str, directives: str, window: float):
+        self.job_kind = job_kind
+        self.directives = directives
+        self.window = window
+        self.entries: List[Tuple[str, concurrent.futures.Future]] = []
+        self.full = asyncio.Event() # Waited on by the batcher's own loop
+
+
+class SlurmSubmissionBatcher:
+    """Collects NCC jobs for a short window and submits them to SLURM together.
+
+    Each caller stages its own job directory and SLURM script as before. A job
+    arriving while no other of its kind is in flight is submitted at once.
+    Otherwise scripts of the same kind arriving within NCC_BATCH_WINDOW_SECONDS
+    (up to NCC_BATCH_MAX_SIZE) are submitted as one job array whose task i runs
+    the i-th script with bash, writing output.log and error.log into that
+    script's directory. A batch of one is submitted unchanged. Each caller is
+    answered as soon as its own array task finishes.
+
+    Batches are collected and awaited on the batcher's own event loop thread, so
+    they outlive the caller that opened them (agent.py's asyncio.run cancels any
+    task left on its loop when it returns).
+    """
+
+    def __init__(self, execute: Callable[[str], Awaitable[Tuple[str, str]]], put_bytes: Callable[[bytes, str], Awaitable[None]], monitor: SlurmJobMonitor):
+        self._execute = execute
+        self._put_bytes = put_bytes
+        self._monitor = monitor
+        # Callers may run on different event loops (agent.py uses asyncio.run), hence thread primitives
+        self._lock = threading.Lock()
+        self._open: Dict[str, _Batch] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._collectors: Set[concurrent.futures.Future] = set()
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        # Called under self._lock; started on first use, like the SSH pool's executor threads
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="ncc-batcher", daemon=True).start()
+        return self._loop
+
+    async def run(self, job_kind: str, slurm_script_path: str, directives: str) -> Dict:
+        """Submits the script, possibly with others, and resolves once its job has finished.
+
+        `directives` are the #SBATCH lines for one task; jobs of one kind must share them.
+        """
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            self._in_flight[job_kind] = self._in_flight.get(job_kind, 0) + 1
+            batch = self._open.get(job_kind)
+            if batch is None:
+                # Nothing else of this kind is in flight, so nothing is likely to join: skip the window
+                window = NCC_BATCH_WINDOW_SECONDS if self._in_flight[job_kind] > 1 else 0.0
+                batch = self._open[job_kind] = _Batch(job_kind, directives, window)
+                # Runs apart from the caller's task, so one cancelled caller does not strand the others
+                collector = asyncio.run_coroutine_threadsafe(self._collect(batch), self._background_loop())
+                self._collectors.add(collector)
+                collector.add_done_callback(self._collectors.discard)
+            batch.entries.append((slurm_script_path, future))
+            if len(batch.entries) >= NCC_BATCH_MAX_SIZE:
+                del self._open[job_kind]
+                self._loop.call_soon_threadsafe(batch.full.set)
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            with self._lock:
+                self._in_flight[job_kind] -= 1
+
+    async def _collect(self, batch: _Batch):
+        if batch.window > 0:
+            try:
+                await asyncio.wait_for(batch.full.wait(), timeout=batch.window)
+            except asyncio.TimeoutError:
+                pass
+        with self._lock:
+            if self._open.get(batch.job_kind) is batch:
+                del self._open[batch.job_kind]
+            entries = list(batch.entries)
+
+        batch_dir = None
+        try:
+            if len(entries) == 1:
+                job_ids = [await self._sbatch(f"sbatch {entries[0][0]}")]
+            else:
+                batch_dir = f"{NCC_REMOTE_JOB_DIR}/batch-{uuid.uuid4()}"
+                array_id = await self._submit_array(batch, batch_dir, [path for path, _ in entries])
+                job_ids = [f"{array_id}_{task}" for task in range(len(entries))]
+            _BATCH_SIZE.observe(len(entries), job_kind=batch.job_kind)
+        except BaseException as e:
+            for _, future in entries:
+                future.set_exception(e)
+            if isinstance(e, Exception):
+                return # Delivered to every caller
+            raise
+
+        # Each caller is answered when its own task finishes, not when the slowest task of the array does
+        await asyncio.gather(*(self._resolve(job_id, batch.job_kind, future) for job_id, (_, future) in zip(job_ids, entries)))
+
+        if batch_dir is not None:
+            try:
+                await self._execute(f"rm -rf {batch_dir}")
+            except Exception as e:
+                logger.warning(f"Could not remove NCC batch directory {batch_dir}: {e}")
+
+    async def _resolve(self, job_id: str, job_kind: str, future: concurrent.futures.Future):
+        try:
+            future.set_result(await self._monitor.wait(job_id, job_kind))
+        except BaseException as e:
+            future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+
+    async def _submit_array(self, batch: _Batch, batch_dir: str, script_paths: List[str]) -> str:
+        stdout, stderr = await self._execute(f"mkdir -p {batch_dir}")
+        if stderr:
+            raise Exception(f"Error creating remote directory: {stderr}")
+        array_script = f"""#!/bin/bash
+#SBATCH --job-name=ncc-{batch.job_kind}-batch
+#SBATCH --output={batch_dir}/task-%a.log
+#SBATCH --error={batch_dir}/task-%a.log
+#SBATCH --array=0-{len(script_paths) - 1}
+{batch.directives}
+
+script=$(sed -n "$((SLURM_ARRAY_TASK_ID + 1))p" {batch_dir}/scripts.txt)
+job_dir=$(dirname "$script")
+bash "$script" > "$job_dir/output.log" 2> "$job_dir/error.log"
+"""
+        await self._put_bytes("".join(f"{path}\n" for path in script_paths).encode("utf-8"), f"{batch_dir}/scripts.txt")
+        await self._put_bytes(array_script.encode("utf-8"), f"{batch_dir}/array.slurm")
+        job_id = await self._sbatch(f"sbatch {batch_dir}/array.slurm")
+        logger.info(f"Submitted {len(script_paths)} NCC {batch.job_kind} jobs as array job {job_id}.")
+        return job_id
+
+    async def _sbatch(self, command: str) -> str:
+        stdout, stderr = await self._execute(command)
+        if stderr and "Submitted batch job" not in stderr: # sbatch often prints job ID to stderr
+            raise Exception(f"Error submitting SLURM job: {stderr}")
+        return stdout.strip().split()[-1] if stdout else stderr.strip().split()[-1]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"open_batches": {kind: len(batch.entries) for kind, batch in self._open.items()}}
@@ -0,0 +1,172 @@
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import Dict, Optional
+
+from config import (
+    NCC_REMOTE_VENV_PATH,
+    NCC_REMOTE_INFERENCE_SCRIPT_PATH,
+    NCC_REMOTE_WORKER_SCRIPT_PATH,
+    NCC_WORKER_QUEUE_DIR,
+    NCC_WORKER_IDLE_SECONDS,
+    NCC_WORKER_TIME_LIMIT,
+    NCC_WORKER_LIVENESS_SECONDS,
+    NCC_WORKER_REQUEST_TIMEOUT_SECONDS,
+)
+from services.metrics import metrics, NCC_PHASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_POLL_MIN_SECONDS = 0.25
+_POLL_MAX_SECONDS = 2.0
+
+_SUBMISSIONS = metrics.counter(
+    "gateway_ncc_worker_submissions_total",
+    "Warm NCC inference worker jobs submitted because none was running.",
+)
+
+
+class NCCInferenceWorker:
+    """Client for the long-lived NCC inference worker (ncc/inference_worker.py).
+
+    Prompts are dropped into the worker's queue directory and answered by one
+    SLURM allocation that keeps the model loaded. The worker exits on its own
+    after NCC_WORKER_IDLE_SECONDS without work; the next prompt finds it gone
+    and submits it again. Submission runs under flock on the login node, so
+    every gateway process shares the same single worker.
+
+    `transport` provides execute, put_bytes, get_bytes, rename and remove, as
+    SSHConnectionPool does.
+    """
+
+    def __init__(self, transport, queue_dir: str = NCC_WORKER_QUEUE_DIR):
+        self._transport = transport
+        self.queue_dir = queue_dir
+        self.job_id: Optional[str] = None
+        self._confirmed_at = 0.0
+        self._prepared = False
+        # Callers may run on different event loops (agent.py uses asyncio.run), hence thread primitives
+        self._lock = threading.Lock()
+        self._check: Optional[concurrent.futures.Future] = None
+        self.in_flight = 0
+
+    def _slurm_script(self) -> str:
+        return f"""#!/bin/bash
+#SBATCH --job-name=llm-inference-worker
+#SBATCH --output={self.queue_dir}/worker.log
+#SBATCH --error={self.queue_dir}/worker.err
+#SBATCH --ntasks=1
+#SBATCH --cpus-per-task=4
+#SBATCH --mem=16G
+#SBATCH --time={NCC_WORKER_TIME_LIMIT}
+
+source {NCC_REMOTE_VENV_PATH}
+python {NCC_REMOTE_WORKER_SCRIPT_PATH} {NCC_REMOTE_INFERENCE_SCRIPT_PATH} {self.queue_dir} {NCC_WORKER_IDLE_SECONDS}
+"""
+
+    async def _prepare(self):
+        stdout, stderr = await self._transport.execute(f"mkdir -p {self.queue_dir}/inbox {self.queue_dir}/working {self.queue_dir}/outbox")
+        if stderr:
+            raise Exception(f"Error creating worker queue directory: {stderr}")
+        await self._transport.put_bytes(self._slurm_script().encode("utf-8"), f"{self.queue_dir}/worker.slurm")
+        self._prepared = True
+
+    async def _start_or_find_worker(self) -> str:
+        """Returns the id of the running (or pending) worker job, submitting one if there is none."""
+        if not self._prepared:
+            await self._prepare()
+        # Check and submit under one lock, so concurrent gateway processes never start two workers
+        command = (
+            f"cd {self.queue_dir} && flock submit.lock sh -c '"
+            f"job=$(cat job 2>/dev/null); "
+            f"if [ -n \"$job\" ] && [ -n \"$(squeue -h -j \"$job\" -o %T 2>/dev/null)\" ]; then echo \"running $job\"; "
+            f"else job=$(sbatch --parsable worker.slurm | cut -d\\; -f1); [ -n \"$job\" ] && echo \"$job\" > job && echo \"submitted $job\"; fi'"
+        )
+        stdout, stderr = await self._transport.execute(command)
+        if not stdout:
+            raise Exception(f"Could not start the NCC inference worker: {stderr}")
+        status, job_id = stdout.split()[-2:]
+        if status == "submitted":
+            _SUBMISSIONS.inc()
+            logger.info(f"Submitted NCC inference worker job {job_id}.")
+        return job_id
+
+    async def _ensure_worker(self) -> str:
+        with self._lock:
+            if self.job_id is not None and time.monotonic() - self._confirmed_at < NCC_WORKER_LIVENESS_SECONDS:
+                return self.job_id
+            check = self._check
+            owner = check is None
+            if owner:
+                check = self._check = concurrent.futures.Future()
+        if not owner:
+            return await asyncio.wrap_future(check)
+        try:
+            job_id = await self._start_or_find_worker()
+            with self._lock:
+                self.job_id = job_id
+                self._confirmed_at = time.monotonic()
+            check.set_result(job_id)
+            return job_id
+        except BaseException as e:
+            check.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._check = None
+
+    async def infer(self, input_text: str) -> str:
+        """Queues one serialized inference input and waits for the worker's answer."""
+        request_id = uuid.uuid4().hex
+        request_path = f"{self.queue_dir}/inbox/{request_id}"
+        answer_path = f"{self.queue_dir}/outbox/{request_id}.txt"
+        started_at = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            await self._ensure_worker()
+            # The worker only picks up complete requests: write under a temporary name, then rename
+            await self._transport.put_bytes(input_text.encode("utf-8"), f"{request_path}.tmp")
+            await self._transport.rename(f"{request_path}.tmp", f"{request_path}.txt")
+
+            interval = _POLL_MIN_SECONDS
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    answer = await self._transport.get_bytes(answer_path)
+                    break
+                except FileNotFoundError:
+                    pass
+                if time.perf_counter() - started_at > NCC_WORKER_REQUEST_TIMEOUT_SECONDS:
+                    try:
+                        await self._transport.remove(f"{request_path}.txt") # Withdraw it unless already claimed
+                    except FileNotFoundError:
+                        pass
+                    raise TimeoutError(f"No answer from the NCC inference worker after {NCC_WORKER_REQUEST_TIMEOUT_SECONDS:.0f}s.")
+                interval = min(interval * 1.5, _POLL_MAX_SECONDS)
+                # Resubmits the worker if it has exited meanwhile; the request waits in the queue for it
+                await self._ensure_worker()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        await self._transport.remove(answer_path)
+        with self._lock:
+            self._confirmed_at = time.monotonic() # An answer proves the worker is alive
+        NCC_PHASE_SECONDS.observe(time.perf_counter() - started_at, job_kind="inference", phase="worker")
+
+        status, _, body = answer.decode("utf-8").partition("\n")
+        if status != "ok":
+            raise Exception(f"NCC inference worker failed: {body}")
+        return body
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "seen_alive_seconds_ago": time.monotonic() - self._confirmed_at if self.job_id else None,
+                "in_flight": self.in_flight,
+            }
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+from services.metrics import metrics
+
+_PREFIX_LOOKUPS = metrics.counter(
+    "gateway_llm_prefix_cache_lookups_total",
+    "Prefix cache lookups by the local batching engine.",
+    ("result",),
+)
+_PREFIX_TOKENS_REUSED = metrics.counter(
+    "gateway_llm_prefix_cache_tokens_reused_total",
+    "Prompt tokens restored from cached KV state instead of being re-evaluated.",
+)
+
+
+def common_prefix_length(a: Sequence[int], b: Sequence[int]) -> int:
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+class PrefixStateCache:
+    """LRU cache of per-sequence llama.cpp KV state keyed on the tokens it covers.
+
+    A new prompt restores the entry sharing its longest token prefix and only the
+    remaining tokens are evaluated. In a chat, the next turn's prompt starts with
+    the previous turn's prompt and reply, so usually only the new message is left.
+    Turns that fold older history into the chat summary change the prefix and only
+    reuse what comes before the history; chat_history_service folds in blocks so
+    this happens once per several turns.
+    """
+
+    def __init__(self, capacity_bytes: int, min_tokens: int):
+        self.capacity_bytes = capacity_bytes
+        self.min_tokens = min_tokens
+        self._entries: "OrderedDict[Tuple[int, ...], object]" = OrderedDict() # tokens -> ctypes state buffer
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, tokens: Sequence[int]) -> Tuple[Optional[object], int]:
+        """Returns (state buffer, usable prefix length) for the best entry, or (None, 0)."""
+        with self._lock:
+            best_key, best_length = None, 0
+            for key in self._entries:
+                length = common_prefix_length(key, tokens)
+                if length > best_length:
+                    best_key, best_length = key, length
+            if best_key is None or best_length < self.min_tokens:
+                self.misses += 1
+                _PREFIX_LOOKUPS.inc(result="miss")
+                return None, 0
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            _PREFIX_LOOKUPS.inc(result="hit")
+            _PREFIX_TOKENS_REUSED.inc(best_length)
+            return self._entries[best_key], best_length
+
+    def put(self, tokens: Sequence[int], state) -> bool:
+        size = len(state)
+        if size > self.capacity_bytes or len(tokens) < self.min_tokens:
+            return False
+        key = tuple(tokens)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= len(previous)
+            # An entry that is a strict prefix of the new one can never beat it on a lookup
+            for existing in [k for k in self._entries if len(k) < len(key) and key[:len(k)] == k]:
+                self.size_bytes -= len(self._entries.pop(existing))
+            self._entries[key] = state
+            self.size_bytes += size
+            while self.size_bytes > self.capacity_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= len(evicted)
+                self.evictions += 1
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "capacity_bytes": self.capacity_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,64 @@
+import asyncio
+import hashlib
+import logging
+from typing import Optional, Dict, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCoalescer:
+    """Single-flight layer for idempotent upstream GETs.
+
+    Concurrent calls with the same URL, query params and headers (the Authorization
+    header scopes the key to one user) share one in-flight upstream request. The
+    upstream call runs in its own task, so one caller disconnecting does not cancel
+    it for the others.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RequestCoalescer, cls).__new__(cls)
+            cls._instance._in_flight = {} # key -> asyncio.Task
+            cls._instance.leaders_total = 0
+            cls._instance.coalesced_total = 0
+        return cls._instance
+
+    @staticmethod
+    def _key(url: str, headers: Optional[Dict], params: Optional[Dict]) -> Tuple[str, str]:
+        digest = hashlib.sha256()
+        for name, value in sorted((k.lower(), str(v)) for k, v in (headers or {}).items()):
+            digest.update(f"{name}:{value}\n".encode())
+        for name, value in sorted((str(k), str(v)) for k, v in (params or {}).items()):
+            digest.update(f"?{name}={value}\n".encode())
+        return url, digest.hexdigest()
+
+    async def get(self, client: httpx.AsyncClient, url: str, headers: Optional[Dict] = None, params: Optional[Dict] = None) -> httpx.Response:
+        key = self._key(url, headers, params)
+        task = self._in_flight.get(key)
+        if task is None:
+            self.leaders_total += 1
+            task = asyncio.ensure_future(client.get(url, headers=headers, params=params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced_total += 1
+            logger.debug(f"Coalesced GET {url} onto an in-flight request.")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Tuple[str, str], task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            task.exception() # Mark as retrieved even if every caller has gone away
+
+    def snapshot(self) -> Dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "leaders_total": self.leaders_total,
+            "coalesced_total": self.coalesced_total,
+        }
+
+# Singleton instance
+request_coalescer = RequestCoalescer()
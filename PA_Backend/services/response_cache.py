@@ -0,0 +1,174 @@
+import re
+import time
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_SCOPE,
+    RESPONSE_CACHE_SEMANTIC_ENABLED,
+    RESPONSE_CACHE_EMBEDDING_MODEL,
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+    RESPONSE_CACHE_MAX_SEMANTIC_ENTRIES,
+)
+from services.shared_state import shared_state
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_LOOKUPS = metrics.counter(
+    "gateway_response_cache_lookups_total",
+    "Chat response cache lookups by tier and result.",
+    ("backend", "tier", "result"),
+)
+_SIMILARITY = metrics.histogram(
+    "gateway_response_cache_best_similarity",
+    "Best embedding similarity found by semantic cache lookups.",
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.96, 0.98, 0.99, 1.0),
+)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!]+$")
+
+
+def normalize_prompt(prompt: str) -> str:
+    # Case, spacing and trailing punctuation rarely change what is being asked
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", prompt.strip().lower()))
+
+
+class ResponseCache:
+    """Opt-in cache of chat answers keyed on the normalised prompt and its context.
+
+    The exact tier lives in shared state so every gateway worker sees it. The
+    semantic tier keeps prompt embeddings per worker and, above the similarity
+    threshold, resolves to the exact-tier entry of the closest earlier prompt.
+    Chat history is not part of the key: a cached answer is reused regardless of
+    the turns before it, which is the trade-off this cache makes for speed.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ResponseCache, cls).__new__(cls)
+            cls._instance.enabled = RESPONSE_CACHE_ENABLED
+            # exact key -> (unit-length embedding, context hash, expires_at), least recently used first
+            cls._instance._vectors = OrderedDict()
+            cls._instance._lock = threading.Lock()
+            cls._instance._encoder = None # Set by load_encoder(); the semantic tier is skipped until then
+            cls._instance.hits = {"exact": 0, "semantic": 0}
+            cls._instance.misses = 0
+        return cls._instance
+
+    @staticmethod
+    def _scope(user_id: int, context: List[Dict]) -> str:
+        # Context carries the user's own app data, so such answers are never shared
+        if RESPONSE_CACHE_SCOPE == "global" and not context:
+            return "global"
+        return f"user:{user_id}"
+
+    @staticmethod
+    def _context_hash(context: List[Dict]) -> str:
+        return hashlib.sha256(json.dumps(context, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _key(scope: str, backend: str, prompt: str, context_hash: str) -> str:
+        digest = hashlib.sha256(f"{normalize_prompt(prompt)}\0{context_hash}".encode("utf-8")).hexdigest()
+        return f"respcache:{scope}:{backend}:{digest}"
+
+    async def load_encoder(self):
+        """Loads the embedding model off the event loop; called once at startup, never from a request."""
+        if not self.enabled or not RESPONSE_CACHE_SEMANTIC_ENABLED or self._encoder is not None:
+            return
+        def _load():
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(RESPONSE_CACHE_EMBEDDING_MODEL)
+        try:
+            self._encoder = await asyncio.to_thread(_load)
+            logger.info(f"Response cache semantic tier using '{RESPONSE_CACHE_EMBEDDING_MODEL}'.")
+        except Exception as e:
+            logger.error(f"Response cache semantic tier disabled ({e}). Only exact matches will be served.")
+
+    def _embed(self, prompt: str):
+        return self._encoder.encode(normalize_prompt(prompt), normalize_embeddings=True)
+
+    def _nearest(self, scope: str, backend: str, context_hash: str, vector) -> Tuple[Optional[str], float]:
+        import numpy as np
+        now = time.time()
+        prefix = f"respcache:{scope}:{backend}:"
+        with self._lock:
+            for key in [k for k, (_, _, expires_at) in self._vectors.items() if expires_at <= now]:
+                del self._vectors[key]
+            # Similar prompts only match when asked over the same context
+            candidates = [(key, entry[0]) for key, entry in self._vectors.items() if key.startswith(prefix) and entry[1] == context_hash]
+        if not candidates:
+            return None, 0.0
+        scores = np.stack([v for _, v in candidates]) @ vector
+        best = int(np.argmax(scores))
+        return candidates[best][0], float(scores[best])
+
+    async def lookup(self, user_id: int, backend: str, prompt: str, context: List[Dict]) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        scope = self._scope(user_id, context)
+        context_hash = self._context_hash(context)
+        key = self._key(scope, backend, prompt, context_hash)
+        entry = await shared_state.get(key)
+        if entry is not None:
+            self.hits["exact"] += 1
+            _LOOKUPS.inc(backend=backend, tier="exact", result="hit")
+            return entry
+
+        if self._encoder is not None:
+            vector = await asyncio.to_thread(self._embed, prompt)
+            nearest_key, similarity = self._nearest(scope, backend, context_hash, vector)
+            if nearest_key is not None:
+                _SIMILARITY.observe(similarity)
+            if nearest_key is not None and similarity >= RESPONSE_CACHE_SIMILARITY_THRESHOLD:
+                entry = await shared_state.get(nearest_key)
+                if entry is not None:
+                    with self._lock:
+                        if nearest_key in self._vectors:
+                            self._vectors.move_to_end(nearest_key)
+                    self.hits["semantic"] += 1
+                    _LOOKUPS.inc(backend=backend, tier="semantic", result="hit")
+                    return entry
+
+        self.misses += 1
+        _LOOKUPS.inc(backend=backend, tier="any", result="miss")
+        return None
+
+    async def store(self, user_id: int, backend: str, prompt: str, context: List[Dict], entry: Dict):
+        if not self.enabled or not entry.get("final_answer"):
+            return
+        scope = self._scope(user_id, context)
+        context_hash = self._context_hash(context)
+        key = self._key(scope, backend, prompt, context_hash)
+        await shared_state.set(key, entry, ttl=RESPONSE_CACHE_TTL_SECONDS)
+        if self._encoder is None:
+            return
+        vector = await asyncio.to_thread(self._embed, prompt)
+        with self._lock:
+            self._vectors[key] = (vector, context_hash, time.time() + RESPONSE_CACHE_TTL_SECONDS)
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > RESPONSE_CACHE_MAX_SEMANTIC_ENTRIES:
+                self._vectors.popitem(last=False)
+
+    def snapshot(self) -> Dict:
+        lookups = self.hits["exact"] + self.hits["semantic"] + self.misses
+        return {
+            "enabled": self.enabled,
+            "semantic_tier": self._encoder is not None,
+            "semantic_entries": len(self._vectors),
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "hit_rate": (self.hits["exact"] + self.hits["semantic"]) / lookups if lookups else None,
+        }
+
+# Singleton instance
+response_cache = ResponseCache()
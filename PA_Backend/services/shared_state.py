@@ -0,0 +1,118 @@
+import time
+import json
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple, Any, Dict
+
+from config import SHARED_STATE_URL
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryStateBackend:
+    """Process-local backend. Correct only when the gateway runs a single worker."""
+
+    def __init__(self, max_buckets: int = 10000):
+        self._values: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict() # LRU-bounded
+        self._max_buckets = max_buckets
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._values[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._values[key] = (value, time.time() + ttl if ttl else None)
+
+    async def delete(self, key: str):
+        self._values.pop(key, None)
+
+    async def take_token(self, key: str, rate_per_second: float, capacity: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (float(capacity), now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate_per_second)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self._max_buckets:
+            self._buckets.popitem(last=False)
+        if allowed:
+            return True, 0.0
+        return False, (1 - tokens) / rate_per_second if rate_per_second > 0 else 60.0
+
+    async def close(self):
+        pass
+
+
+# Token bucket evaluated atomically on the server, so every worker sees the same bucket.
+_TAKE_TOKEN_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+-- A bucket that never refills (rate 0) would divide by zero; expire it like the 60s retry hint instead
+local ttl = 60
+if rate > 0 then
+    ttl = math.ceil(capacity / rate) + 1
+end
+redis.call('EXPIRE', KEYS[1], ttl)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisStateBackend:
+    """Backend for any Redis-compatible server (Redis, Valkey, KeyDB, Dragonfly)."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            raise ImportError("SHARED_STATE_URL points at a Redis server but the 'redis' package is not installed.")
+        self._client = redis_asyncio.from_url(url)
+        self._take_token = self._client.register_script(_TAKE_TOKEN_SCRIPT)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        await self._client.set(key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    async def delete(self, key: str):
+        await self._client.delete(key)
+
+    async def take_token(self, key: str, rate_per_second: float, capacity: int) -> Tuple[bool, float]:
+        allowed, tokens = await self._take_token(keys=[key], args=[rate_per_second, capacity, time.time()])
+        if int(allowed):
+            return True, 0.0
+        return False, (1 - float(tokens)) / rate_per_second if rate_per_second > 0 else 60.0
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_state_backend(url: str = SHARED_STATE_URL):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        logger.info("Using Redis-compatible shared state backend.")
+        return RedisStateBackend(url)
+    if url != "memory://":
+        logger.warning(f"Unknown SHARED_STATE_URL scheme '{url}'. Falling back to in-memory state.")
+    return InMemoryStateBackend()
+
+# Singleton instance
+shared_state = create_state_backend()
@@ -0,0 +1,189 @@
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import NCC_MONITOR_MIN_INTERVAL_SECONDS, NCC_MONITOR_MAX_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# States in which a job still holds (or waits for) an allocation
+_ACTIVE_STATES = {"PENDING", "CONFIGURING", "RUNNING", "COMPLETING", "SUSPENDED", "REQUEUED", "RESIZING", "SIGNALING", "STAGE_OUT"}
+# Final states of a job that did not run to completion
+FAILED_STATES = {"FAILED", "CANCELLED", "TIMEOUT", "OUT_OF_MEMORY", "NODE_FAIL", "BOOT_FAIL", "DEADLINE", "PREEMPTED"}
+
+
+class _TrackedJob:
+    def __init__(self, job_id: str, job_kind: str, future: asyncio.Future):
+        self.job_id = job_id
+        self.job_kind = job_kind
+        self.future = future
+        self.state = "PENDING"
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+
+    def resolve(self, result: Dict):
+        # The waiter may be on another event loop (e.g. an agent running asyncio.run in a thread)
+        def _set():
+            if not self.future.done():
+                self.future.set_result(result)
+        try:
+            self.future.get_loop().call_soon_threadsafe(_set)
+        except RuntimeError:
+            pass # The waiter's loop has closed; nobody is left to notify
+
+
+def _parse_slurm_time(value: str) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None # "Unknown", "None" or empty
+
+
+def _base_ids(jobs: List[_TrackedJob]) -> str:
+    # Array tasks ("<array id>_<task>") are queried through their array's id
+    return ",".join(dict.fromkeys(job.job_id.split("_")[0] for job in jobs))
+
+
+class SlurmJobMonitor:
+    """Tracks every in-flight SLURM job with one batched squeue call per tick.
+
+    Callers await wait(job_id). The poll interval starts short after a submission
+    or state change and backs off while nothing changes. Finished jobs get their
+    final state and submit/start/end times from one sacct call, which splits
+    queue wait from run time more precisely than the poll interval could. Tasks
+    of a job array are waited on individually as "<array id>_<task>".
+
+    The AI chatbot service imports this module as well, so it depends on nothing
+    but `config`: `on_poll(command)` and `on_finished(job_kind, result)` are where
+    callers hook in metrics or logging.
+    """
+
+    def __init__(
+        self,
+        execute: Callable[[str], Awaitable[Tuple[str, str]]],
+        on_poll: Optional[Callable[[str], None]] = None,
+        on_finished: Optional[Callable[[str, Dict], None]] = None,
+    ):
+        self._execute = execute
+        self._on_poll = on_poll
+        self._on_finished = on_finished
+        self._jobs: Dict[str, _TrackedJob] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._interval = NCC_MONITOR_MIN_INTERVAL_SECONDS
+
+    async def wait(self, job_id: str, job_kind: str = "job") -> Dict:
+        """Resolves once the job has left the queue: {"job_id", "state", "queue_seconds", "run_seconds"}.
+
+        "state" is sacct's final state, or "UNKNOWN" when accounting has no record of the job.
+        """
+        job = _TrackedJob(job_id, job_kind, asyncio.get_running_loop().create_future())
+        with self._lock:
+            self._jobs[job_id] = job
+            self._interval = NCC_MONITOR_MIN_INTERVAL_SECONDS
+            if self._task is not None and not self._task.done() and self._wake is not None:
+                self._task.get_loop().call_soon_threadsafe(self._wake.set)
+        # The poller dies with its event loop (e.g. an agent's asyncio.run), so waiters restart it if needed
+        while not job.future.done():
+            self._ensure_poller()
+            await asyncio.wait({job.future}, timeout=NCC_MONITOR_MAX_INTERVAL_SECONDS * 2)
+        return job.future.result()
+
+    def _ensure_poller(self):
+        with self._lock:
+            if self._task is None or self._task.done():
+                self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        self._wake = asyncio.Event()
+        while True:
+            with self._lock:
+                jobs = list(self._jobs.values())
+                if not jobs:
+                    self._task = None # Under the lock, so wait() starts a new poller for the next job
+                    return
+            self._wake.clear()
+            try:
+                changed = await self._poll(jobs)
+            except Exception as e:
+                logger.warning(f"SLURM job monitor poll failed: {e}")
+                changed = False
+            with self._lock:
+                self._interval = NCC_MONITOR_MIN_INTERVAL_SECONDS if changed else min(self._interval * 1.5, NCC_MONITOR_MAX_INTERVAL_SECONDS)
+                interval = self._interval
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, jobs: List[_TrackedJob]) -> bool:
+        if self._on_poll:
+            self._on_poll("squeue")
+        # -r lists array tasks one per line as "<array id>_<task>", so each task is tracked on its own
+        stdout, stderr = await self._execute(f"squeue -h -r -j {_base_ids(jobs)} -o '%i %T'")
+        if stderr and not stdout and "Invalid job id" not in stderr:
+            raise Exception(stderr)
+        states = dict(line.split(None, 1) for line in stdout.splitlines() if line.strip())
+
+        changed = False
+        finished = []
+        now = time.time()
+        for job in jobs:
+            state = states.get(job.job_id, "").strip()
+            if state in _ACTIVE_STATES:
+                if state != job.state:
+                    changed = True
+                    job.state = state
+                    if job.started_at is None and state != "PENDING":
+                        job.started_at = now
+            else:
+                finished.append(job)
+        if finished:
+            changed = True
+            await self._finish(finished, now)
+        return changed
+
+    async def _finish(self, jobs: List[_TrackedJob], now: float):
+        accounting = {}
+        try:
+            if self._on_poll:
+                self._on_poll("sacct")
+            stdout, _ = await self._execute(f"sacct -n -X -P -j {_base_ids(jobs)} -o JobID,State,Submit,Start,End")
+            for line in stdout.splitlines():
+                fields = line.split("|")
+                if len(fields) == 5:
+                    accounting[fields[0]] = fields[1:]
+        except Exception as e:
+            logger.warning(f"sacct unavailable, using observed job timings: {e}")
+
+        for job in jobs:
+            state, submitted, started, ended = "UNKNOWN", job.submitted_at, job.started_at, now
+            if job.job_id in accounting:
+                sacct_state, submit_time, start_time, end_time = accounting[job.job_id]
+                state = sacct_state.split()[0] # e.g. "CANCELLED by 1234"
+                if state in _ACTIVE_STATES:
+                    # Accounting lags squeue: the job is still finishing, so it is looked at again next tick
+                    job.state = state
+                    continue
+                submitted = _parse_slurm_time(submit_time) or submitted
+                started = _parse_slurm_time(start_time) or started
+                ended = _parse_slurm_time(end_time) or ended
+            started = started or ended # Finished between two polls
+            queue_seconds, run_seconds = max(0.0, started - submitted), max(0.0, ended - started)
+            result = {"job_id": job.job_id, "state": state, "queue_seconds": queue_seconds, "run_seconds": run_seconds}
+            if self._on_finished:
+                self._on_finished(job.job_kind, result)
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+            job.resolve(result)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "tracked_jobs": {job.job_id: job.state for job in self._jobs.values()},
+                "interval_seconds": self._interval,
+            }
@@ -0,0 +1,146 @@
+import logging
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+from config import LLM_SPECULATIVE_DRAFT_TOKENS
+from services.metrics import metrics
+from services.prefix_cache import common_prefix_length
+
+logger = logging.getLogger(__name__)
+
+PROMPT_LOOKUP = "prompt_lookup"
+
+_DRAFTED_TOKENS = metrics.counter(
+    "gateway_llm_speculative_drafted_tokens_total",
+    "Tokens proposed by the draft for speculative decoding.",
+    ("model", "drafter"),
+)
+_ACCEPTED_TOKENS = metrics.counter(
+    "gateway_llm_speculative_accepted_tokens_total",
+    "Drafted tokens the target model accepted.",
+    ("model", "drafter"),
+)
+
+# Text tokenized by both models to check their vocabularies agree id for id
+_VOCAB_PROBE = "def fibonacci(n):\n    return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)  # Hello, world! 12345"
+
+
+class LlamaModelDraft:
+    """Greedy drafts from a small llama.cpp model that shares the target's vocabulary.
+
+    The draft keeps its own KV cache and only evaluates the tokens that changed
+    since the previous call, which is usually the one token the target sampled.
+    """
+
+    def __init__(self, llm: Llama, num_pred_tokens: int):
+        self.llm = llm
+        self.num_pred_tokens = num_pred_tokens
+        self._n_vocab = llm.n_vocab()
+        self._eos = llm.token_eos()
+
+    def _next_token(self) -> int:
+        logits = np.ctypeslib.as_array(self.llm._ctx.get_logits_ith(-1), shape=(self._n_vocab,))
+        return int(np.argmax(logits))
+
+    def __call__(self, input_ids: np.ndarray) -> np.ndarray:
+        if len(input_ids) + self.num_pred_tokens > self.llm.n_ctx():
+            return np.array([], dtype=np.intc)
+        llm = self.llm
+        # Keep the cached prefix; at least one token is re-evaluated so fresh logits exist
+        keep = min(common_prefix_length(llm._input_ids, input_ids), len(input_ids) - 1)
+        if keep < llm.n_tokens:
+            llm._ctx.kv_cache_seq_rm(-1, keep, -1)
+            llm.n_tokens = keep
+        llm.eval(input_ids[keep:].tolist())
+        drafted = []
+        for i in range(self.num_pred_tokens):
+            token = self._next_token()
+            if token == self._eos:
+                break
+            drafted.append(token)
+            if i < self.num_pred_tokens - 1:
+                llm.eval([token])
+        return np.array(drafted, dtype=np.intc)
+
+    def close(self):
+        self.llm.close()
+
+
+class TrackedDraftModel(LlamaDraftModel):
+    """Wraps a drafter and counts how many of its proposals the target accepts.
+
+    llama-cpp-python calls the draft with the accepted tokens plus the one the
+    target sampled, so the previous proposal's acceptance is read off the next input.
+    """
+
+    def __init__(self, model_name: str, drafter_name: str, drafter):
+        self.model_name = model_name
+        self.drafter_name = drafter_name
+        self.drafter = drafter
+        self.drafted = 0
+        self.accepted = 0
+        self._pending: Optional[np.ndarray] = None
+        self._pending_input: Optional[np.ndarray] = None # Copy: llama-cpp-python passes a view of a reused buffer
+        self._lock = threading.Lock()
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs) -> np.ndarray:
+        with self._lock:
+            previous = self._pending_input
+            # Only a continuation of the previous call can say how much of that proposal was accepted
+            if previous is not None and len(input_ids) > len(previous) and np.array_equal(input_ids[:len(previous)], previous):
+                accepted = common_prefix_length(self._pending, input_ids[len(previous):])
+                self.accepted += accepted
+                _ACCEPTED_TOKENS.inc(accepted, model=self.model_name, drafter=self.drafter_name)
+            proposal = self.drafter(input_ids)
+            self._pending, self._pending_input = (proposal, input_ids.copy()) if len(proposal) else (None, None)
+            self.drafted += len(proposal)
+            _DRAFTED_TOKENS.inc(len(proposal), model=self.model_name, drafter=self.drafter_name)
+            return proposal
+
+    def close(self):
+        if hasattr(self.drafter, "close"):
+            self.drafter.close()
+
+    def snapshot(self) -> Dict:
+        return {
+            "drafter": self.drafter_name,
+            "drafted_tokens": self.drafted,
+            "accepted_tokens": self.accepted,
+            "acceptance_rate": self.accepted / self.drafted if self.drafted else None,
+        }
+
+
+def _vocab_matches(target: Llama, draft: Llama) -> bool:
+    if target.n_vocab() != draft.n_vocab():
+        return False
+    if (target.token_bos(), target.token_eos()) != (draft.token_bos(), draft.token_eos()):
+        return False
+    probe = _VOCAB_PROBE.encode("utf-8")
+    return target.tokenize(probe, add_bos=False) == draft.tokenize(probe, add_bos=False)
+
+
+def load_draft_model(model_name: str, draft_name: str, draft_path: Optional[str], n_gpu_layers: int = 0, settings: Optional[Dict] = None) -> TrackedDraftModel:
+    """Builds the drafter for a target model, loaded with the target's llama.cpp settings so contexts line up."""
+    if draft_name != PROMPT_LOOKUP and draft_path:
+        try:
+            draft_llm = Llama(model_path=draft_path, n_gpu_layers=n_gpu_layers, use_mmap=True, verbose=False, **(settings or {}))
+            return TrackedDraftModel(model_name, draft_name, LlamaModelDraft(draft_llm, LLM_SPECULATIVE_DRAFT_TOKENS))
+        except Exception as e:
+            logger.warning(f"Draft model '{draft_name}' for '{model_name}' failed to load ({e}). Using prompt lookup decoding.")
+    return TrackedDraftModel(model_name, PROMPT_LOOKUP, LlamaPromptLookupDecoding(num_pred_tokens=LLM_SPECULATIVE_DRAFT_TOKENS))
+
+
+def validate_draft_model(target: Llama, draft: TrackedDraftModel) -> TrackedDraftModel:
+    """Replaces a model drafter whose vocabulary differs from the target's with prompt lookup decoding."""
+    if not isinstance(draft.drafter, LlamaModelDraft) or _vocab_matches(target, draft.drafter.llm):
+        return draft
+    logger.warning(
+        f"Draft model '{draft.drafter_name}' does not share the vocabulary of '{draft.model_name}'. "
+        f"Using prompt lookup decoding instead."
+    )
+    draft.close()
+    return TrackedDraftModel(draft.model_name, PROMPT_LOOKUP, LlamaPromptLookupDecoding(num_pred_tokens=LLM_SPECULATIVE_DRAFT_TOKENS))
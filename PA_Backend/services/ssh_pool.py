@@ -0,0 +1,201 @@
+import io
+import queue
+import socket
+import asyncio
+import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, TypeVar
+
+import paramiko
+
+from config import (
+    NCC_USER,
+    NCC_HOST,
+    NCC_PRIVATE_KEY_PATH,
+    NCC_SSH_POOL_SIZE,
+    NCC_SSH_KEEPALIVE_SECONDS,
+    NCC_SSH_CONNECT_TIMEOUT_SECONDS,
+)
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Failures that mean the connection itself is gone, as opposed to the remote command failing
+_CONNECTION_ERRORS = (paramiko.SSHException, EOFError, socket.error)
+
+_RECONNECTS = metrics.counter(
+    "gateway_ncc_ssh_reconnects_total",
+    "NCC SSH connections re-established after being found dead.",
+)
+
+
+class _Connection:
+    """One SSH connection and its reused SFTP session. Used by one thread at a time."""
+
+    def __init__(self):
+        self.client: Optional[paramiko.SSHClient] = None
+        self._sftp: Optional[paramiko.SFTPClient] = None
+
+    @property
+    def alive(self) -> bool:
+        transport = self.client.get_transport() if self.client is not None else None
+        return transport is not None and transport.is_active()
+
+    def connect(self):
+        self.close()
+        client = paramiko.SSHClient()
+        client.load_system_host_keys()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            client.connect(
+                hostname=NCC_HOST,
+                username=NCC_USER,
+                key_filename=NCC_PRIVATE_KEY_PATH,
+                timeout=NCC_SSH_CONNECT_TIMEOUT_SECONDS,
+            )
+        except paramiko.AuthenticationException:
+            raise Exception("Authentication failed, please verify your credentials and key path.")
+        except (paramiko.SSHException, socket.error) as e:
+            raise Exception(f"Could not establish SSH connection: {e}")
+        # Keepalives stop idle pooled connections being dropped by NAT or the login node
+        client.get_transport().set_keepalive(NCC_SSH_KEEPALIVE_SECONDS)
+        self.client = client
+
+    @property
+    def sftp(self) -> paramiko.SFTPClient:
+        if self._sftp is None:
+            self._sftp = self.client.open_sftp()
+        return self._sftp
+
+    def close(self):
+        for resource in (self._sftp, self.client):
+            if resource is not None:
+                try:
+                    resource.close()
+                except Exception:
+                    pass
+        self._sftp = None
+        self.client = None
+
+
+class SSHConnectionPool:
+    """Small pool of persistent SSH connections to the NCC login node.
+
+    Connections open lazily on first use and are checked out exclusively, so each
+    SFTP session is reused without being shared between threads. All paramiko I/O
+    runs on the pool's own threads, one per connection. A connection found dead
+    is reconnected before use; one that drops mid-operation is retried once only
+    for repeatable transfers.
+    """
+
+    def __init__(self, size: int = NCC_SSH_POOL_SIZE):
+        self.size = size
+        self._idle: "queue.LifoQueue[_Connection]" = queue.LifoQueue() # Most recently used first: likeliest to be alive
+        for _ in range(size):
+            self._idle.put(_Connection())
+        self._lock = threading.Lock()
+        self.in_use = 0
+        # One thread per connection: queued operations wait here, never in (and never starving) the default executor
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="ncc-ssh")
+
+    def _with_connection(self, operation: Callable[[_Connection], T], retry: bool = False) -> T:
+        # Only operations that are safe to repeat (reads, whole-file writes) are retried after a drop:
+        # a command such as sbatch may have run remotely before the link died
+        connection = self._idle.get()
+        with self._lock:
+            self.in_use += 1
+        try:
+            if not connection.alive:
+                if connection.client is not None:
+                    _RECONNECTS.inc()
+                    logger.warning("NCC SSH connection was dropped. Reconnecting.")
+                connection.connect()
+            try:
+                return operation(connection)
+            except _CONNECTION_ERRORS as e:
+                if connection.alive or not retry:
+                    raise
+                logger.warning(f"NCC SSH connection lost mid-operation ({e}). Reconnecting and retrying once.")
+                _RECONNECTS.inc()
+                connection.connect()
+                return operation(connection)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._idle.put(connection)
+
+    async def run(self, operation: Callable[[_Connection], T], retry: bool = False) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(self._with_connection, operation, retry))
+
+    # --- Remote I/O ---
+    def _execute_with_status(self, command: str, stdin: Optional[bytes] = None) -> Tuple[int, str, str]:
+        def _execute(connection: _Connection) -> Tuple[int, str, str]:
+            channel_stdin, stdout, stderr = connection.client.exec_command(command)
+            if stdin is not None:
+                channel_stdin.write(stdin)
+                channel_stdin.channel.shutdown_write()
+            out, err = stdout.read().decode().strip(), stderr.read().decode().strip()
+            return stdout.channel.recv_exit_status(), out, err
+        return self._with_connection(_execute)
+
+    def _execute(self, command: str, stdin: Optional[bytes] = None) -> Tuple[str, str]:
+        _, stdout, stderr = self._execute_with_status(command, stdin)
+        return stdout, stderr
+
+    async def execute(self, command: str, stdin: Optional[bytes] = None) -> Tuple[str, str]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._execute, command, stdin)
+
+    async def execute_with_status(self, command: str, stdin: Optional[bytes] = None) -> Tuple[int, str, str]:
+        """Like execute, with the command's exit status first: for commands whose stderr may carry harmless warnings."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._execute_with_status, command, stdin)
+
+    def execute_in_background(self, command: str):
+        """Runs a command without waiting for it, e.g. cleanup that need not delay a response."""
+        def _log_failure(future):
+            if not future.cancelled() and future.exception() is not None:
+                logger.warning(f"Background NCC command failed ({command}): {future.exception()}")
+        # Runs on the pool's own threads, so it completes even if the caller's event loop (e.g. asyncio.run) ends first
+        self._executor.submit(self._execute, command).add_done_callback(_log_failure)
+
+    async def put_file(self, local_path: str, remote_path: str):
+        await self.run(lambda connection: connection.sftp.put(local_path, remote_path), retry=True)
+
+    async def get_file(self, remote_path: str, local_path: str):
+        await self.run(lambda connection: connection.sftp.get(remote_path, local_path), retry=True)
+
+    async def put_bytes(self, data: bytes, remote_path: str):
+        await self.run(lambda connection: connection.sftp.putfo(io.BytesIO(data), remote_path), retry=True)
+
+    async def get_bytes(self, remote_path: str) -> bytes:
+        # Raises FileNotFoundError when the remote file does not exist
+        def _get(connection: _Connection) -> bytes:
+            buffer = io.BytesIO()
+            connection.sftp.getfo(remote_path, buffer)
+            return buffer.getvalue()
+        return await self.run(_get, retry=True)
+
+    async def rename(self, remote_path: str, new_remote_path: str):
+        await self.run(lambda connection: connection.sftp.rename(remote_path, new_remote_path))
+
+    async def remove(self, remote_path: str):
+        await self.run(lambda connection: connection.sftp.remove(remote_path))
+
+    def close(self):
+        # Idle connections are closed but stay pooled; they reconnect on next use
+        closed = []
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            closed.append(connection)
+        for connection in closed:
+            self._idle.put(connection)
+
+    def snapshot(self) -> dict:
+        return {"size": self.size, "in_use": self.in_use}
@@ -0,0 +1,64 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from config import JWT_CACHE_MAX_ENTRIES, JWT_CACHE_DEFAULT_TTL
+
+
+class VerifiedTokenCache:
+    """Bounded LRU cache of already-verified JWTs.
+
+    Entries are keyed on a SHA-256 digest of the token, so raw bearer tokens are
+    never held in memory as dictionary keys, and expire at the token's own 'exp'.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(VerifiedTokenCache, cls).__new__(cls)
+            cls._instance._entries = OrderedDict() # token digest -> (user_id, expires_at)
+            cls._instance._lock = threading.Lock()
+            cls._instance.hits = 0
+            cls._instance.misses = 0
+        return cls._instance
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[int]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            user_id, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return user_id
+
+    def put(self, token: str, user_id: int, exp: Optional[float] = None):
+        expires_at = float(exp) if exp is not None else time.time() + JWT_CACHE_DEFAULT_TTL
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > JWT_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Singleton instance
+verified_token_cache = VerifiedTokenCache()